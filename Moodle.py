@@ -2,14 +2,30 @@
 This file contains the MoodleSession class and all Exception classes
 """
 
+import io
 import os
-from urllib.parse import unquote        # reference: https://stackoverflow.com/questions/11768070/transform-url-string-into-normal-string-in-python-20-to-space-etc
-from datetime import datetime           # reference: https://docs.python.org/3/library/datetime.html
+import time
+import random
+import asyncio
+import inspect
+from itertools import count
+from functools import lru_cache         # reference: https://docs.python.org/3/library/functools.html#functools.lru_cache
+from email.utils import parsedate_to_datetime
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor  # reference: https://docs.python.org/3/library/concurrent.futures.html
+from urllib.parse import unquote, urlsplit, parse_qs  # reference: https://stackoverflow.com/questions/11768070/transform-url-string-into-normal-string-in-python-20-to-space-etc
+from datetime import datetime, timezone  # reference: https://docs.python.org/3/library/datetime.html
 
 from bs4 import BeautifulSoup as BS     # reference: https://www.crummy.com/software/BeautifulSoup/bs4/doc/
+from bs4 import SoupStrainer
 from aiohttp import ClientSession       # reference: https://docs.aiohttp.org/en/stable/client_reference.html
 from aiohttp import ClientTimeout
+from aiohttp import TCPConnector
+from aiohttp import ClientConnectionError, ClientPayloadError
+from aiohttp import FormData
 
+from MoodleScheduler import AdaptiveLimiter
+from MoodleStorage import hash_file
 from MoodleDataTypes import (
     MoodleCourse, MoodleSection,
     MoodleFolder, MoodleFile,
@@ -17,32 +33,200 @@ from MoodleDataTypes import (
 )
 
 
+try:  # brotli lets aiohttp decompress pages compressed with br
+    import brotli  # noqa: F401
+except ImportError:
+    brotli = None
+
+try:  # lxml is a lot faster than the html.parser, but optional  https://www.crummy.com/software/BeautifulSoup/bs4/doc/#installing-a-parser
+    import lxml  # noqa: F401
+    PARSER_BACKEND = 'lxml'
+except ImportError:
+    PARSER_BACKEND = 'html.parser'
+
+
 # All html reference from https://moodle.ksz.ch by viewing page source
 
+class MoodleConfig:
+    """
+    Holds the settings used to tune the connections and requests of a MoodleSession
+    """
+    DEFAULT_CHUNK_SIZE = 64 * 1024  # bytes held in memory per download at once
+    DEFAULT_CRAWL_CONCURRENCY = 8
+    DEFAULT_PAGE_TIMEOUT = {'connect': 10, 'read': 30, 'total': 60}  # seconds
+    DEFAULT_FILE_TIMEOUT = {'connect': 10, 'read': 60, 'total': None}  # large files may take longer than any total
+    DEFAULT_SECTION_MAX_AGE = 24 * 60 * 60  # seconds
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, crawl_concurrency=DEFAULT_CRAWL_CONCURRENCY,
+                 parse_mode=None, parse_workers=None, limit=100, limit_per_host=0, keepalive_timeout=15,
+                 use_dns_cache=True, ttl_dns_cache=300, compression=True, page_timeout=None, file_timeout=None,
+                 retries=3, backoff=0.5, backoff_max=30, adaptive=True, adaptive_initial=4, adaptive_max=32,
+                 section_max_age=DEFAULT_SECTION_MAX_AGE):
+        """
+        The constructor for MoodleConfig
+
+        Parameters:
+            chunk_size (int): The size of the chunks in which files are downloaded
+            crawl_concurrency (int): The maximum amount of folder and assignment pages fetched at once
+            parse_mode (str): 'process' or 'thread' to parse pages in a pool of workers
+                              instead of on the event loop, pages are parsed on the loop if None
+            parse_workers (int): The amount of workers parsing pages, defaults to the amount of CPUs
+            limit (int): The maximum amount of open connections, 0 for no limit
+            limit_per_host (int): The maximum amount of open connections to the same host, 0 for no limit
+            keepalive_timeout (float): The seconds an unused connection is kept open
+            use_dns_cache (bool): If resolved host names are cached
+            ttl_dns_cache (int): The seconds a resolved host name is cached, None to cache it forever
+            compression (bool): If pages are requested compressed with gzip, deflate and br if brotli is installed
+            page_timeout (dict): The 'connect', 'read' and 'total' seconds until a request of a page times out
+            file_timeout (dict): The 'connect', 'read' and 'total' seconds until a download times out
+            retries (int): How often a failed request of a page or file is repeated
+            backoff (float): The seconds waited at most before the first retry, doubling with every retry
+            backoff_max (float): The seconds waited at most before any retry, unless the server asks for longer
+            adaptive (bool): If the amount of requests running at once adapts to the latency and errors of Moodle
+            adaptive_initial (int): The amount of requests allowed to run at once at the start
+            adaptive_max (int): The maximum amount of requests allowed to run at once
+            section_max_age (float): The seconds the assignment status of an unchanged section is reused without
+                                     fetching the assignment pages, a submission made outside of xMoodle shows
+                                     at the latest after as long, 0 to always fetch them. Folders are always
+                                     fetched, as new files in a folder don't show on the course page, but with
+                                     a cache they're only transferred again if they changed
+        """
+        self.chunk_size = chunk_size
+        self.crawl_concurrency = crawl_concurrency
+        self.parse_mode = parse_mode
+        self.parse_workers = parse_workers
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.use_dns_cache = use_dns_cache
+        self.ttl_dns_cache = ttl_dns_cache
+        self.compression = compression
+        self.page_timeout = {**self.DEFAULT_PAGE_TIMEOUT, **(page_timeout or {})}
+        self.file_timeout = {**self.DEFAULT_FILE_TIMEOUT, **(file_timeout or {})}
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.adaptive = adaptive
+        self.adaptive_initial = adaptive_initial
+        self.adaptive_max = adaptive_max
+        self.section_max_age = section_max_age
+
+    @classmethod
+    def from_dict(cls, config: dict):
+        """
+        Creates a MoodleConfig from the settings found in a dict, other keys are ignored
+
+        Parameters:
+            config (dict): The content of config.json
+
+        Returns:
+            MoodleConfig: The settings found in the dict
+        """
+        names = inspect.signature(cls).parameters  # https://docs.python.org/3/library/inspect.html#inspect.signature
+        return cls(**{name: config[name] for name in names if config.get(name) is not None})
+
+    @staticmethod
+    def client_timeout(timeout: dict) -> ClientTimeout:
+        """
+        Converts a timeout of the config to the ClientTimeout of aiohttp
+
+        Parameters:
+            timeout (dict): contains 'connect', 'read' and 'total' in seconds
+
+        Returns:
+            ClientTimeout: The timeout to be used with aiohttp
+        """
+        return ClientTimeout(total=timeout['total'], sock_connect=timeout['connect'], sock_read=timeout['read'])
+
+    @property
+    def accept_encoding(self) -> str:
+        if not self.compression:
+            return 'identity'
+        return 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
+
 class MoodleSession(ClientSession):
     """
     Inherits from aiohttp.ClientSession and is used to access Moodle
     """
-    DEFAULT_TIMEOUT = 0.00
-
-    def __init__(self, home_url, login_url, *args, **kwargs):
+    def __init__(self, home_url, login_url, *args, config: MoodleConfig = None,
+                 journal=None, cache=None, index=None, blobs=None, cookies=None, timer=None, progress=None, **kwargs):
         """
         The constructor for MoodleSession
 
         Parameters:
             home_url (str): The URL you get after you login
             login_url (str): The login URL
+            config (MoodleConfig): The settings of the connections and requests, the defaults are used if None
+            journal (DownloadJournal): Used to resume interrupted downloads, if given
+            cache (HttpCache): Used to avoid fetching and parsing unchanged pages, if given
+            index (SyncIndex): Used to find already downloaded files with the same content, if given
+            blobs (BlobStore): Used to store every downloaded file only once, if given
+            cookies (CookieStore): Used to reuse the authenticated session of an earlier run, if given
+            timer (RequestTimer): Measures every request and the time needed to parse it, if given
+            progress (ProgressTracker): Receives the progress of every download, if given
         """
         self.home_url = home_url
         self.login_url = login_url
+        self.config = config or MoodleConfig()
+        self.chunk_size = self.config.chunk_size
+        self.crawl_concurrency = self.config.crawl_concurrency
+        self.journal = journal
+        self.cache = cache
+        self.index = index
+        self.blobs = blobs
+        self.cookies = cookies
+        self.timer = timer
+        self.progress = progress
+        self._claimed_paths = {}  # the url of the file every local path is used by, by the casefolded path
+        self._crawl_semaphore = None
+        self._loading = {}  # the task loading every item, so an item isn't fetched twice at once
+        self._submitted = set()  # the urls of the assignments submitted to, their status isn't taken from a snapshot
+        self.limiter = AdaptiveLimiter(self.config.adaptive_initial, maximum=self.config.adaptive_max) if self.config.adaptive else None
+
+        if self.config.parse_mode == 'process':  # The workers only send back the plain results of MoodleParser
+            self.parse_executor = ProcessPoolExecutor(self.config.parse_workers)
+        elif self.config.parse_mode == 'thread':  # Only helps if the parser releases the GIL
+            self.parse_executor = ThreadPoolExecutor(self.config.parse_workers)
+        else:
+            self.parse_executor = None
+
+        connector = TCPConnector(limit=self.config.limit, limit_per_host=self.config.limit_per_host,  # https://docs.aiohttp.org/en/stable/client_reference.html#tcpconnector
+                                 keepalive_timeout=self.config.keepalive_timeout,
+                                 use_dns_cache=self.config.use_dns_cache, ttl_dns_cache=self.config.ttl_dns_cache,
+                                 loop=kwargs.get('loop'))
 
         super().__init__(*args,
-                         timeout=ClientTimeout(self.DEFAULT_TIMEOUT),
+                         connector=connector,
+                         timeout=MoodleConfig.client_timeout(self.config.page_timeout),
+                         headers={'Accept-Encoding': self.config.accept_encoding},
+                         trace_configs=[timer.trace_config] if timer else None,
                          **kwargs)
 
+    @property
+    def crawl_semaphore(self) -> asyncio.Semaphore:
+        """
+        The semaphore shared by all crawls of the session, it's created on first use
+        so it belongs to the event loop the session runs on
+        """
+        if self._crawl_semaphore is None:
+            self._crawl_semaphore = asyncio.Semaphore(self.crawl_concurrency)
+        return self._crawl_semaphore
+
+    async def close(self) -> None:
+        """
+        Closes the MoodleSession and saves the cache
+        """
+        if self.cache:
+            self.cache.save()
+        if self.parse_executor:
+            self.parse_executor.shutdown(wait=False)
+        await super().close()
+
     async def login(self, logindata) -> None:
         """
-        Authenticates the MoodleSession with the provided logindata
+        Authenticates the MoodleSession with the provided logindata,
+        if the cookies of an earlier session are still valid they're used instead
 
         Parameters:
             logindata (dict): contains 'username' and 'password'
@@ -56,7 +240,7 @@ class MoodleSession(ClientSession):
                 str: A valid logintoken
             """
             async with self.get(self.login_url) as login_page:
-                login_html = BS((await login_page.text()), 'html.parser')
+                login_html = MoodleParser.soup(await login_page.text(), SoupStrainer(attrs={'name': 'logintoken'}))
                 return login_html.find(attrs={'name': 'logintoken'})['value']
 
         async def post_logindata() -> bool:
@@ -69,15 +253,184 @@ class MoodleSession(ClientSession):
             """
             await self.post(self.login_url, data=logindata, allow_redirects=False)  # allow redirects is set to false as to simulate this process manually as otherwise it doesn't work
 
-            async with self.get(self.home_url) as home_page:
-                if str(home_page.url) != self.home_url:  # Checks if the authentication was successful
-                    return False
-                return True
+            return await self.is_logged_in()  # Checks if the authentication was successful
+
+        loop = asyncio.get_event_loop()
+        if self.cookies:  # deriving the key of the stored cookies takes a while, so it's done in an executor
+            stored_cookies = await loop.run_in_executor(None, self.cookies.read, dict(logindata))
+            if stored_cookies is not None:
+                self.cookies.add(self.cookie_jar, stored_cookies, self.home_url)
+                if await self.is_logged_in():  # The stored session hasn't expired yet
+                    return
+                self.cookie_jar.clear()
 
         logindata['logintoken'] = await get_logintoken()  # Gets the logintoken
         if not await post_logindata():  # Posts the logindata
+            if self.cookies:
+                self.cookies.clear()  # The stored session belongs to logindata which doesn't work anymore
             raise IncorrectLogindata()  # Raises an exception if the logindata was wrong
 
+        if self.cookies:  # the morsels are collected on the event loop the cookie jar belongs to
+            await loop.run_in_executor(None, self.cookies.save, list(self.cookie_jar), dict(logindata))
+
+    async def is_logged_in(self) -> bool:
+        """
+        Checks if the MoodleSession is still authenticated
+
+        Returns:
+            bool: False if Moodle redirects to the login page instead of the home page
+        """
+        async def get_home_page() -> bool:
+            async with await self.send(self.home_url) as home_page:
+                return str(home_page.url) == self.home_url
+
+        return await self.retry(get_home_page)
+
+    async def retry(self, operation, *args):
+        """
+        Runs an operation which only sends GET requests and repeats it if it fails because
+        of the network or the server being busy, waiting longer after every attempt
+
+        Parameters:
+            operation (function): The coroutine function to be run
+            args: The arguments of the operation
+
+        Returns:
+            The result of the operation
+        """
+        for attempt in count():
+            try:
+                return await operation(*args)
+            except RETRY_ERRORS as e:
+                if self.limiter:
+                    self.limiter.observe(error=True)
+                if attempt >= self.config.retries:
+                    raise
+                if isinstance(e, TemporaryServerError) and e.retry_after is not None:
+                    delay = e.retry_after  # The server said how long to wait
+                else:  # https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+                    delay = random.uniform(0, min(self.config.backoff_max, self.config.backoff * 2 ** attempt))
+                await asyncio.sleep(delay)
+
+    async def send(self, url, **kwargs):
+        """
+        Sends a GET request and returns the response as soon as its headers arrived.
+        A slot of the limiter is only held until then, so a long download doesn't keep
+        the pages waiting, and the time to the headers is reported as the latency
+
+        Parameters:
+            url (str): The url to be requested
+            kwargs: The arguments of ClientSession.get
+
+        Returns:
+            ClientResponse: The response, which has to be used with async with to release it
+        """
+        if self.limiter is None:
+            response = await self.get(url, **kwargs)
+        else:
+            async with self.limiter:
+                start = time.monotonic()
+                response = await self.get(url, **kwargs)
+        try:
+            self.check_status(response)
+        except TemporaryServerError:
+            await response.release()
+            raise
+        if self.limiter:
+            self.observe_latency(start)
+        return response
+
+    def observe_latency(self, start) -> None:
+        """
+        Reports the latency of a successful request to the limiter
+
+        Parameters:
+            start (float): The time.monotonic() when the request was sent
+        """
+        if self.limiter:
+            self.limiter.observe(time.monotonic() - start)
+
+    @staticmethod
+    def check_status(response) -> None:
+        """
+        Raises a TemporaryServerError if the response status means the request should be tried again
+
+        Parameters:
+            response (ClientResponse): The response to be checked
+        """
+        if response.status not in TemporaryServerError.STATUSES:
+            return
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and response.status in (429, 503):
+            try:
+                retry_after = float(retry_after)
+            except ValueError:  # Retry-After can also be a date  https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Retry-After
+                try:
+                    retry_after = max(0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+                except (TypeError, ValueError):
+                    retry_after = None
+        else:
+            retry_after = None
+        raise TemporaryServerError(response.status, retry_after)
+
+    async def fetch_page(self, url, parser):
+        """
+        Fetches a page and parses it, reusing the cached page and
+        its parsed result if the page didn't change since it was cached
+
+        Parameters:
+            url (str): The url of the page
+            parser (function): Takes the html of the page and returns a JSON serializable result
+
+        Returns:
+            The result of the parser
+        """
+        return await self.retry(self._fetch_page, url, parser)
+
+    async def _fetch_page(self, url, parser):
+        headers = self.cache.headers(url) if self.cache else {}
+
+        async with await self.send(url, headers=headers) as page:
+            if page.status == 304:  # The page didn't change since it was cached
+                self.cache.hits += 1
+                parsed = self.cache.get_parsed(url, parser.__name__)
+                if parsed is not None:
+                    return parsed
+                html = self.cache.get(url)
+            else:
+                html = await page.text()
+                if self.cache:
+                    self.cache.misses += 1
+                    self.cache.store(url, html, page.headers.get('ETag'), page.headers.get('Last-Modified'))
+
+        if html is None:  # The cached page was removed in the meantime
+            async with await self.send(url) as page:
+                html = await page.text()
+
+        start = time.monotonic()
+        parsed = await self.parse(parser, html)
+        if self.timer:
+            self.timer.add_parse_time(url, time.monotonic() - start)
+        if self.cache:
+            self.cache.store_parsed(url, parser.__name__, parsed)
+        return parsed
+
+    async def parse(self, parser, html):
+        """
+        Runs a parser in the parse executor of the session, so the event loop
+        can continue with other requests while the page is being parsed
+
+        Parameters:
+            parser (function): A function of MoodleParser
+            html (str): The html to be parsed
+
+        Returns:
+            The result of the parser
+        """
+        if self.parse_executor is None:
+            return parser(html)
+        return await asyncio.get_event_loop().run_in_executor(self.parse_executor, parser, html)
+
     async def get_courses(self) -> list:
         """
         Gets all the courses available for the student
@@ -85,103 +438,269 @@ class MoodleSession(ClientSession):
         Returns:
             list: A list of courses
         """
-        async with self.get(self.home_url) as homepage:
-            course_list = BS(await homepage.text(), 'html.parser').find_all('a')
-            courses = []
-            for course in course_list:  # Creates a new Course object for each course found
-                if 'course' not in course['href']:
-                    continue
-                new_course = MoodleCourse(course['href'], course.find(class_='media-body').string)
-                courses.append(new_course)
-        return courses  # returns a list of courses
+        course_list = await self.fetch_page(self.home_url, MoodleParser.parse_courses)
+        # Creates a new Course object for each course found
+        return [MoodleCourse(url, name) for url, name in course_list]  # returns a list of courses
 
-    async def get_course_content(self, course: MoodleCourse, files=True, assignments=True) -> None:
+    async def get_course_content(self, course: MoodleCourse, files=True, assignments=True, snapshot: MoodleCourse = None) -> None:
         """
         Retrieves all the content of the given course
 
+        First all items are collected from the course page, then the
+        pages of all folders and assignments are fetched at once. The
+        status of the assignments of sections which are unchanged since
+        the snapshot is taken from the snapshot instead, for up to section_max_age
+
         Parameters:
             course (MoodleCourse): The course from which to get all content
+            snapshot (MoodleCourse): The course as it was found by the last sync, if there is one
         """
-        async with self.get(course.url) as coursepage:
-            page_items = BS(await coursepage.text(), 'html.parser').find_all('a')
-            for item in page_items:  # This goes through all URLs in the course and finds any relevent URL
+        await self.load_course(course, files, assignments, snapshot)
+        await self.prefetch(course, folders=files, assignments=assignments)
 
-                try:
-                    item['href']
-                except KeyError:
-                    continue
+    async def get_sections(self, course: MoodleCourse) -> list:
+        """
+        Gets the sections of a course with their files, folders and assignments, but
+        without fetching the pages of the folders and assignments
 
-                # Perhaps split the url and check if one of the splits is section, resource, url, ...
+        Returns:
+            list: The sections of the course
+        """
+        await self.load_course(course)
+        return course.sections
 
-                if 'section' in item['href']:   # Creates a new MoodleSection instance for each Section
-                    if item.string is None:
-                        continue
-                    section = MoodleSection(item['href'],
-                                            MoodleParser.parse_windows(item.string))
+    async def get_folder_files(self, section: MoodleSection, folder: MoodleFolder) -> list:
+        """
+        Gets the files of a folder, its page is only fetched the first time
 
-                    course.sections.append(section)
+        Returns:
+            list: The files of the folder
+        """
+        await self.load_folder(section, folder)
+        return folder.files
+
+    async def get_assignment_status(self, assignment: MoodleAssignment) -> bool:
+        """
+        Gets the status of an assignment, its page is only fetched the first time
+
+        Returns:
+            bool: True if something was submitted
+        """
+        await self.load_assignment(assignment)
+        return assignment.status
+
+    async def _load_once(self, item, load) -> None:
+        """
+        Runs a load unless the same item is being loaded already, then waits for that load instead
 
-                elif 'resource' in item['href'] and files:  # Creates a new MoodleFile instance for each File
-                    file = MoodleFile(item['href'],
-                                      item.find(class_='instancename').contents[0],
-                                      course.sections[-1].name)
+        Parameters:
+            item (MoodleData): The course, folder or assignment
+            load (function): Returns the coroutine loading the item
+        """
+        task = self._loading.get(item)
+        if task is None:
+            task = self._loading[item] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda _: self._loading.pop(item, None))
+        await task
+
+    async def load_course(self, course: MoodleCourse, files=True, assignments=True, snapshot: MoodleCourse = None) -> None:
+        """
+        Fetches the course page and fills the course with its sections, files and urls.
+        Its folders and assignments are only created, their pages are fetched by
+        load_folder, load_assignment or prefetch, unless an assignment's status can be
+        taken from the snapshot because its section is unchanged and younger than section_max_age
+
+        Parameters:
+            course (MoodleCourse): The course to be loaded, nothing is fetched if it's loaded already
+            files (bool): If files, folders and urls are added, only used by the first load of the course
+            assignments (bool): If assignments are added, only used by the first load of the course
+            snapshot (MoodleCourse): The course as it was found by the last sync, it's used for the
+                                     assignments which aren't loaded yet, even if the course is
+        """
+        async def load():
+            page_items = await self.fetch_page(course.url, MoodleParser.parse_course_page)
+            fingerprints = MoodleParser.section_fingerprints(page_items)
+            now = time.time()
+
+            for kind, url, name in page_items:  # This goes through all relevant URLs in the course
+
+                if kind == 'section':   # Creates a new MoodleSection instance for each Section
+                    section = MoodleSection(url, MoodleParser.parse_windows(name), fingerprint=fingerprints[url], crawled_at=now)
+                    layout = section.layout = []
 
-                    section.files.append(file)
+                    course.sections.append(section)
+
+                elif kind == 'resource' and files:  # Creates a new MoodleFile instance for each File
+                    file = MoodleFile(url, name, course.sections[-1].name)
 
-                elif 'folder' in item['href'] and files:  # Creates a new MoodleFolder instance for each Folder
-                    folder = MoodleFolder(item['href'],
-                                          MoodleParser.parse_windows(item.find(class_='instancename').contents[0]))
+                    layout.append(file)
 
-                    await self.get_folder_content(section, folder)
+                elif kind == 'folder' and files:  # Creates a new MoodleFolder instance for each Folder
+                    folder = MoodleFolder(url, MoodleParser.parse_windows(name))
 
                     section.folders.append(folder)
+                    layout.append(folder)
 
-                elif 'assign' in item['href'] and assignments:  # Creates a new MoodleAssignment instance for each Assignment
-                    assignment = MoodleAssignment(item['href'],
-                                                  item.find(class_='instancename').contents[0])
-                    await self.get_assignment_content(assignment)
+                elif kind == 'assign' and assignments:  # Creates a new MoodleAssignment instance for each Assignment
+                    assignment = MoodleAssignment(url, name)
                     section.assignments.append(assignment)
 
-                elif 'url' in item['href'] and files:  # Creates a new MoodleUrl instance for each Url
-                    file = MoodleUrl(item['href'],
-                                     item.find(class_='instancename').contents[0],
-                                     course.sections[-1].name)
+                elif kind == 'url' and files:  # Creates a new MoodleUrl instance for each Url
+                    file = MoodleUrl(url, name, course.sections[-1].name)
 
-                    section.files.append(file)
+                    layout.append(file)
 
-    async def get_assignment_content(self, assignment: MoodleAssignment):
-        async with self.get(assignment.url) as assignment_page:
-            content = BS(await assignment_page.text(), 'html.parser')
-            generalinfo = content.find(class_='generaltable').find_all('tr')
-            status = generalinfo[0].td.string
-            assignment.status = status != 'No attempt'
-            # due_date = generalinfo[2].td.string
-            # assignment.due_date = str(datetime.strptime(due_date, '%A, %d %B %Y, %I:%M %p'))  # https://stackabuse.com/converting-strings-to-datetime-in-python/
+            for section in course.sections:
+                self._arrange(section)
+            course.loaded = True
 
-    async def get_folder_content(self, section: MoodleSection, folder: MoodleFolder, parentfolder=False):
-        async with self.get(folder.url) as folderpage:
-            page_items = BS(await folderpage.text(), 'html.parser').find_all('a')
+        if not course.loaded:
+            await self._load_once(course, load)
+        if snapshot:
+            self._reuse_assignments(course, snapshot)
 
-            for item in page_items:
-                if '/content/' in item['href']:
-                    file = MoodleFile(item['href'].split('?')[0],
-                                      item.find(class_='fp-filename').contents[0],
-                                      f'{section.name}/{folder.path + "/" if folder.path else ""}{folder.name}')
+    def _reuse_assignments(self, course: MoodleCourse, snapshot: MoodleCourse) -> None:
+        """
+        Takes the status of the assignments which aren't loaded yet from the snapshot,
+        if their section is unchanged and was fetched less than section_max_age ago
+        """
+        old_sections = {section.url: section for section in snapshot.sections}
+        now = time.time()
+        for section in course.sections:
+            old_section = old_sections.get(section.url)
+            if not (old_section and old_section.fingerprint == section.fingerprint and old_section.crawled_at
+                    and now - old_section.crawled_at < self.config.section_max_age):
+                continue
+            old_assignments = {assignment.url: assignment for assignment in old_section.assignments}
+            for assignment in section.assignments:
+                if not assignment.loaded and assignment.url in old_assignments and assignment.url not in self._submitted:
+                    assignment.status, assignment.loaded = old_assignments[assignment.url].status, True
+            section.crawled_at = old_section.crawled_at  # the reused pages are as old as the last time they were fetched
 
-                    folder.files.append(file)
-                    section.files.append(file)  # Simplify downloading and presentation
+    @staticmethod
+    def _arrange(section: MoodleSection) -> None:
+        """
+        Puts the files of the loaded folders in between the other files of the section,
+        the layout is dropped once all folders are loaded, as nothing changes anymore
+        """
+        if section.layout is None:
+            return
+        section.files = [file for item in section.layout
+                         for file in (item.files if isinstance(item, MoodleFolder) else [item])]
+        if all(folder.loaded for folder in section.folders):
+            section.layout = None
+
+    async def load_folder(self, section: MoodleSection, folder: MoodleFolder) -> None:
+        """
+        Fetches the page of a folder and adds its files to the folder and section, unless it's loaded already
+        """
+        if folder.loaded:
+            return
 
-                # Get the file content for subfiles
-                # elif '???' in item['href']:
-                #     subfolder = MoodleFolder(item['href'],
-                #                              item.find(class_='???').contents[0])
+        async def load():
+            async with self.crawl_semaphore:
+                await self.get_folder_content(section, folder)
+            folder.loaded = True
+            self._arrange(section)
 
-                #     await self.get_folder_content(subfolder, f'{folder.path + "/" if folder.path else ""}{folder.name}')
-                #     folder.folders.append(subfolder)
+        await self._load_once(folder, load)
+
+    async def load_assignment(self, assignment: MoodleAssignment) -> None:
+        """
+        Fetches the page of an assignment to get its status, unless it's loaded already
+        """
+        if assignment.loaded:
+            return
+
+        async def load():
+            async with self.crawl_semaphore:
+                await self.get_assignment_content(assignment)
+            assignment.loaded = True
+
+        await self._load_once(assignment, load)
+
+    async def prefetch(self, course: MoodleCourse, folders=True, assignments=True) -> None:
+        """
+        Fetches the pages of all folders and assignments of a course which aren't loaded yet at once
+
+        Parameters:
+            course (MoodleCourse): The loaded course
+            folders (bool): If the folders are loaded
+            assignments (bool): If the assignments are loaded
+        """
+        loads = []
+        for section in course.sections:
+            if folders:
+                loads += [self.load_folder(section, folder) for folder in section.folders if not folder.loaded]
+            if assignments:
+                loads += [self.load_assignment(assignment) for assignment in section.assignments if not assignment.loaded]
+        await asyncio.gather(*loads)
+
+    def claim_path(self, path, url, size=None) -> str:
+        """
+        Reserves a local path for a file, so two files with the same name
+        don't overwrite each other while they're downloaded at once.
+        If the path is taken by another file, (2), (3), ... is added to the name.
+        Paths differing only in case count as the same, as they are on Windows and macOS
+
+        Parameters:
+            path (str): The path the file would be downloaded to
+            url (str): The url of the file
+            size (int): The size of the file, a file of this size on the path which isn't
+                        in the index is taken to be an earlier download of the same file
+
+        Returns:
+            str: The path the file is to be downloaded to
+        """
+        root, extension = os.path.splitext(path)
+        number = 1
+        while True:
+            owner = self._claimed_paths.get(path.casefold())
+            if owner == url:
+                return path
+            if owner is None and not self._taken_on_disk(path, url, size):
+                self._claimed_paths[path.casefold()] = url
+                return path
+            number += 1
+            path = f'{root} ({number}){extension}'
+
+    def release_paths(self) -> None:
+        """
+        Forgets all claimed paths, called before the downloads of every sync, as the files
+        of earlier syncs are found in the index and the session can outlive many syncs
+        """
+        self._claimed_paths.clear()
+
+    def _taken_on_disk(self, path, url, size=None) -> bool:
+        """
+        Checks if a path was used by another file in an earlier sync, which
+        can only be told with an index, without it the file is overwritten
+        """
+        if self.index is None or not os.path.exists(path):
+            return False
+        entry = self.index.get(url)
+        if entry:
+            return entry['download_path'] != path
+        # A sync which stopped after the download was complete, but before it was added to the index, left it behind
+        return size is None or os.path.getsize(path) != size or self.index.find_path(path) is not None
+
+    async def get_assignment_content(self, assignment: MoodleAssignment):
+        status = await self.fetch_page(assignment.url, MoodleParser.parse_assignment_page)
+        assignment.status = status != 'No attempt'
+
+    async def get_folder_content(self, section: MoodleSection, folder: MoodleFolder, parentfolder=False):
+        folder_items = await self.fetch_page(folder.url, MoodleParser.parse_folder_page)
+
+        for url, name in folder_items:
+            file = MoodleFile(url, name, f'{section.name}/{folder.path + "/" if folder.path else ""}{folder.name}')
+
+            folder.files.append(file)
+            section.files.append(file)  # Simplify downloading and presentation
 
     async def download_file(self, file: MoodleFile, base_path) -> str:
         """
-        Downloads a given file to the base path given
+        Downloads a given file to the base path given and
+        sets the size, hash, etag and download path of the file
 
         Parameters:
             file (MoodleFile): The file to be downloaded
@@ -191,15 +710,99 @@ class MoodleSession(ClientSession):
             str: The final path of the file
         """
         if isinstance(file, MoodleUrl):
-            await self.download_url(file, base_path)
-            return
+            return await self.download_url(file, base_path)
+
+        return await self.retry(self._download_file, file, base_path)  # A retry continues where the download stopped
+
+    async def _download_file(self, file: MoodleFile, base_path) -> str:
+        headers = {'Accept-Encoding': 'identity'}  # Ranges and Content-Length have to refer to the bytes of the file itself
+        entry = self.journal.get(file.url) if self.journal else None
+        if entry:  # Asks only for the missing bytes of an interrupted download
+            headers['Range'] = f"bytes={os.path.getsize(entry['part'])}-"
+            if entry['etag'] or entry['last_modified']:
+                headers['If-Range'] = entry['etag'] or entry['last_modified']  # the server sends the whole file if it changed since
 
-        async with self.get(file.url) as file_page:  # https://www.youtube.com/watch?v=E_oIU4IU2W8
-            path = f'{base_path}/{file.path}/{unquote(str(file_page.url).split("/")[-1])}'
+        async with await self.send(file.url, headers=headers,  # https://www.youtube.com/watch?v=E_oIU4IU2W8
+                                   timeout=MoodleConfig.client_timeout(self.config.file_timeout)) as file_page:
+            if file_page.status == 416 and entry:  # The range is invalid, so the partial file is discarded
+                await file_page.release()  # The connection is returned before the file is requested again
+                os.remove(entry['part'])
+                self.journal.finish(file.url)
+                return await self._download_file(file, base_path)
+            file_page.raise_for_status()  # Error pages mustn't be saved as the file
+
+            path = self.claim_path(f'{base_path}/{file.path}/{MoodleParser.parse_windows(unquote(str(file_page.url).split("/")[-1]))}',
+                                   file.url, file_page.content_length if file_page.status == 200 else None)
             os.makedirs(os.path.dirname(path), exist_ok=True)  # https://stackoverflow.com/questions/12517451/automatically-creating-directories-with-file-output
-            content = await file_page.read()
-            with open(path, 'wb') as new_file:
-                new_file.write(content)
+
+            if self.index and file_page.status == 200 and file.url not in self.index and os.path.exists(path):
+                # The path was claimed for a file of the same size left by a sync which stopped before adding it to the
+                # index, it's reused unless the index knows another hash for the ETag
+                file_hash = await asyncio.get_event_loop().run_in_executor(None, hash_file, path, self.chunk_size)
+                if self.index.find_blob(file_page.headers.get('ETag'), file_page.content_length) in (None, file_hash):
+                    if entry:
+                        os.remove(entry['part'])
+                        self.journal.finish(file.url)
+                    file.etag, file.last_modified = file_page.headers.get('ETag'), file_page.headers.get('Last-Modified')
+                    file.size, file.hash, file.download_path = file_page.content_length, file_hash, path
+                    if self.blobs:
+                        await asyncio.get_event_loop().run_in_executor(None, self.blobs.add, path, file_hash)
+                    return path
+
+            # The file is streamed into a .part file next to its final path and only
+            # renamed once complete, so only one chunk per download is held in memory
+            # and an interrupted download can be continued on the next run
+            if self.index and self.blobs and file_page.status == 200:  # Skips the download if the same file was downloaded before
+                file_hash = self.index.find_blob(file_page.headers.get('ETag'), file_page.content_length)
+                # Linking may hash the stored file again, which mustn't block the other downloads
+                if file_hash in self.blobs and await asyncio.get_event_loop().run_in_executor(None, self.blobs.link, file_hash, path):
+                    if entry:
+                        os.remove(entry['part'])
+                        self.journal.finish(file.url)
+                    file.etag, file.last_modified = file_page.headers.get('ETag'), file_page.headers.get('Last-Modified')
+                    file.size, file.hash, file.download_path = file_page.content_length, file_hash, path
+                    return path
+
+            digest = hashlib.sha256()  # The file is hashed while it's downloaded
+            if entry and file_page.status == 206:
+                part_path, mode = entry['part'], 'ab'
+                file.etag, file.last_modified = entry['etag'], entry['last_modified']
+                with open(part_path, 'rb') as part_file:  # The bytes downloaded earlier are hashed first
+                    for chunk in iter(lambda: part_file.read(self.chunk_size), b''):
+                        digest.update(chunk)
+            else:  # The server ignored the range, so the download starts over
+                if entry and entry['part'] != f'{path}.part':
+                    os.remove(entry['part'])
+                part_path, mode = f'{path}.part', 'wb'
+                file.etag, file.last_modified = file_page.headers.get('ETag'), file_page.headers.get('Last-Modified')
+                if self.journal:
+                    self.journal.start(file.url, part_path, file.etag, file.last_modified)
+
+            if self.progress:
+                earlier = os.path.getsize(part_path) if mode == 'ab' else 0
+                total = file_page.content_length + earlier if file_page.content_length is not None else None
+                self.progress.start_file(file.url, os.path.basename(path), total, earlier)
+
+            received = 0
+            with open(part_path, mode) as new_file:
+                async for chunk in file_page.content.iter_chunked(self.chunk_size):  # https://docs.aiohttp.org/en/stable/streams.html
+                    new_file.write(chunk)
+                    digest.update(chunk)
+                    received += len(chunk)
+                    if self.progress:
+                        self.progress.advance(file.url, len(chunk))
+            os.replace(part_path, path)
+            if self.timer:
+                self.timer.add_streamed_body(file.url, received)
+
+        file.size = os.path.getsize(path)
+        file.hash = digest.hexdigest()
+        file.download_path = path
+        if self.blobs:
+            await asyncio.get_event_loop().run_in_executor(None, self.blobs.add, path, file.hash)
+
+        if self.journal:
+            self.journal.finish(file.url)
         return path
 
     async def download_url(self, url: MoodleUrl, base_path) -> str:
@@ -213,13 +816,12 @@ class MoodleSession(ClientSession):
         Returns:
             str: The final path of the url
         """
-        async with self.get(url.url) as file_page:
-            path = f'{base_path}/{url.path}/{MoodleParser.parse_windows(url.name)}.url'
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            content = BS(await file_page.read(), 'html.parser')
-            redirect_url = content.find_all(class_='urlworkaround')[0].a['href']
-            with open(path, 'w') as new_file:
-                new_file.write(f'[InternetShortcut]\nURL={redirect_url}')
+        redirect_url = await self.fetch_page(url.url, MoodleParser.parse_url_page)
+        path = self.claim_path(f'{base_path}/{url.path}/{MoodleParser.parse_windows(url.name)}.url', url.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as new_file:
+            new_file.write(f'[InternetShortcut]\nURL={redirect_url}')
+        url.download_path = path
         return path
 
     async def upload_file(self, file_path, assignment: MoodleAssignment):
@@ -230,45 +832,129 @@ class MoodleSession(ClientSession):
             file (str): path of the file to send
             assignment (MoodleAssignment): The target assignment
         """
-        if not os.path.exists(file_path):  # Maybe don't check but let it raise the exception
-            return
+        await self.upload_files([file_path], assignment)
+
+    async def upload_files(self, file_paths, assignment: MoodleAssignment, concurrency=4, progress=None) -> list:
+        """
+        Uploads files to a target assignment and submits them together. The submission
+        form is fetched once, all files are streamed into its draft area at once
+        and the submission is saved once they're all uploaded
+
+        Parameters:
+            file_paths (list): paths of the files to send
+            assignment (MoodleAssignment): The target assignment
+            concurrency (int): The maximum amount of files uploaded at once
+            progress (ProgressTracker): Receives the progress of every upload, if given
 
-        async with self.get(f'{assignment.url}&action=editsubmission') as assignment_page:
-            content = BS(await assignment_page.text(), 'html.parser')
-            keys = content.select('#id_files_filemanager_fieldset > noscript')[0].div.object['data']
-            item_id = keys.split('&')[2].split('=')[1]
-            ctx_id = keys.split('&')[7].split('=')[1]
-            sesskey = keys.split('&')[9].split('=')[1]
-            author = content.select('#action-menu-toggle-1 > span > span.usertext.mr-1')[0].string
-            userid = content.select('#page-wrapper > nav > ul.nav.navbar-nav.usernav > li:nth-child(1)')[0].div['data-userid']
-            title = file_path.split('\\')[-1] if '\\' in file_path else file_path.split('/')[-1]
-            repo_id = '5'  # content.find(class_='filemanager')['id'].split('-')[1]
-            files_filemanager = content.find(id='id_files_filemanager')['value']
-
-        async with self.post(f"{self.home_url.split('/my')[0]}/repository/repository_ajax.php?action=upload", data={
-                                              'repo_upload_file': open(file_path, 'rb'),
-                                              'sesskey': sesskey,
-                                              'repo_id': repo_id,
-                                              'itemid': item_id,
-                                              'author': author,
-                                              'savepath': '/',
-                                              'title': title,
-                                              'ctx_id': ctx_id,
-                                              # 'accepted_types[]': f"[.{title.split('.')[1]}]"
-                                              }) as upload_page:
-            print(upload_page.status)
-            print(await upload_page.text())
+        Returns:
+            list: The names of the uploaded files
+        """
+        sizes = [os.path.getsize(file_path) for file_path in file_paths]  # raises if a file doesn't exist, before anything is sent
+
+        async with self.get(f'{assignment.url}&action=editsubmission') as assignment_page:  # not cached, the draft area is new every time
+            self.check_status(assignment_page)
+            assignment_page.raise_for_status()
+            form = await self.parse(MoodleParser.parse_submission_page, await assignment_page.text())
+
+        for file_path, size in zip(file_paths, sizes):  # checks the limits of the assignment before uploading anything
+            if form['max_bytes'] > 0 and size > form['max_bytes']:
+                raise UploadError(f'{file_path} is larger than the {form["max_bytes"]} bytes allowed')
+        if form['max_files'] > 0 and len(file_paths) > form['max_files']:
+            raise UploadError(f'Only {form["max_files"]} files can be submitted')
+
+        if progress:
+            progress.reset(len(file_paths))
+        semaphore = asyncio.Semaphore(concurrency)
+        upload_url = f"{self.home_url.split('/my')[0]}/repository/repository_ajax.php?action=upload"
+
+        async def upload(file_path, size):
+            title = os.path.basename(file_path.replace('\\', '/'))
+            async with semaphore:
+                with UploadReader(file_path, progress, asyncio.get_event_loop()) as upload_file:
+                    data = FormData()
+                    data.add_field('repo_upload_file', upload_file, filename=title)  # streamed from the disk in chunks
+                    for key, value in (('sesskey', form['sesskey']), ('repo_id', form['repo_id']), ('itemid', form['item_id']),
+                                       ('author', form['author']), ('savepath', '/'), ('title', title), ('ctx_id', form['ctx_id'])):
+                        data.add_field(key, value)
+                    if progress:
+                        progress.start_file(file_path, title, size)
+
+                    async with self.post(upload_url, data=data,
+                                         timeout=MoodleConfig.client_timeout(self.config.file_timeout)) as upload_page:
+                        self.check_status(upload_page)
+                        upload_page.raise_for_status()
+                        result = await upload_page.json(content_type=None)  # Moodle answers with JSON, but not always with its content type
+
+            failed = 'error' in result
+            if progress:
+                progress.finish_file(file_path, failed=failed)
+            if failed:
+                raise UploadError(f"{title}: {result['error']}")
+            return title
+
+        uploads = [asyncio.ensure_future(upload(file_path, size)) for file_path, size in zip(file_paths, sizes)]
+        try:
+            titles = await asyncio.gather(*uploads)
+        except BaseException:  # the submission isn't saved, so the other uploads are stopped instead of filling its draft area
+            for task in uploads:
+                task.cancel()
+            await asyncio.gather(*uploads, return_exceptions=True)
+            raise
 
         async with self.post(assignment.url.split('?')[0], data={'lastmodified': datetime.timestamp(datetime.now()),
                                                                  'id': assignment.url.split('?id=')[1],
-                                                                 'userid': userid,
+                                                                 'userid': form['user_id'],
                                                                  'action': 'savesubmission',
-                                                                 'sesskey': sesskey,
+                                                                 'sesskey': form['sesskey'],
                                                                  '_qf__mod_assign_submission_form': 1,
-                                                                 'files_filemanager': files_filemanager,
+                                                                 'files_filemanager': form['files_filemanager'],
                                                                  'submitbutton': 'Save changes'
                                                                  }) as submit_page:
-            print(submit_page.status)
+            self.check_status(submit_page)
+            submit_page.raise_for_status()
+        assignment.status = True
+        self._submitted.add(assignment.url)
+        return titles
+
+
+class UploadReader(io.BufferedReader):
+    """
+    Reads a file which is being uploaded and reports every chunk read to a ProgressTracker,
+    aiohttp reads it on a thread, so the progress is passed to the event loop
+    """
+    def __init__(self, path, progress, loop):
+        super().__init__(io.FileIO(path, 'rb'))
+        self.path = path
+        self.progress = progress
+        self.loop = loop
+
+    def read(self, size=-1) -> bytes:
+        chunk = super().read(size)
+        if self.progress and chunk:
+            self.loop.call_soon_threadsafe(self.progress.advance, self.path, len(chunk))
+        return chunk
+
+
+class TemporaryServerError(Exception):
+    """
+    Exception raised when Moodle answers with a status after which the request should be tried again
+    """
+    STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, status, retry_after=None):
+        """
+        The constructor for TemporaryServerError
+
+        Parameters:
+            status (int): The status of the response
+            retry_after (float): The seconds the server asked to wait, if it did
+        """
+        super().__init__(f'Moodle answered with status {status}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+RETRY_ERRORS = (ClientConnectionError, ClientPayloadError, asyncio.TimeoutError, TemporaryServerError)
 
 
 class IncorrectLogindata(Exception):  # Handling and raising exceptions reference: https://docs.python.org/3/tutorial/errors.html
@@ -277,6 +963,13 @@ class IncorrectLogindata(Exception):  # Handling and raising exceptions referenc
     """
 
 
+class UploadError(Exception):
+    """
+    Exception raised when files can't be submitted to an assignment, because they
+    are too large or too many or Moodle refused them
+    """
+
+
 class MoodleParser:
     """
     This Class will contain any parsers needed by MoodleSession
@@ -292,11 +985,197 @@ class MoodleParser:
         '?': '.',
         '*': ''
     }
+    windows_table = str.maketrans({**{chr(i): '' for i in range(32)}, **windows_reserved_chars})  # control characters aren't allowed either
+    windows_reserved_names = {'CON', 'PRN', 'AUX', 'NUL', *(f'COM{i}' for i in range(1, 10)), *(f'LPT{i}' for i in range(1, 10))}
+    MAX_NAME_LENGTH = 200  # Windows allows 255 characters, some are left for suffixes like .part and (2)
+
+    backend = PARSER_BACKEND  # can be set to any parser supported by BeautifulSoup
+    ANCHORS = SoupStrainer('a')  # Only the anchors of most pages are needed
+
+    @staticmethod
+    def soup(html, parse_only=None) -> BS:
+        """
+        Parses html with the backend of MoodleParser
+
+        Parameters:
+            html (str): The html to be parsed
+            parse_only (SoupStrainer): If given, only the matching elements are built
+
+        Returns:
+            BS: The parsed html
+        """
+        return BS(html, MoodleParser.backend, parse_only=parse_only)
+
+    @staticmethod
+    @lru_cache(maxsize=4096)  # the same names are sanitized on every crawl
+    def parse_windows(string) -> str:
+        """
+        Turns a name into a valid file or folder name on Windows
+
+        Parameters:
+            string (str): The name as it's shown on Moodle
+
+        Returns:
+            str: The name without reserved characters, trailing dots or spaces and not longer than MAX_NAME_LENGTH
+        """
+        string = string.translate(MoodleParser.windows_table).rstrip('. ')
+        stem, extension = os.path.splitext(string)
+        if len(string) > MoodleParser.MAX_NAME_LENGTH:  # shortens the name, but keeps its extension
+            extension = extension if len(extension) < 16 else ''
+            stem = stem[:MoodleParser.MAX_NAME_LENGTH - len(extension)].rstrip('. ')
+            string = stem + extension
+        device, dot, rest = string.partition('.')
+        if device.upper() in MoodleParser.windows_reserved_names:  # names like CON or nul.txt are devices on Windows
+            string = f'{device}_{dot}{rest}'
+        return string or '_'
+
+    @staticmethod
+    def parse_courses(html) -> list:
+        """
+        Finds all courses on the home page
+
+        Parameters:
+            html (str): The html of the home page
+
+        Returns:
+            list: The url and name of every course
+        """
+        courses = []
+        for course in MoodleParser.soup(html, MoodleParser.ANCHORS).find_all('a'):
+            if 'course' not in course.get('href', ''):
+                continue
+            courses.append((course['href'], str(course.find(class_='media-body').string)))
+        return courses
+
+    @staticmethod
+    def parse_course_page(html) -> list:
+        """
+        Finds all sections, files, folders, assignments and urls on a course page
+
+        Parameters:
+            html (str): The html of the course page
+
+        Returns:
+            list: The kind, url and name of every item in the order they appear on the page
+        """
+        items = []
+        for item in MoodleParser.soup(html, MoodleParser.ANCHORS).find_all('a'):
+            href = item.get('href')
+            if href is None:
+                continue
+
+            # Perhaps split the url and check if one of the splits is section, resource, url, ...
+
+            if 'section' in href:
+                if item.string is not None:
+                    items.append(('section', href, str(item.string)))
+                continue
+
+            for kind in ('resource', 'folder', 'assign', 'url'):
+                if kind in href:
+                    instancename = item.find(class_='instancename')
+                    if instancename is not None:
+                        items.append((kind, href, str(instancename.contents[0])))
+                    break
+        return items
+
+    @staticmethod
+    def section_fingerprints(page_items) -> dict:
+        """
+        Hashes the items of every section of a course page, so a section
+        with the same fingerprint as before didn't change
+
+        Parameters:
+            page_items (list): The items found by parse_course_page
+
+        Returns:
+            dict: The fingerprint of every section by its url
+        """
+        fingerprints = {}
+        digest = None
+        for kind, url, name in page_items:
+            if kind == 'section':
+                digest = fingerprints[url] = hashlib.sha1()
+            if digest is not None:
+                digest.update(f'{kind}\0{url}\0{name}\n'.encode())
+        return {url: digest.hexdigest() for url, digest in fingerprints.items()}
+
+    @staticmethod
+    def parse_folder_page(html) -> list:
+        """
+        Finds all files on a folder page
+
+        Parameters:
+            html (str): The html of the folder page
+
+        Returns:
+            list: The url and name of every file
+        """
+        files = []
+        for item in MoodleParser.soup(html, MoodleParser.ANCHORS).find_all('a'):
+            if '/content/' in item.get('href', ''):
+                files.append((item['href'].split('?')[0], str(item.find(class_='fp-filename').contents[0])))
+
+            # Get the file content for subfiles
+            # elif '???' in item['href']:
+            #     subfolder = MoodleFolder(item['href'],
+            #                              item.find(class_='???').contents[0])
+
+            #     await self.get_folder_content(subfolder, f'{folder.path + "/" if folder.path else ""}{folder.name}')
+            #     folder.folders.append(subfolder)
+        return files
 
     @staticmethod
-    def parse_windows(string):
-        for char, newchar in MoodleParser.windows_reserved_chars.items():
-            string = string.replace(char, newchar)
-            if string.endswith(' '):
-                string = string[:-1]
-        return string
+    def parse_assignment_page(html) -> str:
+        """
+        Finds the submission status on an assignment page
+
+        Parameters:
+            html (str): The html of the assignment page
+
+        Returns:
+            str: The submission status
+        """
+        generalinfo = MoodleParser.soup(html, SoupStrainer(class_='generaltable')).find(class_='generaltable').find_all('tr')
+        # due_date = generalinfo[2].td.string
+        # assignment.due_date = str(datetime.strptime(due_date, '%A, %d %B %Y, %I:%M %p'))  # https://stackabuse.com/converting-strings-to-datetime-in-python/
+        return str(generalinfo[0].td.string)
+
+    @staticmethod
+    def parse_submission_page(html) -> dict:
+        """
+        Finds the keys of the file upload form on the page to edit a submission
+
+        Parameters:
+            html (str): The html of the editsubmission page of an assignment
+
+        Returns:
+            dict: The item_id of the draft area, ctx_id, sesskey, author, user_id, repo_id,
+                  files_filemanager and the max_bytes and max_files allowed, which are 0 or less if unlimited
+        """
+        content = MoodleParser.soup(html)
+        keys = parse_qs(urlsplit(content.select('#id_files_filemanager_fieldset > noscript')[0].div.object['data']).query)
+        return {
+            'item_id': keys['itemid'][0],
+            'ctx_id': keys['ctx_id'][0],
+            'sesskey': keys['sesskey'][0],
+            'max_bytes': int(keys.get('maxbytes', ['0'])[0]),
+            'max_files': int(keys.get('maxfiles', ['0'])[0]),
+            'author': str(content.select('#action-menu-toggle-1 > span > span.usertext.mr-1')[0].string),
+            'user_id': content.select('#page-wrapper > nav > ul.nav.navbar-nav.usernav > li:nth-child(1)')[0].div['data-userid'],
+            'repo_id': '5',  # content.find(class_='filemanager')['id'].split('-')[1]
+            'files_filemanager': content.find(id='id_files_filemanager')['value'],
+        }
+
+    @staticmethod
+    def parse_url_page(html) -> str:
+        """
+        Finds the url a Moodle url page redirects to
+
+        Parameters:
+            html (str): The html of the url page
+
+        Returns:
+            str: The url that is redirected to
+        """
+        return MoodleParser.soup(html, SoupStrainer(class_='urlworkaround')).find_all(class_='urlworkaround')[0].a['href']
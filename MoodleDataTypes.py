@@ -2,23 +2,52 @@
 This file contains all the Data Types used by MoodleSession
 """
 
+from operator import attrgetter         # reference: https://docs.python.org/3/library/operator.html#operator.attrgetter
+
+TYPES = {}  # every Data Type by the name stored in the 'type' key of its dict
+
 
 class MoodleData:
     """
-    This class will the the base class for Moodle Data Types
+    This class will the the base class for Moodle Data Types, every subclass lists
+    its attributes in __slots__ so its instances don't need a __dict__
     """
+    __slots__ = ()
+    LISTS = ()  # the attributes holding lists of Data Types
+    TRANSIENT = ()  # the attributes which are only used while loading and aren't stored in the dict
+    type = 'MoodleData'
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.type = cls.__name__  # a class attribute, so it isn't stored on every instance
+        cls.KEYS = tuple(key for key in cls.__slots__ if key not in cls.LISTS + cls.TRANSIENT) + ('type',)  # the keys which aren't lists
+        cls.get_values = attrgetter(*cls.KEYS)  # gets all of them at once, faster than getattr for every one
+        TYPES[cls.type] = cls
+
+    def __repr__(self):
+        return f'{self.type}({self.url!r}, {self.name!r})'
+
     def to_dict(self) -> dict:
         """
-        Creates a dict with all neccesary variables of the Data Type
+        Creates a dict with all neccesary variables of the Data Type,
+        using a stack instead of recursion so deep trees can't hit the recursion limit
 
         Returns:
             dict: A dict that can be used to replicate the Data Type instance
         """
-        data_dict = dict()
-        for key, value in self.__dict__.items():
-            if isinstance(value, list):
-                value = [item.to_dict() for item in value]
-            data_dict[key] = value
+        data_dict = dict(zip(self.KEYS, self.get_values(self)))
+        stack = [(self, data_dict)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            data, current_dict = pop()
+            for key in data.LISTS:
+                items = []
+                for item in getattr(data, key):
+                    item_dict = dict(zip(item.KEYS, item.get_values(item)))
+                    if item.LISTS:  # the lists of the item are added once it's popped
+                        push((item, item_dict))
+                    items.append(item_dict)
+                current_dict[key] = items
 
         return data_dict
 
@@ -29,87 +58,123 @@ class MoodleData:
         returns an instance of the replicated Data Type
 
         Parameters:
-            dict: A dict formatted for a Data Type
+            dict: A dict formatted for a Data Type, missing keys and transient attributes
+                  are set to None and keys that aren't attributes are ignored
 
         Returns:
-            cls: Returns an instance of the Data Type
+            cls: Returns an instance of the Data Type named in the dict, cls if it has no type
         """
-        self = cls.__new__(cls)  # Creates a new instance of the class without activating __init__
+        def create(current_dict):
+            data_type = TYPES.get(current_dict.get('type'), cls)
+            return data_type.__new__(data_type)  # Creates a new instance of the class without activating __init__
+
+        self = create(data_dict)
+        stack = [(self, data_dict)]
+        while stack:
+            data, current_dict = stack.pop()
+            for key in data.__slots__:
+                value = current_dict.get(key) if key not in data.TRANSIENT else None
+                if key in data.LISTS:
+                    value = value or list()
+                    items = [create(item) for item in value]
+                    stack.extend(zip(items, value))
+                    value = items
+                setattr(data, key, value)
 
-        for key, value in data_dict.items():
-            if isinstance(value, list):  # checks if the value is a dict, indicating that it's a class
-                value = [globals()[item['type']].from_dict(item) for item in value]  # dunno if using globals() is good practice https://www.xspdf.com/resolution/51693418.html#:~:text=Python%20get%20class%20from%20module,somemodule.
-            self.__setattr__(key, value)
         return self
-# make sure every subclass has an attr called type with the same name as the class
 
 
 class MoodleCourse(MoodleData):
     """
     This class holds neccesary information for a moodle course
     """
-    def __init__(self, url: str, name: str, sections: list = None):
+    __slots__ = ('url', 'name', 'sections', 'checked', 'loaded')
+    LISTS = ('sections',)
+
+    def __init__(self, url: str, name: str, sections: list = None, checked: bool = False, loaded: bool = False):
         self.url = url
         self.name = name
         self.sections = sections or list()
-        self.type = 'MoodleCourse'
+        self.checked = checked  # if the course is synced, set in the settings
+        self.loaded = loaded  # if the sections were fetched from the course page
 
 
 class MoodleSection(MoodleData):
     """
     This class holds neccesary information for a moodle course section
     """
-    def __init__(self, url: str, name: str, folders: list = None, files: list = None, assignments: list = None):
+    __slots__ = ('url', 'name', 'folders', 'files', 'assignments', 'fingerprint', 'crawled_at', 'layout')
+    LISTS = ('folders', 'files', 'assignments')
+    TRANSIENT = ('layout',)
+
+    def __init__(self, url: str, name: str, folders: list = None, files: list = None, assignments: list = None,
+                 fingerprint: str = None, crawled_at: float = None):
         self.url = url
         self.name = name
         self.folders = folders or list()
         self.files = files or list()
         self.assignments = assignments or list()
-        self.type = 'MoodleSection'
+        self.fingerprint = fingerprint  # the hash of the items of the section on the course page
+        self.crawled_at = crawled_at  # when the pages of the assignments were fetched
+        self.layout = None  # the files and folders in the order of the course page, until all folders are loaded
 
 
 class MoodleFolder(MoodleData):  # needs to be tested
     """
     This class holds neccesary information for a moodle course folder
     """
-    def __init__(self, url: str, name: str, path: str = None, folders: list = None, files: list = None):
+    __slots__ = ('url', 'name', 'path', 'folders', 'files', 'loaded')
+    LISTS = ('folders', 'files')
+
+    def __init__(self, url: str, name: str, path: str = None, folders: list = None, files: list = None, loaded: bool = False):
         self.url = url
         self.name = name
         self.path = path
         self.folders = folders or list()
         self.files = files or list()
-        self.type = 'MoodleFolder'
+        self.loaded = loaded  # if the files were fetched from the folder page
 
 
 class MoodleFile(MoodleData):
     """
     This class holds neccesary information for a moodle file
     """
-    def __init__(self, url: str, name: str = None, path: str = None):
+    __slots__ = ('url', 'name', 'path', 'download_path', 'size', 'hash', 'etag', 'last_modified')
+
+    def __init__(self, url: str, name: str = None, path: str = None, download_path: str = None,
+                 size: int = None, hash: str = None, etag: str = None, last_modified: str = None):
         self.url = url
         self.name = name
         self.path = path
-        self.type = 'MoodleFile'
+        self.download_path = download_path
+        self.size = size
+        self.hash = hash
+        self.etag = etag
+        self.last_modified = last_modified
 
 
 class MoodleAssignment(MoodleData):  # needs to be tested
     """
     This class holds neccesary information for a moodle assignment
     """
-    def __init__(self, url: str, name: str = None, status: str = None, due_date: str = None):
+    __slots__ = ('url', 'name', 'status', 'due_date', 'loaded')
+
+    def __init__(self, url: str, name: str = None, status: str = None, due_date: str = None, loaded: bool = False):
         self.url = url
         self.name = name
         self.status = status
         self.due_date = due_date
-        self.type = 'MoodleAssignment'
+        self.loaded = loaded  # if the status was fetched from the assignment page
 
 
 class MoodleUrl(MoodleData):
     """
     This class holds neccesary information for a moodle url
     """
-    def __init__(self, url: str, name: str, path: str = None):
+    __slots__ = ('url', 'name', 'path', 'download_path')
+
+    def __init__(self, url: str, name: str, path: str = None, download_path: str = None):
         self.url = url
         self.name = name
         self.path = path
-        self.type = 'MoodleUrl'
+        self.download_path = download_path
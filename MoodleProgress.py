@@ -0,0 +1,213 @@
+"""
+This file contains the ProgressTracker, which collects the progress of all
+downloads of a sync and reports it to its listeners a few times per second
+"""
+
+import time
+
+
+class FileProgress:
+    """
+    Holds the progress of a single download
+    """
+    def __init__(self, url, name, total=None, received=0):
+        self.url = url
+        self.name = name
+        self.total = total  # None if the server didn't send a Content-Length
+        self.received = received
+        self.start = time.monotonic()
+        self.done = False
+        self.failed = False
+
+    @property
+    def rate(self) -> float:
+        """
+        Returns:
+            float: The bytes per second received since the download started
+        """
+        elapsed = time.monotonic() - self.start
+        return self.received / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'name': self.name, 'received': self.received, 'total': self.total,
+                'rate': round(self.rate), 'done': self.done, 'failed': self.failed}
+
+
+class ProgressEvent:
+    """
+    Holds the progress of all downloads at one moment and the
+    files whose progress changed since the event before
+    """
+    def __init__(self, files_done, files_failed, files_total, bytes_received, bytes_total, rate, eta, files):
+        self.files_done = files_done
+        self.files_failed = files_failed
+        self.files_total = files_total
+        self.bytes_received = bytes_received
+        self.bytes_total = bytes_total  # estimated from the files of which the size is known
+        self.rate = rate  # bytes per second
+        self.eta = eta  # seconds until all files are downloaded or None if unknown
+        self.files = files  # the FileProgress of every file which changed
+
+    def to_dict(self) -> dict:
+        return {'files_done': self.files_done, 'files_failed': self.files_failed, 'files_total': self.files_total,
+                'bytes_received': self.bytes_received, 'bytes_total': self.bytes_total,
+                'rate': round(self.rate), 'eta': round(self.eta) if self.eta is not None else None,
+                'files': [file.to_dict() for file in self.files]}
+
+    def __str__(self):
+        message = f'{self.files_done}/{self.files_total} Files'
+        if self.files_failed:  # otherwise a finished sync with failed files looks like it stopped early
+            message += f', {self.files_failed} failed'
+        message += f', {format_size(self.rate)}/s'
+        if self.eta is not None:
+            message += f', {int(self.eta // 60)}:{int(self.eta % 60):02} left'
+        return message
+
+
+def format_size(size) -> str:
+    """
+    Formats an amount of bytes for humans
+
+    Parameters:
+        size (float): The amount of bytes
+
+    Returns:
+        str: The amount with a unit like 1.5 MB
+    """
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1000 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1000
+
+
+class ProgressTracker:
+    """
+    Collects the progress of the downloads through a MoodleSession, every chunk only
+    updates counters and the listeners are called at most every interval with an event
+    containing all changes since the last one, so large syncs don't flood them
+    """
+    DEFAULT_INTERVAL = 0.25  # seconds
+
+    def __init__(self, interval=DEFAULT_INTERVAL, smoothing=0.3):
+        """
+        The constructor for ProgressTracker
+
+        Parameters:
+            interval (float): The seconds between two events at least
+            smoothing (float): How much the latest measured rate counts towards the shown rate
+        """
+        self.interval = interval
+        self.smoothing = smoothing
+        self.listeners = []
+        self.reset()
+
+    def reset(self, files_total=0) -> None:
+        """
+        Forgets the progress of all downloads
+
+        Parameters:
+            files_total (int): The amount of files that are going to be downloaded
+        """
+        self.files = {}
+        self.files_total = files_total
+        self.files_done = 0
+        self.files_failed = 0
+        self.bytes_received = 0
+        self.rate = None
+        self._changed = {}
+        self._last_emit = time.monotonic()
+        self._last_bytes = 0
+
+    def add_listener(self, listener) -> None:
+        """
+        Parameters:
+            listener (function): Is called with a ProgressEvent at most every interval
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        self.listeners.remove(listener)
+
+    def start_file(self, url, name, total=None, received=0) -> None:
+        """
+        Records that a download has started, a download which is retried starts over
+
+        Parameters:
+            url (str): The url of the file
+            name (str): The name of the file
+            total (int): The size of the file in bytes, if known
+            received (int): The bytes downloaded before, by an earlier run
+        """
+        change = received - (self.files[url].received if url in self.files else 0)
+        self.files[url] = self._changed[url] = FileProgress(url, name, total, received)
+        self.bytes_received += change
+        self._last_bytes += change  # these bytes weren't received now, so they don't count towards the rate
+
+    def advance(self, url, size) -> None:
+        """
+        Records that a chunk of a download was received
+
+        Parameters:
+            url (str): The url of the file
+            size (int): The size of the chunk in bytes
+        """
+        progress = self.files[url]
+        progress.received += size
+        self.bytes_received += size
+        self._changed[url] = progress
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def finish_file(self, url, failed=False) -> None:
+        """
+        Records that a download has finished
+
+        Parameters:
+            url (str): The url of the file
+            failed (bool): If the download failed
+        """
+        progress = self.files.get(url)
+        if progress is None:  # urls and files linked from an earlier download don't start a transfer
+            progress = self.files[url] = FileProgress(url, None)
+        progress.done, progress.failed = True, failed
+        self._changed[url] = progress
+        if failed:
+            self.files_failed += 1
+        else:
+            self.files_done += 1
+        if self.files_done + self.files_failed == self.files_total or time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def estimate_total(self) -> int:
+        """
+        Returns:
+            int: The bytes of all files, where files of unknown size count as large as the average known file
+        """
+        sizes = [progress.total for progress in self.files.values() if progress.total is not None]
+        if not sizes:
+            return None
+        return sum(sizes) + (self.files_total - len(sizes)) * sum(sizes) // len(sizes)
+
+    def emit(self) -> None:
+        """
+        Calls the listeners with the progress since the last event
+        """
+        now = time.monotonic()
+        elapsed = now - self._last_emit
+        if elapsed > 0:
+            measured = (self.bytes_received - self._last_bytes) / elapsed
+            self.rate = measured if self.rate is None else self.smoothing * measured + (1 - self.smoothing) * self.rate
+        self._last_emit, self._last_bytes = now, self.bytes_received
+
+        bytes_total = self.estimate_total()
+        if self.files_done + self.files_failed == self.files_total:
+            eta = 0.0
+        elif bytes_total is not None and self.rate:
+            eta = max(0, bytes_total - self.bytes_received) / self.rate
+        else:
+            eta = None
+        event = ProgressEvent(self.files_done, self.files_failed, self.files_total, self.bytes_received,
+                              bytes_total, self.rate or 0.0, eta, list(self._changed.values()))
+        self._changed = {}
+        for listener in self.listeners:
+            listener(event)
@@ -0,0 +1,201 @@
+"""
+This file contains the RequestTimer, which measures every request of a
+MoodleSession, and the report written after every sync
+"""
+
+import os
+import time
+from datetime import datetime
+
+from aiohttp import TraceConfig         # reference: https://docs.aiohttp.org/en/stable/tracing_reference.html
+
+from MoodleStorage import dump_json
+
+
+class RequestTiming:
+    """
+    Holds the timings of a single request, all times are seconds
+    """
+    def __init__(self, url, method, start):
+        self.url = url
+        self.method = method
+        self.start = start
+        self.status = None
+        self.dns = 0.0
+        self.connect = 0.0
+        self.ttfb = None  # time to the first byte, until the response headers arrived
+        self.end = None  # when the last chunk of the body arrived
+        self.bytes = 0
+        self.parse = 0.0
+        self.error = None
+
+    @property
+    def transfer(self) -> float:
+        if self.ttfb is None or self.end is None:
+            return 0.0
+        return self.end - self.start - self.ttfb
+
+    @property
+    def total(self) -> float:
+        return (self.ttfb or 0.0) + self.transfer + self.parse
+
+    def to_dict(self) -> dict:
+        return {'url': self.url, 'method': self.method, 'status': self.status, 'error': self.error,
+                'dns': round(self.dns, 4), 'connect': round(self.connect, 4), 'ttfb': round(self.ttfb or 0.0, 4),
+                'transfer': round(self.transfer, 4), 'parse': round(self.parse, 4), 'total': round(self.total, 4),
+                'bytes': self.bytes}
+
+
+class RequestTimer:
+    """
+    Measures DNS, connect, time to first byte, transfer time, bytes and parse time
+    of every request sent by the MoodleSession it's passed to
+    """
+    def __init__(self):
+        self.timings = []
+        self._last = {}  # the last timing of every url
+        self.trace_config = TraceConfig()
+        self.trace_config.on_request_start.append(self._on_request_start)
+        self.trace_config.on_dns_resolvehost_start.append(self._on_dns_start)
+        self.trace_config.on_dns_resolvehost_end.append(self._on_dns_end)
+        self.trace_config.on_connection_create_start.append(self._on_connect_start)
+        self.trace_config.on_connection_create_end.append(self._on_connect_end)
+        self.trace_config.on_request_end.append(self._on_request_end)
+        self.trace_config.on_response_chunk_received.append(self._on_chunk)
+        self.trace_config.on_request_exception.append(self._on_exception)
+
+    def reset(self) -> None:
+        """
+        Forgets all measured requests
+        """
+        self.timings = []
+        self._last = {}
+
+    def add_parse_time(self, url, seconds) -> None:
+        """
+        Adds the time needed to parse a page to the last request of its url
+
+        Parameters:
+            url (str): The url of the page
+            seconds (float): The time needed to parse the page
+        """
+        timing = self._last.get(url)
+        if timing:
+            timing.parse += seconds
+
+    def add_streamed_body(self, url, size) -> None:
+        """
+        Records the body of a response which was streamed, as aiohttp only
+        reports the chunks of bodies that are read at once
+
+        Parameters:
+            url (str): The requested url
+            size (int): The amount of bytes received
+        """
+        timing = self._last.get(url)
+        if timing:
+            timing.bytes += size
+            timing.end = time.monotonic()
+
+    # The hooks get a context which is shared by all hooks of the same request, including its redirects
+
+    async def _on_request_start(self, session, context, params):
+        if not hasattr(context, 'timing'):
+            context.timing = RequestTiming(str(params.url), params.method, time.monotonic())
+            self.timings.append(context.timing)
+            self._last[context.timing.url] = context.timing
+
+    async def _on_dns_start(self, session, context, params):
+        context.dns_start = time.monotonic()
+
+    async def _on_dns_end(self, session, context, params):
+        context.timing.dns += time.monotonic() - context.dns_start
+
+    async def _on_connect_start(self, session, context, params):
+        context.connect_start = time.monotonic()
+
+    async def _on_connect_end(self, session, context, params):
+        context.timing.connect += time.monotonic() - context.connect_start
+
+    async def _on_request_end(self, session, context, params):
+        context.timing.status = params.response.status
+        context.timing.ttfb = time.monotonic() - context.timing.start
+        context.timing.end = time.monotonic()
+
+    async def _on_chunk(self, session, context, params):
+        context.timing.bytes += len(params.chunk)
+        context.timing.end = time.monotonic()
+
+    async def _on_exception(self, session, context, params):
+        context.timing.error = repr(params.exception)
+
+
+def create_report(moodle, downloaded_files, failed_files, started, wall_time, changes=(), slowest=20) -> dict:
+    """
+    Summarises a sync
+
+    Parameters:
+        moodle (MoodleSession): The session the sync ran with, with a RequestTimer
+        downloaded_files (list): The downloaded files
+        failed_files (list): The files of which the download failed
+        started (datetime): When the sync started
+        wall_time (float): The seconds the sync took
+        changes (list): The CourseDiff of every course that changed since the last sync
+        slowest (int): The amount of slowest requests listed
+
+    Returns:
+        dict: The report, which can be dumped as JSON
+    """
+    timings = moodle.timer.timings if moodle.timer else []
+    by_url = {timing.url: timing for timing in timings}
+
+    courses = {}
+    for file in downloaded_files:
+        course = courses.setdefault(file.path.split('/', 1)[0], {'files': 0, 'bytes': 0, 'seconds': 0.0})
+        course['files'] += 1
+        course['bytes'] += getattr(file, 'size', None) or 0
+        if file.url in by_url:
+            course['seconds'] += by_url[file.url].total
+    for course in courses.values():  # bytes per second of the requests of the course if they had run one after another
+        course['throughput'] = round(course['bytes'] / course['seconds']) if course['seconds'] else None
+        course['seconds'] = round(course['seconds'], 3)
+
+    report = {
+        'started': started.isoformat(),
+        'wall_time': round(wall_time, 3),
+        'requests': len(timings),
+        'bytes': sum(timing.bytes for timing in timings),
+        'downloaded': len(downloaded_files),
+        'failed': [file.url for file in failed_files],
+        'slowest': [timing.to_dict() for timing in sorted(timings, key=lambda timing: timing.total, reverse=True)[:slowest]],
+        'courses': courses,
+        'changes': {course_diff.course.name: course_diff.to_dict() for course_diff in changes},
+    }
+    if moodle.cache:
+        lookups = moodle.cache.hits + moodle.cache.misses
+        report['cache'] = {'hits': moodle.cache.hits, 'misses': moodle.cache.misses,
+                           'hit_rate': round(moodle.cache.hits / lookups, 3) if lookups else None}
+    if moodle.limiter:
+        report['concurrency'] = moodle.limiter.stats()
+    return report
+
+
+def write_report(report, directory, keep=20) -> str:
+    """
+    Writes a report to the directory and removes the oldest reports
+
+    Parameters:
+        report (dict): The report of a sync
+        directory (str): The folder the reports are stored in
+        keep (int): The amount of reports kept
+
+    Returns:
+        str: The path of the report
+    """
+    # with microseconds, as a daemon with a short interval or a test can sync twice within a second
+    path = f"{directory}/sync-{datetime.fromisoformat(report['started']).strftime('%Y%m%d-%H%M%S-%f')}.json"
+    dump_json(report, path)
+    reports = sorted(name for name in os.listdir(directory) if name.startswith('sync-'))
+    for name in reports[:-keep]:
+        os.remove(f'{directory}/{name}')
+    return path
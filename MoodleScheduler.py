@@ -0,0 +1,188 @@
+"""
+This file contains the DownloadScheduler class which is used to download
+many files through a MoodleSession at once and the AdaptiveLimiter which
+limits the requests of a MoodleSession
+"""
+
+import time
+import heapq                            # reference: https://docs.python.org/3/library/heapq.html
+import asyncio
+from itertools import count
+from collections import deque
+from urllib.parse import urlsplit
+
+
+class DownloadScheduler:
+    """
+    Downloads queued files through a MoodleSession while limiting how many
+    downloads run at once, both in total and for every host
+    """
+    DEFAULT_CONCURRENCY = 8
+    DEFAULT_HOST_CONCURRENCY = 4
+
+    def __init__(self, moodle, base_path, concurrency=DEFAULT_CONCURRENCY, host_concurrency=DEFAULT_HOST_CONCURRENCY):
+        """
+        The constructor for DownloadScheduler
+
+        Parameters:
+            moodle (MoodleSession): The authenticated session used to download
+            base_path (str): The path to which the files are to be downloaded
+            concurrency (int): The maximum amount of downloads running at once
+            host_concurrency (int): The maximum amount of downloads running at once per host
+        """
+        self.moodle = moodle
+        self.base_path = base_path
+        self.concurrency = concurrency
+        self.host_concurrency = host_concurrency
+
+        self._queue = []
+        self._counter = count()  # keeps files with the same priority in the order they were added
+        self._host_semaphores = {}
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, file, priority=0) -> None:
+        """
+        Queues a file to be downloaded
+
+        Parameters:
+            file (MoodleFile): The file to be downloaded
+            priority (int): Files with a lower priority are downloaded first
+        """
+        heapq.heappush(self._queue, (priority, next(self._counter), file))
+
+    def _host_semaphore(self, url) -> asyncio.Semaphore:
+        """
+        Gets the semaphore limiting the downloads of the host of the url
+
+        Parameters:
+            url (str): The url that is to be downloaded
+
+        Returns:
+            asyncio.Semaphore: The semaphore of the host
+        """
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_semaphores[host]
+
+    async def run(self):
+        """
+        Downloads all queued files and yields every file as soon as its
+        download has finished, a failed download doesn't stop the others
+
+        Yields:
+            tuple: The file and the path it was downloaded to or the exception its download failed with
+        """
+        finished = asyncio.Queue()
+
+        async def worker():
+            while self._queue:
+                _, _, file = heapq.heappop(self._queue)
+                try:
+                    async with self._host_semaphore(file.url):
+                        path = await self.moodle.download_file(file, self.base_path)
+                except Exception as e:
+                    await finished.put((file, e))
+                else:
+                    await finished.put((file, path))
+
+        total = len(self._queue)
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.concurrency, total))]
+
+        try:
+            for _ in range(total):
+                yield await finished.get()
+        finally:
+            for task in workers:  # stops the remaining downloads if the caller stops early
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+
+class AdaptiveLimiter:
+    """
+    Limits how many requests run at once and adapts the limit like TCP does:
+    it grows slowly while the latency stays flat and is cut in half as soon as
+    requests time out or Moodle answers that it's too busy
+    """
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, initial=4, minimum=1, maximum=32, tolerance=2.0, slack=0.05, window=60.0):
+        """
+        The constructor for AdaptiveLimiter
+
+        Parameters:
+            initial (int): The limit to start with
+            minimum (int): The limit never drops below this
+            maximum (int): The limit never grows above this
+            tolerance (float): How many times slower than the fastest seen request
+                               requests may get before the limit shrinks
+            slack (float): The seconds requests may always get slower, so jitter
+                           of very fast requests doesn't shrink the limit
+            window (float): The seconds the fastest request is remembered for, so the
+                            limit adapts if the route to Moodle changed for good
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.slack = slack
+        self.window = window
+
+        self.in_flight = 0
+        self.base_latency = None  # the lowest latency within the window, which is the latency without queueing
+        self.latency = None  # the smoothed latency of the recent requests
+        self._minimums = deque()  # the time and latency of every request no later request was faster than
+        self.requests = 0
+        self.errors = 0
+        self._condition = None
+
+    async def __aenter__(self):
+        if self._condition is None:  # created on first use, so it belongs to the running event loop
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def observe(self, latency=None, error=False) -> None:
+        """
+        Adapts the limit to the outcome of a request
+
+        Parameters:
+            latency (float): The seconds until the response arrived
+            error (bool): If the request timed out, lost its connection or Moodle was too busy
+        """
+        self.requests += 1
+        if error:  # multiplicative decrease
+            self.errors += 1
+            self.limit = max(self.minimum, self.limit / 2)
+            return
+
+        now = self.clock()
+        while self._minimums and self._minimums[-1][1] >= latency:  # can't be the minimum anymore
+            self._minimums.pop()
+        self._minimums.append((now, latency))
+        while self._minimums[0][0] < now - self.window:  # forgets minimums older than the window
+            self._minimums.popleft()
+        self.base_latency = self._minimums[0][1]
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+        if self.latency <= self.base_latency * self.tolerance + self.slack:  # additive increase, about one per full window of requests
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:  # requests are queueing somewhere, so fewer are sent at once
+            self.limit = max(self.minimum, self.limit - 1 / self.limit)
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: The current limit and the measurements it's based on
+        """
+        return {'limit': round(self.limit, 2), 'in_flight': self.in_flight, 'requests': self.requests, 'errors': self.errors,
+                'base_latency': self.base_latency, 'latency': self.latency}
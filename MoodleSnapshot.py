@@ -0,0 +1,129 @@
+"""
+This file contains the SnapshotStore, which keeps the content of every course
+found by the last sync, and the diff of a course against its snapshot
+"""
+
+import hashlib
+
+from MoodleDataTypes import MoodleCourse
+from MoodleStorage import dump_json, load_json
+
+
+class SnapshotStore:
+    """
+    Stores the content of every course as it was found by the last sync
+    """
+    def __init__(self, directory):
+        """
+        The constructor for SnapshotStore
+
+        Parameters:
+            directory (str): The folder the snapshots are stored in
+        """
+        self.directory = directory
+
+    def _path(self, url) -> str:
+        return f'{self.directory}/{hashlib.sha1(url.encode()).hexdigest()}.json'
+
+    def load(self, url) -> MoodleCourse:
+        """
+        Gets the snapshot of a course
+
+        Parameters:
+            url (str): The url of the course
+
+        Returns:
+            MoodleCourse: The course as it was found by the last sync or None if it was never synced
+        """
+        course_dict = load_json(self._path(url))
+        return MoodleCourse.from_dict(course_dict) if course_dict else None
+
+    def save(self, course) -> None:
+        """
+        Replaces the snapshot of a course
+
+        Parameters:
+            course (MoodleCourse): The course with all its content
+        """
+        dump_json(course.to_dict(), self._path(course.url))
+
+
+def course_items(course) -> dict:
+    """
+    Lists every item of a course with the path it's found at
+
+    Parameters:
+        course (MoodleCourse): The course
+
+    Returns:
+        dict: The item and its path by the url of the item
+    """
+    items = {}
+    for section in course.sections:
+        items[section.url] = (section, '')
+        for folder in section.folders:
+            items[folder.url] = (folder, f'{section.name}{"/" + folder.path if folder.path else ""}')
+        for file in section.files:  # contains the files of the folders as well
+            items[file.url] = (file, file.path)
+        for assignment in section.assignments:
+            items[assignment.url] = (assignment, section.name)
+    return items
+
+
+class CourseDiff:
+    """
+    Holds what changed in a course since its snapshot, items are identified
+    by their url, as Moodle keeps it when an item is renamed or moved
+    """
+    def __init__(self, old_course, new_course):
+        """
+        The constructor for CourseDiff
+
+        Parameters:
+            old_course (MoodleCourse): The snapshot of the course
+            new_course (MoodleCourse): The course as it's found now
+        """
+        self.course = new_course
+        self.added = []  # the new items
+        self.removed = []  # the old items
+        self.renamed = []  # the old and the new item
+        self.moved = []  # the old and the new item, which has another path and maybe another name
+
+        old_items = course_items(old_course)
+        new_items = course_items(new_course)
+
+        for url, (item, path) in new_items.items():
+            if url not in old_items:
+                self.added.append(item)
+                continue
+            old_item, old_path = old_items[url]
+            if old_path != path:
+                self.moved.append((old_item, item))
+            elif old_item.name != item.name:
+                self.renamed.append((old_item, item))
+
+        self.removed = [item for url, (item, _) in old_items.items() if url not in new_items]
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed or self.moved)
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: The type and name of every changed item, which can be dumped as JSON
+        """
+        def describe(item):
+            return {'type': item.type, 'url': item.url, 'name': item.name}
+
+        return {'added': [describe(item) for item in self.added],
+                'removed': [describe(item) for item in self.removed],
+                'renamed': [{**describe(new), 'old_name': old.name} for old, new in self.renamed],
+                'moved': [{**describe(new), 'old_name': old.name} for old, new in self.moved]}
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: What changed in the course in a few words
+        """
+        counts = [(len(self.added), 'added'), (len(self.removed), 'removed'), (len(self.renamed), 'renamed'), (len(self.moved), 'moved')]
+        return f'{self.course.name}: ' + ', '.join(f'{amount} {kind}' for amount, kind in counts if amount)
@@ -0,0 +1,831 @@
+"""
+This file contains all classes used to persist data in the data folder
+"""
+
+import os
+import time
+import base64
+import sqlite3
+import hashlib
+from json import loads, dumps
+from http.cookies import SimpleCookie
+
+from yarl import URL
+
+try:  # cryptography is optional, without it the session cookies aren't stored
+    from cryptography.fernet import Fernet, InvalidToken  # reference: https://cryptography.io/en/latest/fernet/
+except ImportError:
+    Fernet = InvalidToken = None
+
+try:  # orjson is optional, it reads and writes the JSON files a lot faster than json
+    import orjson                       # reference: https://github.com/ijl/orjson
+except ImportError:
+    orjson = None
+
+
+def dump_json(data, path) -> None:
+    """
+    Writes data as JSON to a temporary file and renames it to the given path,
+    so the file is never left half written
+
+    Parameters:
+        data: The data to be written
+        path (str): The path of the JSON file
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as json_file:
+        json_file.write(orjson.dumps(data) if orjson else dumps(data).encode())
+    os.replace(f'{path}.tmp', path)
+
+
+def load_json(path, default=None):
+    """
+    Reads a JSON file
+
+    Parameters:
+        path (str): The path of the JSON file
+        default: Returned if the file doesn't exist or is invalid
+
+    Returns:
+        The content of the JSON file
+    """
+    try:
+        with open(path, 'rb') as json_file:  # read as bytes, as orjson writes UTF-8 and json writes ASCII
+            content = json_file.read()
+        return orjson.loads(content) if orjson else loads(content)
+    except (OSError, ValueError):
+        return default
+
+
+def hash_file(path, chunk_size=64 * 1024) -> str:
+    """
+    Hashes a file in chunks, so it's never held in memory at once
+
+    Parameters:
+        path (str): The path of the file
+        chunk_size (int): The bytes read at once
+
+    Returns:
+        str: The sha256 hash of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadJournal:
+    """
+    Keeps track of unfinished downloads, so they can be resumed where they stopped
+    """
+    def __init__(self, path):
+        """
+        The constructor for DownloadJournal
+
+        Parameters:
+            path (str): The path of the JSON file the journal is stored in
+        """
+        self.path = path
+        self.entries = load_json(path, {})
+
+    def get(self, url) -> dict:
+        """
+        Gets the entry of an unfinished download
+
+        Parameters:
+            url (str): The url of the file
+
+        Returns:
+            dict: contains 'part', 'etag' and 'last_modified' or None if there is no usable entry
+        """
+        entry = self.entries.get(url)
+        if entry is None or not os.path.exists(entry['part']):
+            return None
+        return entry
+
+    def start(self, url, part, etag=None, last_modified=None) -> None:
+        """
+        Records a download that has started
+
+        Parameters:
+            url (str): The url of the file
+            part (str): The path of the partially downloaded file
+            etag (str): The ETag header of the response
+            last_modified (str): The Last-Modified header of the response
+        """
+        self.entries[url] = {'part': part, 'etag': etag, 'last_modified': last_modified}
+        dump_json(self.entries, self.path)
+
+    def finish(self, url) -> None:
+        """
+        Removes a download from the journal once it's complete
+
+        Parameters:
+            url (str): The url of the file
+        """
+        if self.entries.pop(url, None) is not None:
+            dump_json(self.entries, self.path)
+
+
+class HttpCache:
+    """
+    Stores the pages fetched from Moodle together with their ETag and
+    Last-Modified headers, so they are only transferred again if they changed
+    """
+    DEFAULT_MAX_SIZE = 50 * 1024 * 1024  # bytes
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        """
+        The constructor for HttpCache
+
+        Parameters:
+            directory (str): The folder the cached pages are stored in
+            max_size (int): The amount of bytes after which the least recently used pages are removed
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.index = load_json(f'{directory}/index.json', {})
+        self.size = sum(entry['size'] for entry in self.index.values())  # kept up to date, so it's never summed up again
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url, extension) -> str:
+        return f'{self.directory}/{hashlib.sha1(url.encode()).hexdigest()}.{extension}'
+
+    def headers(self, url) -> dict:
+        """
+        Creates the headers for a conditional request of the url
+
+        Parameters:
+            url (str): The url to be requested
+
+        Returns:
+            dict: The If-None-Match and If-Modified-Since headers if the page is cached
+        """
+        entry = self.index.get(url)
+        headers = {}
+        if entry is None:
+            return headers
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def get(self, url) -> str:
+        """
+        Gets the cached body of a page
+
+        Parameters:
+            url (str): The url of the page
+
+        Returns:
+            str: The body of the page or None if it isn't cached
+        """
+        if url not in self.index:
+            return None
+        try:
+            with open(self._path(url, 'html'), 'r', encoding='utf-8') as body_file:
+                body = body_file.read()
+        except OSError:
+            self.size -= self.index.pop(url)['size']
+            return None
+        self.index[url]['used'] = time.time()
+        return body
+
+    def get_parsed(self, url, parser):
+        """
+        Gets the result of a parser which was previously stored for the cached page
+
+        Parameters:
+            url (str): The url of the page
+            parser (str): The name of the parser
+
+        Returns:
+            The parsed page or None if it isn't cached
+        """
+        if url not in self.index:
+            return None
+        parsed = load_json(self._path(url, 'json'), {}).get(parser)
+        if parsed is not None:
+            self.index[url]['used'] = time.time()
+        return parsed
+
+    def store(self, url, body, etag=None, last_modified=None) -> None:
+        """
+        Caches a page, as long as the server sent headers to validate it with
+
+        Parameters:
+            url (str): The url of the page
+            body (str): The body of the page
+            etag (str): The ETag header of the response
+            last_modified (str): The Last-Modified header of the response
+        """
+        if not etag and not last_modified:  # The page can't be requested conditionally, so there's no use in caching it
+            self.remove(url)  # and an older version of it mustn't be served on a 304 anymore
+            return
+        if os.path.exists(self._path(url, 'json')):  # Results parsed from the old body are outdated
+            os.remove(self._path(url, 'json'))
+        with open(self._path(url, 'html'), 'w', encoding='utf-8') as body_file:
+            body_file.write(body)
+        size = self.index[url]['size'] if url in self.index else 0
+        self.index[url] = {'etag': etag, 'last_modified': last_modified, 'size': size, 'used': time.time()}
+        self._resize(url, os.path.getsize(self._path(url, 'html')))
+
+    def store_parsed(self, url, parser, parsed) -> None:
+        """
+        Stores the result of a parser for a cached page
+
+        Parameters:
+            url (str): The url of the page
+            parser (str): The name of the parser
+            parsed: The JSON serializable result of the parser
+        """
+        if url not in self.index:
+            return
+        all_parsed = load_json(self._path(url, 'json'), {})
+        all_parsed[parser] = parsed
+        dump_json(all_parsed, self._path(url, 'json'))
+        self._resize(url, os.path.getsize(self._path(url, 'html')) + os.path.getsize(self._path(url, 'json')))
+
+    def _resize(self, url, size) -> None:
+        """
+        Sets the size of a cached page and evicts pages once the cache grows larger than max_size
+        """
+        self.size += size - self.index[url]['size']
+        self.index[url]['size'] = size
+        if self.size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used pages until the cache is a tenth smaller than max_size,
+        so the pages aren't sorted again for every page stored afterwards
+        """
+        for url in sorted(self.index, key=lambda url: self.index[url]['used']):
+            if self.size <= self.max_size * 0.9:
+                break
+            self.remove(url)
+
+    def remove(self, url) -> None:
+        """
+        Removes a page and its parsed results from the cache
+
+        Parameters:
+            url (str): The url of the page
+        """
+        if url in self.index:
+            self.size -= self.index.pop(url)['size']
+        for extension in ('html', 'json'):
+            if os.path.exists(self._path(url, extension)):
+                os.remove(self._path(url, extension))
+
+    def save(self) -> None:
+        """
+        Writes the index of the cache to disk, which is done once after every
+        sync instead of for every page, as it lists all cached pages
+        """
+        dump_json(self.index, f'{self.directory}/index.json')
+
+
+class SyncIndex:
+    """
+    Keeps track of all downloaded files in an SQLite database,
+    so every file can be looked up without loading all of them
+    """
+    COLUMNS = ('url', 'type', 'name', 'path', 'download_path', 'size', 'hash', 'etag', 'last_modified', 'downloaded_at')
+
+    def __init__(self, path, legacy_path=None):
+        """
+        The constructor for SyncIndex
+
+        Parameters:
+            path (str): The path of the SQLite database
+            legacy_path (str): The path of the files.json used by older versions,
+                               its files are added to the index the first time it's opened
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path)  # reference: https://docs.python.org/3/library/sqlite3.html
+        self.connection.execute('CREATE TABLE IF NOT EXISTS files (url TEXT PRIMARY KEY, type TEXT, name TEXT, path TEXT, '
+                                'download_path TEXT, size INTEGER, hash TEXT, etag TEXT, last_modified TEXT, downloaded_at REAL)')
+        self.connection.execute('DROP INDEX IF EXISTS files_downloaded_at')  # the history is kept by DownloadLog
+        self.connection.execute('CREATE INDEX IF NOT EXISTS files_etag ON files (etag, size)')
+
+        if legacy_path and self.connection.execute('PRAGMA user_version').fetchone()[0] == 0:
+            self._migrate(legacy_path)
+
+    def _migrate(self, legacy_path) -> None:
+        """
+        Adds all files of a files.json to the index
+
+        Parameters:
+            legacy_path (str): The path of the files.json
+        """
+        legacy_files = load_json(legacy_path, [])
+        with self.connection:  # commits all files at once
+            for file in legacy_files:
+                try:  # files.json didn't record when a file was downloaded, the file's mtime comes closest
+                    downloaded_at = os.path.getmtime(file.get('download_path') or '')
+                except OSError:
+                    downloaded_at = None
+                self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                        (file['url'], file.get('type'), file.get('name'), file.get('path'),
+                                         file.get('download_path'), None, None, None, None, downloaded_at))
+            self.connection.execute('PRAGMA user_version = 1')
+
+    def __contains__(self, url) -> bool:
+        return self.connection.execute('SELECT 1 FROM files WHERE url = ?', (url,)).fetchone() is not None
+
+    def get(self, url) -> dict:
+        """
+        Gets a downloaded file
+
+        Parameters:
+            url (str): The url of the file
+
+        Returns:
+            dict: The columns of the file or None if it wasn't downloaded
+        """
+        row = self.connection.execute(f'SELECT {", ".join(self.COLUMNS)} FROM files WHERE url = ?', (url,)).fetchone()
+        return dict(zip(self.COLUMNS, row)) if row else None
+
+    def find_blob(self, etag, size) -> str:
+        """
+        Finds the hash of a downloaded file with the given ETag and size
+
+        Parameters:
+            etag (str): The ETag header of the response
+            size (int): The Content-Length header of the response
+
+        Returns:
+            str: The sha256 hash of the file or None if no such file was downloaded
+        """
+        if etag is None or size is None:
+            return None
+        row = self.connection.execute('SELECT hash FROM files WHERE etag = ? AND size = ? AND hash IS NOT NULL LIMIT 1',
+                                      (etag, size)).fetchone()
+        return row[0] if row else None
+
+    def find_path(self, download_path) -> str:
+        """
+        Finds the file downloaded to a path
+
+        Parameters:
+            download_path (str): The path the file was downloaded to
+
+        Returns:
+            str: The url of the file or None if no file was downloaded to the path
+        """
+        row = self.connection.execute('SELECT url FROM files WHERE download_path = ? LIMIT 1', (download_path,)).fetchone()
+        return row[0] if row else None
+
+    def add(self, file) -> None:
+        """
+        Adds a downloaded file to the index or updates it
+
+        Parameters:
+            file (MoodleFile): The downloaded file
+        """
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (file.url, file.type, file.name, file.path, file.download_path,
+                                     getattr(file, 'size', None), getattr(file, 'hash', None), getattr(file, 'etag', None),
+                                     getattr(file, 'last_modified', None), time.time()))
+
+    def move(self, url, path, download_path) -> None:
+        """
+        Records that a downloaded file was moved locally
+
+        Parameters:
+            url (str): The url of the file
+            path (str): The new path of the file relative to the download folder
+            download_path (str): The path the file was moved to
+        """
+        with self.connection:
+            self.connection.execute('UPDATE files SET path = ?, download_path = ? WHERE url = ?', (path, download_path, url))
+
+    def close(self) -> None:
+        """
+        Closes the database
+        """
+        self.connection.close()
+
+
+class DownloadLog:
+    """
+    Keeps the history of downloaded files shown in the app as a JSON-lines file,
+    which is only ever appended to, so the whole history is never rewritten during a sync.
+    Files moved locally get a move record, which is applied to their entries when they're read
+    """
+    DEFAULT_MAX_ENTRIES = 5000
+    DEFAULT_COMPACT_SIZE = 4 * 1024 * 1024  # bytes
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, path, legacy_path=None, max_entries=DEFAULT_MAX_ENTRIES, compact_size=DEFAULT_COMPACT_SIZE):
+        """
+        The constructor for DownloadLog
+
+        Parameters:
+            path (str): The path of the log
+            legacy_path (str): The path of the files.json used by older versions,
+                               its files are written to the log if the log doesn't exist yet
+            max_entries (int): The amount of entries kept when the log is compacted
+            compact_size (int): The size in bytes above which the log is compacted
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.compact_size = compact_size
+
+        if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+            legacy_files = load_json(legacy_path, [])[-max_entries:]
+            self._write([{key: file.get(key) for key in ('url', 'type', 'name', 'path', 'download_path')}
+                         for file in legacy_files])
+
+    @staticmethod
+    def _encode(entry) -> bytes:
+        return (orjson.dumps(entry) if orjson else dumps(entry).encode()) + b'\n'
+
+    def _write(self, entries) -> None:
+        """
+        Replaces the log with the entries, the oldest first
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f'{self.path}.tmp', 'wb') as log_file:
+            log_file.write(b''.join(self._encode(entry) for entry in entries))
+            log_file.flush()
+            os.fsync(log_file.fileno())
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def append(self, files) -> None:
+        """
+        Appends downloaded files to the log with a single write, which is
+        flushed to the disk before returning
+
+        Parameters:
+            files (list): The downloaded files
+        """
+        if not files:
+            return
+        now = time.time()
+        self._append(b''.join(self._encode({'url': file.url, 'type': file.type, 'name': file.name, 'path': file.path,
+                                            'download_path': file.download_path, 'size': getattr(file, 'size', None),
+                                            'downloaded_at': now}) for file in files))
+
+    def move(self, files) -> None:
+        """
+        Records that downloaded files were moved locally, so the history shows their new path
+
+        Parameters:
+            files (list): The moved files with their new path and download path
+        """
+        if not files:
+            return
+        now = time.time()
+        self._append(b''.join(self._encode({'url': file.url, 'path': file.path, 'download_path': file.download_path,
+                                            'moved_at': now}) for file in files))
+
+    def _append(self, lines) -> None:
+        """
+        Appends encoded entries with a single write, compacting the log once it's too large
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a+b') as log_file:
+            if log_file.tell():  # a crash during an earlier append can leave a line without its newline
+                log_file.seek(-1, os.SEEK_END)
+                if log_file.read(1) != b'\n':
+                    lines = b'\n' + lines
+            log_file.write(lines)
+            log_file.flush()
+            os.fsync(log_file.fileno())  # reference: https://docs.python.org/3/library/os.html#os.fsync
+            size = log_file.tell()
+
+        if size > self.compact_size:
+            self.compact()
+
+    def tail(self, amount) -> list:
+        """
+        Gets the most recently downloaded files by reading the log backwards,
+        so only the blocks containing them are read however long the log is
+
+        Parameters:
+            amount (int): The amount of files
+
+        Returns:
+            list: A dict of every file, the newest first
+        """
+        entries = []
+        moves = {}  # the newest move of every file, read before the entries it applies to
+        try:
+            log_file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return entries
+
+        with log_file:
+            position = log_file.seek(0, os.SEEK_END)
+            rest = b''  # the start of a line which continues in the block read before
+            while position and len(entries) < amount:
+                size = min(self.BLOCK_SIZE, position)
+                position -= size
+                log_file.seek(position)
+                lines = (log_file.read(size) + rest).split(b'\n')
+                rest = lines.pop(0) if position else b''  # the first line might start in the previous block
+                for line in reversed(lines):
+                    if len(entries) == amount:
+                        break
+                    if not line:
+                        continue
+                    try:
+                        entry = orjson.loads(line) if orjson else loads(line)
+                    except ValueError:  # skips a line which was cut off by a crash
+                        continue
+                    if 'moved_at' in entry:
+                        moves.setdefault(entry['url'], entry)
+                        continue
+                    move = moves.get(entry.get('url'))
+                    if move:
+                        entry['path'], entry['download_path'] = move['path'], move['download_path']
+                    entries.append(entry)
+        return entries
+
+    def compact(self) -> None:
+        """
+        Rewrites the log with only the newest entry of every file
+        and at most max_entries entries, which already have their moves applied
+        """
+        entries, urls = [], set()
+        for entry in self.tail(self.max_entries):
+            if entry.get('url') not in urls:
+                urls.add(entry.get('url'))
+                entries.append(entry)
+        self._write(reversed(entries))
+
+
+class BlobStore:
+    """
+    Stores every downloaded file once by its hash and hard links
+    it to all the paths the file was downloaded to
+    """
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, directory):
+        """
+        The constructor for BlobStore
+
+        Parameters:
+            directory (str): The folder the files are stored in
+        """
+        self.directory = directory
+
+    def path(self, file_hash) -> str:
+        """
+        Gets the path of a stored file
+
+        Parameters:
+            file_hash (str): The sha256 hash of the file
+
+        Returns:
+            str: The path of the stored file
+        """
+        return f'{self.directory}/{file_hash[:2]}/{file_hash}'
+
+    def __contains__(self, file_hash) -> bool:
+        return file_hash is not None and os.path.exists(self.path(file_hash))
+
+    @staticmethod
+    def _fingerprint(path) -> list:
+        """
+        Gets what changes when a file is edited, without reading the file
+
+        Parameters:
+            path (str): The path of the file
+
+        Returns:
+            list: The size, modification time and inode of the file
+        """
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def _remember(self, file_hash) -> None:
+        """
+        Stores the fingerprint of a stored file next to it, so verify only hashes it again once it changed
+        """
+        try:
+            dump_json(self._fingerprint(self.path(file_hash)), f'{self.path(file_hash)}.stat')
+        except OSError:  # the file was removed in the meantime by a verify in another thread
+            pass
+
+    def verify(self, file_hash) -> bool:
+        """
+        Checks if a stored file still has its hash, as editing any of its links
+        in place, like annotating a PDF, changes the stored file as well.
+        The file is only hashed again if its size, modification time or inode changed.
+        A changed file is removed from the store, the edited link stays as it is
+
+        Parameters:
+            file_hash (str): The sha256 hash of the file
+
+        Returns:
+            bool: If the stored file can be linked
+        """
+        try:
+            if self._fingerprint(self.path(file_hash)) == load_json(f'{self.path(file_hash)}.stat'):
+                return True
+            stored_hash = hash_file(self.path(file_hash), self.CHUNK_SIZE)
+        except OSError:
+            return False
+        if stored_hash == file_hash:
+            self._remember(file_hash)
+            return True
+        for path in (self.path(file_hash), f'{self.path(file_hash)}.stat'):
+            try:
+                os.remove(path)
+            except OSError:  # already removed by a verify in another thread
+                pass
+        return False
+
+    def add(self, path, file_hash) -> None:
+        """
+        Stores a downloaded file by adding a hard link to it to the store, if the same
+        file is already stored the downloaded file is replaced with a link to the stored one.
+        If the file system doesn't support hard links the file is left where it is and
+        isn't stored, as a copy would take up the space of the file twice
+
+        Parameters:
+            path (str): The path of the downloaded file
+            file_hash (str): The sha256 hash of the file
+        """
+        if file_hash in self:
+            self.link(file_hash, path)
+        if file_hash not in self:  # nothing is stored yet or the stored file was edited and removed by link
+            os.makedirs(os.path.dirname(self.path(file_hash)), exist_ok=True)
+            try:
+                os.link(path, self.path(file_hash))  # reference: https://docs.python.org/3/library/os.html#os.link
+            except OSError:  # FAT and exFAT drives and some network shares don't support hard links
+                return
+            self._remember(file_hash)
+
+    def prune(self) -> int:
+        """
+        Removes the stored files which aren't linked to any path anymore,
+        as the store would keep the files deleted by the user forever
+
+        Returns:
+            int: The amount of removed files
+        """
+        removed = 0
+        for folder in os.scandir(self.directory) if os.path.isdir(self.directory) else ():
+            for blob in os.scandir(folder.path) if folder.is_dir() else ():
+                if blob.name.endswith(('.stat', '.tmp')):
+                    continue
+                try:
+                    if os.stat(blob.path).st_nlink > 1:  # the store's own link is the only one left otherwise
+                        continue
+                    os.remove(blob.path)
+                except OSError:
+                    continue
+                if os.path.exists(f'{blob.path}.stat'):
+                    os.remove(f'{blob.path}.stat')
+                removed += 1
+        return removed
+
+    def link(self, file_hash, path) -> bool:
+        """
+        Hard links a stored file to a path, if it still has its hash
+
+        Parameters:
+            file_hash (str): The sha256 hash of the file
+            path (str): The path the file should appear at
+
+        Returns:
+            bool: If the file was linked, otherwise it has to be downloaded
+        """
+        if not self.verify(file_hash):
+            return False
+        if os.path.exists(f'{path}.link'):  # left behind by an earlier run which was interrupted
+            os.remove(f'{path}.link')
+        try:
+            os.link(self.path(file_hash), f'{path}.link')
+        except OSError:
+            return False
+        os.replace(f'{path}.link', path)
+        return True
+
+
+class CookieStore:
+    """
+    Stores the cookies of an authenticated session encrypted with a key
+    derived from the logindata, so later sessions don't have to log in again
+    """
+    ITERATIONS = 200000
+
+    def __init__(self, path):
+        """
+        The constructor for CookieStore
+
+        Parameters:
+            path (str): The path of the file the cookies are stored in
+        """
+        self.path = path
+
+    @staticmethod
+    def _fernet(logindata, salt):
+        """
+        Derives the key used to encrypt the cookies
+
+        Parameters:
+            logindata (dict): contains 'username' and 'password'
+            salt (bytes): The random salt stored with the cookies
+
+        Returns:
+            Fernet: Encrypts and decrypts the cookies
+        """
+        secret = f"{logindata['username']}\n{logindata['password']}".encode()
+        key = hashlib.pbkdf2_hmac('sha256', secret, salt, CookieStore.ITERATIONS)  # https://docs.python.org/3/library/hashlib.html#key-derivation
+        return Fernet(base64.urlsafe_b64encode(key))
+
+    def save(self, cookie_jar, logindata) -> None:
+        """
+        Encrypts and stores all cookies of a cookie jar, deriving the key takes
+        a while, so it's run in an executor by MoodleSession
+
+        Parameters:
+            cookie_jar (aiohttp.CookieJar): The cookies of the authenticated session, or a list of its morsels
+            logindata (dict): contains 'username' and 'password'
+        """
+        if Fernet is None:
+            return
+        cookies = [{'key': morsel.key, 'value': morsel.value,
+                    **{attribute: morsel[attribute] for attribute in ('domain', 'path', 'expires', 'max-age', 'secure', 'httponly')}}
+                   for morsel in cookie_jar]
+        salt = os.urandom(16)
+        token = self._fernet(logindata, salt).encrypt(dumps(cookies).encode())
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(f'{self.path}.tmp', 'wb') as cookie_file:
+            cookie_file.write(salt + token)
+        os.replace(f'{self.path}.tmp', self.path)
+
+    def read(self, logindata):
+        """
+        Decrypts the stored cookies, deriving the key takes a while, so it's
+        run in an executor by MoodleSession
+
+        Parameters:
+            logindata (dict): contains 'username' and 'password'
+
+        Returns:
+            list: The stored cookies, or None if there are none or the logindata changed
+        """
+        if Fernet is None or not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as cookie_file:
+            content = cookie_file.read()
+        try:
+            return loads(self._fernet(logindata, content[:16]).decrypt(content[16:]))
+        except (InvalidToken, ValueError):
+            return None
+
+    @staticmethod
+    def add(cookie_jar, cookies, url) -> None:
+        """
+        Adds the cookies read from the store to a cookie jar
+
+        Parameters:
+            cookie_jar (aiohttp.CookieJar): The cookie jar of the new session
+            cookies (list): The cookies returned by read
+            url (str): The url the cookies were received from
+        """
+        for cookie in cookies:  # cookies with the same name but another domain are added one by one
+            key = cookie.pop('key')
+            simple_cookie = SimpleCookie()
+            simple_cookie[key] = cookie.pop('value')
+            for attribute, value in cookie.items():
+                if value:
+                    simple_cookie[key][attribute] = value
+            cookie_jar.update_cookies(simple_cookie, URL(url))
+
+    def load(self, cookie_jar, logindata, url) -> bool:
+        """
+        Decrypts the stored cookies and adds them to a cookie jar
+
+        Parameters:
+            cookie_jar (aiohttp.CookieJar): The cookie jar of the new session
+            logindata (dict): contains 'username' and 'password'
+            url (str): The url the cookies were received from
+
+        Returns:
+            bool: If cookies were loaded, which fails if the logindata changed
+        """
+        cookies = self.read(logindata)
+        if cookies is None:
+            return False
+        self.add(cookie_jar, cookies, url)
+        return True
+
+    def clear(self) -> None:
+        """
+        Removes the stored cookies
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
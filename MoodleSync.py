@@ -0,0 +1,190 @@
+"""
+This file contains the sync of the checked courses, which is shared by
+the app and the command line and therefore mustn't import PyQt5
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime
+
+from Moodle import MoodleSession, MoodleConfig, MoodleParser
+from MoodleDataTypes import MoodleCourse, MoodleFile, MoodleUrl
+from MoodleScheduler import DownloadScheduler
+from MoodleStorage import DownloadJournal, DownloadLog, HttpCache, BlobStore, CookieStore, load_json
+from MoodleReport import RequestTimer, create_report, write_report
+from MoodleProgress import ProgressTracker
+from MoodleSnapshot import SnapshotStore, CourseDiff
+
+DATA_PATH = './data'
+
+
+def create_session(config, index, data_path=DATA_PATH, **kwargs) -> MoodleSession:
+    """
+    Creates a MoodleSession configured by the config
+
+    Parameters:
+        config (dict): The content of config.json
+        index (SyncIndex): The index of the downloaded files
+        data_path (str): The folder the data of xMoodle is stored in
+
+    Returns:
+        MoodleSession: The session, which isn't logged in yet
+    """
+    return MoodleSession(config['urls']['home'], config['urls']['login'],
+                         config=MoodleConfig.from_dict(config),
+                         journal=DownloadJournal(f'{data_path}/downloads.json'),
+                         cache=HttpCache(f'{data_path}/cache', config.get('cache_size', HttpCache.DEFAULT_MAX_SIZE)),
+                         index=index, blobs=BlobStore(f"{config['default_path']}/.xmoodle/blobs"),
+                         cookies=CookieStore(f'{data_path}/session'),
+                         timer=RequestTimer(),
+                         progress=ProgressTracker(),
+                         **kwargs)
+
+
+def move_files(course_diff, base_path, index, log=None) -> int:
+    """
+    Moves the downloaded files which were moved or renamed on Moodle,
+    instead of downloading them again
+
+    Parameters:
+        course_diff (CourseDiff): The changes of a course
+        base_path (str): The folder the files are downloaded to
+        index (SyncIndex): The index of the downloaded files
+        log (DownloadLog): The history shown in the app, gets the new paths as well if given
+
+    Returns:
+        int: The amount of moved files
+    """
+    course = course_diff.course
+    moved = []
+    for old, new in course_diff.moved + course_diff.renamed:
+        if not isinstance(new, (MoodleFile, MoodleUrl)):
+            continue
+        entry = index.get(new.url)
+        if not entry or not entry['download_path'] or not os.path.exists(entry['download_path']):
+            continue
+
+        if isinstance(new, MoodleUrl):  # the shortcut of a url is named after the url
+            name = f'{MoodleParser.parse_windows(new.name)}.url'
+        else:  # files are named like on the server, which doesn't change when they're renamed on Moodle
+            name = os.path.basename(entry['download_path'])
+        path = f'{base_path}/{course.name}/{new.path}/{name}'
+        if path == entry['download_path'] or os.path.exists(path):
+            continue
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(entry['download_path'], path)
+        index.move(new.url, f'{course.name}/{new.path}', path)
+        moved.append(MoodleFile(new.url, new.name, f'{course.name}/{new.path}', path))
+
+        folder = os.path.dirname(entry['download_path'])
+        while folder.startswith(f'{base_path}/{course.name}/') and not os.listdir(folder):  # removes the folders left empty
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+    if log:
+        log.move(moved)
+    return len(moved)
+
+
+async def sync(moodle, config, index, state=print, data_path=DATA_PATH) -> list:
+    """
+    Downloads all new files of the checked courses, moves the files which were
+    moved on Moodle, appends the downloaded files to the history and writes
+    a report of the sync with the changes of every course to the reports folder
+
+    Parameters:
+        moodle (MoodleSession): The logged in session
+        config (dict): The content of config.json
+        index (SyncIndex): The index of the downloaded files
+        state (function): Is called with a message whenever the state of the sync changes
+        data_path (str): The folder the data of xMoodle is stored in
+
+    Returns:
+        list: The downloaded files
+    """
+    started, start = datetime.now(), time.monotonic()
+    if moodle.timer:  # A daemon reuses the session, but every report only covers its own sync
+        moodle.timer.reset()
+    if moodle.cache:
+        moodle.cache.hits = moodle.cache.misses = 0
+
+    state('Gathering Course Content...')
+
+    courses = []
+
+    for course in load_json(f'{data_path}/courses.json', []):
+        if course['checked']:
+            new_course = MoodleCourse.from_dict(course)
+            courses.append(new_course)
+
+    log = DownloadLog(f'{data_path}/history.jsonl', legacy_path=f'{data_path}/files.json')  # the history shown in the app
+    snapshots = SnapshotStore(f'{data_path}/snapshots')
+    old_courses = {course.url: snapshots.load(course.url) for course in courses}  # what the last sync found
+
+    await asyncio.gather(*[moodle.get_course_content(course, snapshot=old_courses[course.url])  # fills the course instances with the content found on Moodle
+                           for course in courses])
+    if moodle.cache:  # the session can outlive many syncs, so the cache is saved after every crawl
+        moodle.cache.save()
+
+    changes = []
+
+    for course in courses:  # compares every course with its snapshot
+        snapshot = old_courses[course.url]
+        if snapshot:
+            course_diff = CourseDiff(snapshot, course)
+            if course_diff:
+                changes.append(course_diff)
+                state(course_diff.summary())
+                move_files(course_diff, config['default_path'], index, log)
+        snapshots.save(course)
+
+    state('Comparing Files...')
+
+    scheduler = DownloadScheduler(moodle, f"{config['default_path']}",
+                                  config.get('concurrency', DownloadScheduler.DEFAULT_CONCURRENCY),
+                                  config.get('host_concurrency', DownloadScheduler.DEFAULT_HOST_CONCURRENCY))
+
+    queued = set()  # a file linked twice would be downloaded to the same path twice at once
+    for course in courses:
+        for i, section in enumerate(course.sections):
+            for file in section.files:
+                if file.url not in index and file.url not in queued:
+                    queued.add(file.url)
+                    file.path = f'{course.name}/{file.path}'
+                    scheduler.add(file, priority=-i)  # the most recently added sections are downloaded first
+
+    total = len(scheduler)
+    downloaded_files = []
+    moodle.release_paths()
+
+    state(f'Downloading Files... (0/{total} Files)')
+    if moodle.progress:
+        moodle.progress.reset(total)
+
+    failed_files = []
+
+    async for file, result in scheduler.run():  # downloads all the files and reports every finished file
+        if isinstance(result, Exception):  # The file isn't added to the index, so it's downloaded again on the next sync
+            state(f'Failed to Download {file.name}: {result!r}')
+            failed_files.append(file)
+        else:
+            index.add(file)  # only the downloaded file is written to the index
+            downloaded_files.append(file)
+        if moodle.progress:  # reports the finished files together with the bytes and rate a few times per second
+            moodle.progress.finish_file(file.url, failed=isinstance(result, Exception))
+        else:
+            state(f'Downloading Files... ({len(downloaded_files) + len(failed_files)}/{total} Files)')
+
+    if failed_files:
+        state(f'{len(failed_files)} Files Failed')
+
+    log.append(downloaded_files)
+    if moodle.blobs:  # the files the user deleted are only removed from the disk once the store lets go of them
+        await asyncio.get_event_loop().run_in_executor(None, moodle.blobs.prune)
+
+    report = create_report(moodle, downloaded_files, failed_files, started, time.monotonic() - start, changes)
+    write_report(report, f'{data_path}/reports')
+
+    return downloaded_files
@@ -1,6 +1,7 @@
 import os
 import sys
 import asyncio
+import threading
 import traceback
 import webbrowser
 import subprocess
@@ -10,8 +11,10 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QListWidgetItem, QSystem
 from PyQt5.QtGui import QIcon
 from PyQt5 import uic, QtCore
 from aiohttp.client_exceptions import ClientConnectionError
-from Moodle import MoodleSession, MoodleParser, IncorrectLogindata
-from MoodleDataTypes import MoodleCourse
+from Moodle import MoodleConfig, MoodleParser, IncorrectLogindata, TemporaryServerError
+from MoodleScheduler import DownloadScheduler
+from MoodleStorage import HttpCache, SyncIndex, DownloadLog, load_json, dump_json
+from MoodleSync import create_session, sync
 
 
 class MoodleApp(QMainWindow):
@@ -23,9 +26,12 @@ class MoodleApp(QMainWindow):
     download_running = False
     minimised = False
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, worker, *args, **kwargs):
         """
         Constructor for MoodleApp
+
+        Parameters:
+            worker (MoodleWorker): Runs all requests to Moodle in the background
         """
         def check_for_file(filename, l=False):
             """
@@ -47,19 +53,19 @@ class MoodleApp(QMainWindow):
         uic.loadUi('mainpage.ui', self)
         self.setFixedSize(902, 501)
 
-        self.threadpool = QtCore.QThreadPool()
+        self.worker = worker
 
         if not check_for_file('./data/config.json'):
             self.set_default_settings()
 
         with open('./data/config.json', 'r') as configfile:
             self.config = load(configfile)
+        self.worker.config = self.config  # shared, so the worker sees the changes made in the settings
 
         check_for_file('./data/courses.json', l=True)
-        check_for_file('./data/files.json', l=True)
         check_for_file('./data/assignments.json', l=True)
 
-        self.settings = Settings(self.config)
+        self.settings = Settings(self.config, self.worker)
 
         self.tray_icon = QSystemTrayIcon(self)              # https://evileg.com/en/post/68/
         self.tray_icon.setIcon(QIcon('./xmoodleicon.png'))
@@ -100,7 +106,12 @@ class MoodleApp(QMainWindow):
         """
         with open('./data/config.json', 'w') as wfile:
             default_urls = {'home': 'https://moodle.ksz.ch/my/', 'login': 'https://moodle.ksz.ch/login/index.php'}
-            config_dict = {'default_path': None, 'minimise': True, 'urls': default_urls, 'logindata': None}
+            config_dict = {'default_path': None, 'minimise': True, 'urls': default_urls, 'logindata': None,
+                           'concurrency': DownloadScheduler.DEFAULT_CONCURRENCY,
+                           'host_concurrency': DownloadScheduler.DEFAULT_HOST_CONCURRENCY,
+                           'crawl_concurrency': MoodleConfig.DEFAULT_CRAWL_CONCURRENCY,
+                           'parse_mode': None, 'parse_workers': None,
+                           'cache_size': HttpCache.DEFAULT_MAX_SIZE}
             dump(config_dict, wfile)
 
     def open_file(self, path):
@@ -168,22 +179,23 @@ class MoodleApp(QMainWindow):
         if self.download_running:
             return
         self.download_running = True
-        worker = DownloadWorker(self.config)
-        worker.signals.state.connect(self.downloadLabel.setText)
-        worker.signals.finished.connect(download_finished)
-        self.threadpool.start(worker)
+        signals = TaskSignals()
+        signals.state.connect(self.downloadLabel.setText)
+        signals.progress.connect(lambda event: self.downloadLabel.setText(f'Downloading Files... ({event})'))
+        signals.finished.connect(lambda downloaded_files: download_finished(len(downloaded_files)))
+        signals.error.connect(download_error)
+        self.worker.submit(self.worker.sync(signals.state.emit, signals.progress.emit), signals)
 
     def update_files_list(self):
         """
         Updates the files list with the 50 most recently downloaded files
         """
-        with open('./data/files.json', 'r') as files_file:
-            files_to_show = load(files_file)[:50:-1]
+        files_to_show = DownloadLog('./data/history.jsonl', legacy_path='./data/files.json').tail(50)
 
         self.filesList.clear()
 
         for file in files_to_show:
-            item = QListWidgetItem(f"{file['path'].split('/', 1)[0]}: {file['name']}")
+            item = QListWidgetItem(f"{(file.get('path') or '').split('/', 1)[0]}: {file['name']}")  # older entries can have no path
             item.path = file['download_path']
             self.filesList.addItem(item)
 
@@ -216,15 +228,20 @@ class Settings(QMainWindow):
     Inherits from PyQt5.QtWidgets.QMainWindow and will be the
     second window for the application, serving as the settings
     """
-    def __init__(self, config, *args, **kwargs):
+    def __init__(self, config, worker, *args, **kwargs):
         """
         Settings constructor
+
+        Parameters:
+            config (dict): The config shared with the MoodleApp
+            worker (MoodleWorker): Runs all requests to Moodle in the background
         """
         super().__init__(*args, **kwargs)
         uic.loadUi('settings.ui', self)
         self.setFixedSize(421, 394)
 
         self.config = config
+        self.worker = worker
 
         self.passwordInput.setEchoMode(QLineEdit.Password)  # https://stackoverflow.com/questions/18275771/pyqt-how-do-make-my-text-have-an-asterisk-on-it
         self.minimiseCheckBox.setChecked(config['minimise'])
@@ -253,25 +270,15 @@ class Settings(QMainWindow):
         self.usernameInput.setText('')
         self.passwordInput.setText('')
 
-        loop = asyncio.get_event_loop()
-        moodle = MoodleSession(self.config['urls']['home'], self.config['urls']['login'])
-
-        try:
-            loop.run_until_complete(moodle.login(dict(logindata)))
-        except IncorrectLogindata:
-            self.usernameInput.setText('Incorrect Logindata')
-        except ClientConnectionError:
-            self.usernameInput.setText('No Internet Connection')
-        except TimeoutError:
-            self.usernameInput.setText('Bad Network Connection')
-        except Exception as e:  # Log the error here
-            self.usernameInput.setText('Error')
-            print(traceback.format_exc())
-        else:
+        def logged_in(_):
             self.usernameInput.setText('Success')
             self.config['logindata'] = logindata
 
-        loop.run_until_complete(moodle.close())
+        self.usernameInput.setText('Logging In...')
+        signals = TaskSignals()  # connected before submitting, as the login can fail before submit returns
+        signals.finished.connect(logged_in)
+        signals.error.connect(self.usernameInput.setText)
+        self.worker.submit(self.worker.login(logindata), signals)  # the window stays responsive while logging in
 
     def save_settings(self):
         """
@@ -288,43 +295,27 @@ class Settings(QMainWindow):
             course.course_dict['checked'] = bool(course.checkState())
             courses.append(course.course_dict)
 
-        with open('./data/courses.json', 'w') as config_file:
-            dump(courses, config_file)
+        dump_json(courses, './data/courses.json')
 
         self.hide()
 
     def refresh_courses(self):
         """
-        Refreshes the list of courses
+        Refreshes the list of courses in the background
         """
-        loop = asyncio.get_event_loop()
-        moodle = MoodleSession(self.config['urls']['home'], self.config['urls']['login'])
-
-        try:
-            loop.run_until_complete(moodle.login(dict(self.config['logindata'])))
-        except IncorrectLogindata:
-            loop.run_until_complete(moodle.close())
-            self.coursesList.addItem('Incorrect Logindata')
-            return
-        except ClientConnectionError:
-            loop.run_until_complete(moodle.close())
-            self.coursesList.addItem('No Internet Connection')
-            return
-        except TimeoutError:
-            loop.run_until_complete(moodle.close())
-            self.coursesList.addItem('Bad Network Connection')
-            return
-        except Exception as e:  # Log the error here
-            loop.run_until_complete(moodle.close())
-            self.coursesList.addItem('Error')
-            print(traceback.format_exc())
-            return
+        signals = TaskSignals()
+        signals.finished.connect(self.add_courses)
+        signals.error.connect(self.coursesList.addItem)
+        self.worker.submit(self.worker.get_courses(), signals)
 
-        courses = loop.run_until_complete(moodle.get_courses())
-        loop.run_until_complete(moodle.close())
+    def add_courses(self, courses):
+        """
+        Adds the courses which aren't in the list yet
 
-        with open('./data/courses.json', 'r') as courses_file:
-            found_courses = load(courses_file)
+        Parameters:
+            courses (list): The courses found on Moodle
+        """
+        found_courses = load_json('./data/courses.json', [])
 
         course_urls = [course['url'] for course in found_courses]
 
@@ -333,8 +324,7 @@ class Settings(QMainWindow):
                 course.checked = False
                 found_courses.append(course.to_dict())
 
-        with open('./data/courses.json', 'w') as courses_file:
-            dump(found_courses, courses_file)
+        dump_json(found_courses, './data/courses.json')
 
         self.update_courses_list()
 
@@ -342,8 +332,7 @@ class Settings(QMainWindow):
         """
         Updates the courses list
         """
-        with open('./data/courses.json', 'r') as courses_file:
-            courses = load(courses_file)
+        courses = load_json('./data/courses.json', [])
 
         self.coursesList.clear()
 
@@ -356,116 +345,168 @@ class Settings(QMainWindow):
             self.coursesList.addItem(item)
 
 
-class DownloadWorker(QtCore.QRunnable):  # https://www.learnpyqt.com/tutorials/multithreading-pyqt-applications-qthreadpool/
+class MoodleWorker:
     """
-    Inherits from PyQt5.QtCore.QRunnable and serves as a new Thread
-    for the App to perform it's downloads on
+    Runs an asyncio event loop on a background thread for the whole lifetime of
+    the app, the loop owns one MoodleSession so its connections and cookies are
+    reused by all actions, which are submitted as coroutines and report back through signals
     """
-    def __init__(self, config):
+    def __init__(self, config=None):
         """
-        DownloadWorker constructor
+        The constructor for MoodleWorker
 
         Parameters:
-            config (dict): config for the download
+            config (dict): The content of config.json, shared with the app
         """
-        super().__init__()
         self.config = config
-        self.signals = DownloadWorkerSignals()
-
-    @QtCore.pyqtSlot()
-    def run(self):
-        """
-        Runs the download and reports it's state by emiting signals
-        """
-        self.signals.state.emit('Logging In...')
-        loop = asyncio.new_event_loop()
-        moodle = MoodleSession(self.config['urls']['home'], self.config['urls']['login'], loop=loop)
+        self.moodle = None
+        self.index = None
+        self._session_key = None  # the settings the session was created and logged in with
+        self._lock = None
+        self._pending = set()  # keeps the signals of running actions alive
 
-        try:
-            loop.run_until_complete(moodle.login(dict(self.config['logindata'])))
-        except IncorrectLogindata:
-            loop.run_until_complete(moodle.close())
-            self.signals.error.emit('Incorrect Logindata')
-            return
-        except ClientConnectionError:
-            loop.run_until_complete(moodle.close())
-            self.signals.error.emit('No Internet Connection')
-            return
-        except TimeoutError:
-            loop.run_until_complete(moodle.close())
-            self.signals.error.emit('Bad Network Connection')
-            return
-        except Exception as e:
-            loop.run_until_complete(moodle.close())
-            self.signals.error.emit('Error')  # Log the error here
-            print(traceback.format_exc())
-            return
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='MoodleWorker', daemon=True)
+        self.thread.start()
 
-        self.signals.state.emit('Gathering Course Content...')
-
-        with open('./data/courses.json', 'r') as courses_file:
-            all_courses = load(courses_file)
-
-        courses = []
-
-        for course in all_courses:
-            if course['checked']:
-                new_course = MoodleCourse.from_dict(course)
-                courses.append(new_course)
-
-        course_content = asyncio.gather(*[moodle.get_course_content(course) for course in courses], loop=loop)
-        loop.run_until_complete(course_content)  # fills the course instances with the content found on Moodle
+    def submit(self, coroutine, signals):
+        """
+        Runs a coroutine on the loop of the worker
 
-        self.signals.state.emit('Comparing Files...')
+        Parameters:
+            coroutine (coroutine): The action to be run
+            signals (TaskSignals): The signals the result is reported through, which have to be connected
+                                   before submitting, as the coroutine can finish before submit returns
+
+        Returns:
+            TaskSignals: The signals, which emit finished with the result or error with a message once the coroutine is done
+        """
+        self._pending.add(signals)
+        signals.done.connect(lambda: self._pending.discard(signals))
+
+        def report(future):  # called on the thread of the loop, the signals are delivered on the GUI thread
+            try:
+                signals.finished.emit(future.result())
+            except IncorrectLogindata:
+                signals.error.emit('Incorrect Logindata')
+            except ClientConnectionError:
+                signals.error.emit('No Internet Connection')
+            except asyncio.TimeoutError:
+                signals.error.emit('Bad Network Connection')
+            except TemporaryServerError as e:  # Moodle was still busy or down after all retries
+                signals.error.emit(f'Moodle Is Unavailable ({e.status})')
+            except Exception:  # Log the error here
+                print(traceback.format_exc())
+                signals.error.emit('Error')
+            signals.done.emit()
+
+        asyncio.run_coroutine_threadsafe(coroutine, self.loop).add_done_callback(report)  # https://docs.python.org/3/library/asyncio-task.html#asyncio.run_coroutine_threadsafe
+        return signals
+
+    async def session(self, logindata=None):
+        """
+        Gets the logged in session, it's only created and logged in again
+        if the settings changed or Moodle logged it out
 
-        with open('./data/files.json', 'r') as files_file:
-            downloaded_files = load(files_file)
+        Parameters:
+            logindata (dict): The logindata to log in with, the one of the config if None
 
-        downloaded_files_urls = [file['url'] for file in downloaded_files]
+        Returns:
+            MoodleSession: The logged in session
+        """
+        if self._lock is None:  # created on the loop of the worker
+            self._lock = asyncio.Lock()
 
-        files_to_download = []
+        logindata = dict(logindata or self.config['logindata'])
+        key = (self.config['urls']['home'], self.config['urls']['login'], self.config['default_path'], tuple(sorted(logindata.items())))
 
-        for course in courses:
-            for section in course.sections:
-                for file in section.files:
-                    if file.url not in downloaded_files_urls:
-                        file.path = f'{course.name}/{file.path}'
-                        files_to_download.append(file)
+        async with self._lock:  # actions submitted at once don't log in twice
+            if self.moodle is not None and key[:3] != self._session_key[:3]:
+                await self.close()
+            if self.moodle is None:
+                self.index = SyncIndex('./data/index.sqlite', legacy_path='./data/files.json')
+                self.moodle = create_session(self.config, self.index)
+                self._session_key = key[:3] + (None,)
 
-        self.signals.state.emit(f'Downloading Files... ({len(files_to_download)} Files)')
+            if self._session_key != key or not await self.moodle.is_logged_in():
+                self._session_key = key[:3] + (None,)  # stays logged out if the login fails
+                self.moodle.cookie_jar.clear()  # doesn't keep the cookies of other logindata
+                await self.moodle.login(dict(logindata))
+                self._session_key = key
+        return self.moodle
 
-        file_download = [moodle.download_file(file, f"{self.config['default_path']}") for file in files_to_download]
-        downloaded_paths = loop.run_until_complete(asyncio.gather(*file_download, loop=loop))  # downloads all the files
+    async def login(self, logindata):
+        """
+        Logs in with new logindata
+        """
+        await self.session(logindata)
 
-        loop.run_until_complete(moodle.close())  # closes the Moodle session
+    async def get_courses(self) -> list:
+        moodle = await self.session()
+        return await moodle.get_courses()
 
-        for i, file in enumerate(files_to_download):
-            file.download_path = downloaded_paths[i]  # adds the download path to the file data
+    async def sync(self, state, progress=None) -> list:
+        """
+        Downloads all new files of the checked courses
 
-        downloaded_files += [file.to_dict() for file in files_to_download]
+        Parameters:
+            state (function): Is called with a message whenever the state of the sync changes
+            progress (function): Is called with a ProgressEvent a few times per second while downloading
 
-        with open('./data/files.json', 'w') as files_file:
-            dump(downloaded_files, files_file)
+        Returns:
+            list: The downloaded files
+        """
+        state('Logging In...')
+        moodle = await self.session()
+        if progress:
+            moodle.progress.add_listener(progress)
+        try:
+            downloaded_files = await sync(moodle, self.config, self.index, state)
+        finally:
+            if progress:
+                moodle.progress.remove_listener(progress)
+        state(f'{len(downloaded_files)} Files Downloaded')
+        return downloaded_files
 
-        self.signals.state.emit(f'{len(files_to_download)} Files Downloaded')
+    async def close(self) -> None:
+        """
+        Closes the session and the index
+        """
+        if self.moodle is not None:
+            await self.moodle.close()
+            self.index.close()
+        self.moodle = self.index = self._session_key = None
 
-        self.signals.finished.emit(len(files_to_download))
+    def stop(self) -> None:
+        """
+        Closes the session and stops the loop, called when the app quits
+        """
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout=10)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
 
 
-class DownloadWorkerSignals(QtCore.QObject):
+class TaskSignals(QtCore.QObject):
     """
     Inherits from PyQt5.QtCore.QObject will contain the signals
-    that the DownloadWorker can emit
+    that an action submitted to the MoodleWorker can emit
     """
     state = QtCore.pyqtSignal(str)
-    finished = QtCore.pyqtSignal(int)
+    progress = QtCore.pyqtSignal(object)  # a ProgressEvent, emitted a few times per second at most
+    finished = QtCore.pyqtSignal(object)
     error = QtCore.pyqtSignal(str)
+    done = QtCore.pyqtSignal()  # emitted last, after finished or error
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
 
-    moodle_app = MoodleApp()
+    worker = MoodleWorker()
+    app.aboutToQuit.connect(worker.stop)
+
+    moodle_app = MoodleApp(worker)
     moodle_app.show()
 
     try:
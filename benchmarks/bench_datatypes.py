@@ -0,0 +1,163 @@
+"""
+Compares the memory and (de)serialization time of the MoodleDataTypes
+with the __dict__ based Data Types they replaced
+
+Usage:
+    python benchmarks/bench_datatypes.py [--courses N] [--files N]
+
+Every course has ten sections, each with a folder, assignments and files
+"""
+
+import os
+import sys
+import json
+import timeit
+import argparse
+import tracemalloc                      # reference: https://docs.python.org/3/library/tracemalloc.html
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MoodleDataTypes  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+REPEAT = 20  # the best of many runs, as single runs are noisy
+SECTIONS = 10
+
+
+class LegacyData:
+    """
+    The Data Types as they were before they had __slots__
+    """
+    def to_dict(self) -> dict:
+        data_dict = dict()
+        for key, value in self.__dict__.items():
+            if isinstance(value, list):
+                value = [item.to_dict() for item in value]
+            data_dict[key] = value
+        return data_dict
+
+    @classmethod
+    def from_dict(cls, data_dict: dict):
+        self = cls.__new__(cls)
+        for key, value in data_dict.items():
+            if isinstance(value, list):
+                value = [LEGACY_TYPES[item['type']].from_dict(item) for item in value]
+            self.__setattr__(key, value)
+        return self
+
+
+def legacy_type(name, fields, lists):
+    def __init__(self, url, name_):
+        self.url = url
+        self.name = name_
+        for field in fields:
+            setattr(self, field, None)
+        for field in lists:
+            setattr(self, field, list())
+        self.type = name
+    return type(name, (LegacyData,), {'__init__': __init__})
+
+
+LEGACY_TYPES = {  # the same attributes as the MoodleDataTypes, so both store the same data
+    'MoodleCourse': legacy_type('MoodleCourse', ['checked', 'loaded'], ['sections']),
+    'MoodleSection': legacy_type('MoodleSection', ['fingerprint', 'crawled_at'], ['folders', 'files', 'assignments']),
+    'MoodleFolder': legacy_type('MoodleFolder', ['path', 'loaded'], ['folders', 'files']),
+    'MoodleFile': legacy_type('MoodleFile', ['path', 'download_path', 'size', 'hash', 'etag', 'last_modified'], []),
+    'MoodleAssignment': legacy_type('MoodleAssignment', ['status', 'due_date', 'loaded'], []),
+}
+
+
+def check_legacy_types() -> None:
+    """
+    Makes sure the legacy Data Types weren't forgotten when an attribute was added
+    """
+    for name, legacy in LEGACY_TYPES.items():
+        attributes = set(legacy('url', 'name').__dict__) - {'type'}
+        data_type = MoodleDataTypes.TYPES[name]
+        assert attributes == set(data_type.__slots__) - set(data_type.TRANSIENT), f'{name} has other attributes than the legacy type'
+
+
+def create_courses(types, courses, files) -> list:
+    """
+    Creates course trees with the given Data Types
+
+    Parameters:
+        types (dict): The Data Types by name
+        courses (int): The amount of courses
+        files (int): The amount of files in every section, half of them in a folder
+
+    Returns:
+        list: The courses
+    """
+    url = 'https://moodle.ksz.ch/mod/resource/view.php?id='
+    course_list = []
+    for c in range(courses):
+        course = types['MoodleCourse'](f'https://moodle.ksz.ch/course/view.php?id={c}', f'Course {c}')
+        for s in range(SECTIONS):
+            section = types['MoodleSection'](f'{course.url}#section-{s}', f'Topic {s}')
+            folder = types['MoodleFolder'](f'{url}{c}{s}0', f'Folder {s}')
+            for f in range(files):
+                file = types['MoodleFile'](f'{url}{c}{s}{f}', f'file{f}.pdf')
+                file.path = f'Topic {s}/file{f}.pdf'
+                (folder.files if f % 2 else section.files).append(file)
+            section.folders.append(folder)
+            section.assignments.append(types['MoodleAssignment'](f'{url}{c}{s}a', f'Assignment {s}'))
+            course.sections.append(section)
+        course_list.append(course)
+    return course_list
+
+
+def measure_memory(types, courses, files) -> int:
+    """
+    Returns:
+        int: The bytes allocated to create the course trees
+    """
+    tracemalloc.start()
+    course_list = create_courses(types, courses, files)  # noqa: F841, kept alive until measured
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def best(function) -> float:
+    return min(timeit.repeat(function, number=1, repeat=REPEAT))
+
+
+def main(args) -> None:
+    check_legacy_types()
+    current_types = MoodleDataTypes.TYPES
+    for name, types in (('legacy', LEGACY_TYPES), ('slots', current_types)):
+        course_list = create_courses(types, args.courses, args.files)
+        dicts = [course.to_dict() for course in course_list]
+        memory = measure_memory(types, args.courses, args.files)
+        dump_time = best(lambda: [course.to_dict() for course in course_list])
+        load_time = best(lambda: [types['MoodleCourse'].from_dict(course) for course in dicts])
+        print(f'{name:>8}: {memory / 2 ** 20:7.2f} MiB, to_dict {dump_time * 1000:8.1f} ms, from_dict {load_time * 1000:8.1f} ms')
+
+    encoders = [('json', lambda data: json.dumps(data).encode(), json.loads)]
+    if orjson:
+        encoders.append(('orjson', orjson.dumps, orjson.loads))
+    if msgpack:
+        encoders.append(('msgpack', msgpack.packb, msgpack.unpackb))
+
+    for name, encode, decode in encoders:
+        encoded = encode(dicts)
+        encode_time = best(lambda: encode(dicts))
+        decode_time = best(lambda: decode(encoded))
+        print(f'{name:>8}: {len(encoded) / 2 ** 20:7.2f} MiB, encode  {encode_time * 1000:8.1f} ms, decode    {decode_time * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the MoodleDataTypes')
+    parser.add_argument('--courses', type=int, default=100)
+    parser.add_argument('--files', type=int, default=20, help='files in every section')
+    main(parser.parse_args())
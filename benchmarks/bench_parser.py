@@ -0,0 +1,68 @@
+"""
+Compares the time needed to parse course pages with a full html.parser
+tree against MoodleParser with every backend that is installed
+
+Usage:
+    python benchmarks/bench_parser.py [saved_course_page.html ...]
+
+Without arguments a synthetic course page is used
+"""
+
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup as BS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Moodle import MoodleParser  # noqa: E402
+from pages import course_page  # noqa: E402
+
+BACKENDS = ['html.parser', 'lxml']
+REPEAT = 5
+
+
+def full_tree(html) -> list:
+    """
+    Parses the page like MoodleSession did before MoodleParser had backends
+    """
+    return BS(html, 'html.parser').find_all('a')
+
+
+def bench(name, function, html) -> float:
+    """
+    Times a parser on a page and prints the result
+
+    Returns:
+        float: The best time of the parser in seconds
+    """
+    best = min(timeit.repeat(lambda: function(html), number=1, repeat=REPEAT))
+    print(f'  {name:<28}{best * 1000:>10.1f} ms')
+    return best
+
+
+def main(paths):
+    if paths:
+        pages = {}
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as page_file:
+                pages[os.path.basename(path)] = page_file.read()
+    else:
+        pages = {'synthetic course (20 sections)': course_page('https://moodle.ksz.ch', 1, 20, 10)}
+
+    for name, html in pages.items():
+        print(f'{name} ({len(html) / 1024:.0f} KiB)')
+        baseline = bench('full tree, html.parser', full_tree, html)
+        for backend in BACKENDS:
+            MoodleParser.backend = backend
+            try:
+                best = bench(f'MoodleParser, {backend}', MoodleParser.parse_course_page, html)
+            except Exception:  # bs4 raises FeatureNotFound if the backend isn't installed
+                print(f'  MoodleParser, {backend:<15}{"not installed":>13}')
+                continue
+            print(f'  {"":<28}{baseline / best:>9.1f}x faster')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,144 @@
+"""
+Times login, get_courses, get_course_content and a full sync like the
+DownloadWorker runs it against the local fake Moodle of fake_moodle.py
+
+Usage:
+    python benchmarks/bench_sync.py [--scales 10 100 1000] [--latency SECONDS] [--file-size BYTES]
+
+At every scale the home page lists that many courses, the timed course
+contains about that many files and the sync downloads that many files
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from json import dump
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Moodle import MoodleSession, MoodleConfig  # noqa: E402
+from MoodleDataTypes import MoodleCourse  # noqa: E402
+from MoodleStorage import SyncIndex, DownloadLog  # noqa: E402
+from MoodleSync import create_session, sync  # noqa: E402
+from fake_moodle import FakeMoodle, USERNAME, PASSWORD, start  # noqa: E402
+
+SCALES = [10, 100, 1000]
+FILES_PER_COURSE = 10  # one file, eight files in a folder and a url in every course of the sync
+
+
+async def timed(coroutine) -> float:
+    """
+    Returns:
+        float: The seconds the coroutine needed
+    """
+    start = time.perf_counter()
+    await coroutine
+    return time.perf_counter() - start
+
+
+def create_data(path, base_url, courses) -> dict:
+    """
+    Creates a data folder like the app does, with all courses checked
+
+    Parameters:
+        path (str): The data folder
+        base_url (str): The url of the fake Moodle
+        courses (int): The amount of checked courses
+
+    Returns:
+        dict: The config
+    """
+    config = {'default_path': f'{path}/files',
+              'urls': {'home': f'{base_url}/my/', 'login': f'{base_url}/login/index.php'},
+              'logindata': {'username': USERNAME, 'password': PASSWORD}}
+    course_list = []
+    for course in range(courses):
+        course_dict = MoodleCourse(f'{base_url}/course/view.php?id={course}', f'Course {course}').to_dict()
+        course_dict['checked'] = True
+        course_list.append(course_dict)
+
+    with open(f'{path}/config.json', 'w') as config_file:
+        dump(config, config_file)
+    with open(f'{path}/courses.json', 'w') as courses_file:
+        dump(course_list, courses_file)
+    return config
+
+
+async def bench_session(fake_moodle, base_url, scale) -> dict:
+    """
+    Times the single steps of a sync with a plain MoodleSession
+
+    Returns:
+        dict: The seconds of every step
+    """
+    results = {}
+    async with MoodleSession(f'{base_url}/my/', f'{base_url}/login/index.php', config=MoodleConfig()) as moodle:
+        results['login'] = await timed(moodle.login({'username': USERNAME, 'password': PASSWORD}))
+
+        fake_moodle.courses = scale
+        results['get_courses'] = await timed(moodle.get_courses())
+
+        fake_moodle.sections, fake_moodle.items = max(1, scale // FILES_PER_COURSE), 1
+        course = MoodleCourse(f'{base_url}/course/view.php?id=0', 'Course 0')
+        results['get_course_content'] = await timed(moodle.get_course_content(course))
+    return results
+
+
+async def bench_sync(fake_moodle, base_url, scale) -> dict:
+    """
+    Times a sync of about scale files into an empty folder and a second sync
+    which finds nothing new
+
+    Returns:
+        dict: The seconds of both syncs and the amount of requests of the first
+    """
+    fake_moodle.sections, fake_moodle.items = 1, 1
+    courses = max(1, scale // fake_moodle.files_per_course)
+
+    with tempfile.TemporaryDirectory() as data_path:
+        config = create_data(data_path, base_url, courses)
+        index = SyncIndex(f'{data_path}/index.sqlite')
+        moodle = create_session(config, index, data_path=data_path)
+        try:
+            await moodle.login(dict(config['logindata']))
+            fake_moodle.requests = 0
+            results = {'sync': await timed(sync(moodle, config, index, state=lambda message: None, data_path=data_path))}
+            results['requests'] = fake_moodle.requests
+            results['files'] = len(DownloadLog(f'{data_path}/history.jsonl').tail(courses * fake_moodle.files_per_course))
+            results['resync'] = await timed(sync(moodle, config, index, state=lambda message: None, data_path=data_path))
+        finally:
+            await moodle.close()
+            index.close()
+    return results
+
+
+async def main(args) -> None:
+    fake_moodle = FakeMoodle(file_size=args.file_size, latency=args.latency)
+    runner = await start(fake_moodle, port=args.port)
+    base_url = fake_moodle.base_url
+
+    print(f'latency {args.latency * 1000:.0f} ms, files of {args.file_size} bytes')
+    print(f"{'scale':>6} {'login':>8} {'courses':>8} {'content':>8} {'sync':>8} {'resync':>8} {'files':>6} {'requests':>8}")
+    try:
+        for scale in args.scales:
+            results = await bench_session(fake_moodle, base_url, scale)
+            results.update(await bench_sync(fake_moodle, base_url, scale))
+            print(f"{scale:>6} {results['login']:>8.3f} {results['get_courses']:>8.3f} {results['get_course_content']:>8.3f} "
+                  f"{results['sync']:>8.3f} {results['resync']:>8.3f} {results['files']:>6} {results['requests']:>8}")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks MoodleSession against a local fake Moodle')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds every response is delayed by')
+    parser.add_argument('--file-size', type=int, default=64 * 1024, help='bytes of every file')
+    parser.add_argument('--port', type=int, default=8780)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(main(parser.parse_args()))
+    loop.close()
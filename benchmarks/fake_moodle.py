@@ -0,0 +1,182 @@
+"""
+This file contains a local aiohttp server imitating Moodle with the pages of
+benchmarks/pages.py, so MoodleSession can be measured without moodle.ksz.ch
+
+Usage:
+    python benchmarks/fake_moodle.py [--courses N] [--port PORT]
+"""
+
+import asyncio
+import hashlib
+import argparse
+from collections import Counter
+
+from aiohttp import web                 # reference: https://docs.aiohttp.org/en/stable/web_quickstart.html
+
+import pages
+
+USERNAME = 'student'
+PASSWORD = 'password'
+
+
+class FakeMoodle:
+    """
+    Holds the shape of the fake Moodle and creates the aiohttp app serving it
+    """
+    def __init__(self, courses=10, sections=1, items=1, folder_files=8, file_size=64 * 1024, latency=0.0):
+        """
+        The constructor for FakeMoodle
+
+        Parameters:
+            courses (int): The amount of courses on the home page
+            sections (int): The amount of sections of every course
+            items (int): The amount of files, folders, assignments and urls in every section
+            folder_files (int): The amount of files in every folder
+            file_size (int): The size of every file in bytes
+            latency (float): The seconds every response is delayed by
+        """
+        self.courses = courses
+        self.sections = sections
+        self.items = items
+        self.folder_files = folder_files
+        self.file_size = file_size
+        self.latency = latency
+        self.requests = 0
+        self.paths = Counter()  # the requests of every path
+        self.base_url = None
+        self.drafts = {}  # the files uploaded to every draft area by their name
+        self.submissions = []  # the draft area of every saved submission
+        self.rejected = set()  # the names of the files which are answered with an error when uploaded
+
+    @property
+    def files_per_course(self) -> int:
+        return self.sections * self.items * (2 + self.folder_files)  # a file and a url per item and the files of its folder
+
+    def create_app(self, base_url) -> web.Application:
+        """
+        Creates the app serving the fake Moodle
+
+        Parameters:
+            base_url (str): The url the app is reachable at
+
+        Returns:
+            web.Application: The app
+        """
+        self.base_url = base_url
+        app = web.Application(middlewares=[self.delay])
+        app.router.add_route('*', '/login/index.php', self.login)
+        app.router.add_get('/my/', self.home)
+        app.router.add_get('/course/view.php', self.course)
+        app.router.add_get('/mod/folder/view.php', self.folder)
+        app.router.add_get('/mod/assign/view.php', self.assignment)
+        app.router.add_post('/mod/assign/view.php', self.save_submission)
+        app.router.add_post('/repository/repository_ajax.php', self.upload)
+        app.router.add_get('/mod/url/view.php', self.url)
+        app.router.add_get('/mod/resource/view.php', self.resource)
+        app.router.add_get('/pluginfile.php/{path:.*}', self.file)
+        return app
+
+    @web.middleware
+    async def delay(self, request, handler):
+        self.requests += 1
+        self.paths[request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    @staticmethod
+    def page(request, html) -> web.Response:
+        """
+        Answers with a page, or with 304 if the client has the page cached already
+        """
+        etag = f'"{hashlib.md5(html.encode()).hexdigest()}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=html, content_type='text/html', headers={'ETag': etag})
+
+    def logged_in(self, request) -> bool:
+        return request.cookies.get('MoodleSession') == 'authenticated'
+
+    async def login(self, request):
+        if request.method == 'POST':
+            logindata = await request.post()
+            response = web.HTTPSeeOther(f'{self.base_url}/my/')
+            if logindata.get('username') == USERNAME and logindata.get('password') == PASSWORD and logindata.get('logintoken'):
+                response.set_cookie('MoodleSession', 'authenticated')
+            raise response
+        return web.Response(text=pages.page('<form><input type="hidden" name="logintoken" value="token"></form>'),
+                            content_type='text/html')
+
+    async def home(self, request):
+        if not self.logged_in(request):
+            raise web.HTTPSeeOther(f'{self.base_url}/login/index.php')
+        return self.page(request, pages.home_page(self.base_url, self.courses))
+
+    async def course(self, request):
+        return self.page(request, pages.course_page(self.base_url, request.query['id'], self.sections, self.items))
+
+    async def folder(self, request):
+        return self.page(request, pages.folder_page(self.base_url, request.query['id'], self.folder_files))
+
+    async def assignment(self, request):
+        if request.query.get('action') == 'editsubmission':  # every edit gets a new draft area
+            item_id = len(self.drafts) + 1
+            self.drafts[item_id] = {}
+            return self.page(request, pages.submission_page(self.base_url, item_id))
+        return self.page(request, pages.assignment_page())
+
+    async def upload(self, request):
+        form = await request.post()
+        upload_file = form['repo_upload_file']
+        if form['title'] in self.rejected:
+            return web.json_response({'error': 'The file is too large'})
+        self.drafts[int(form['itemid'])][form['title']] = upload_file.file.read()
+        return web.json_response({'url': f"{self.base_url}/draftfile.php/{form['itemid']}/{form['title']}",
+                                  'id': int(form['itemid']), 'file': form['title']})
+
+    async def save_submission(self, request):
+        form = await request.post()
+        self.submissions.append(int(form['files_filemanager']))
+        raise web.HTTPSeeOther(f"{self.base_url}/mod/assign/view.php?id={form['id']}")
+
+    async def url(self, request):
+        return self.page(request, pages.url_page(f"https://example.com/{request.query['id']}"))
+
+    async def resource(self, request):
+        raise web.HTTPSeeOther(f"{self.base_url}/pluginfile.php/{request.query['id']}/mod_resource/content/1/file.pdf")
+
+    async def file(self, request):
+        seed = request.path.encode()  # every file has another content, so none of them are deduplicated
+        body = (seed * (self.file_size // len(seed) + 1))[:self.file_size]
+        return web.Response(body=body, content_type='application/pdf')
+
+
+async def start(fake_moodle, host='localhost', port=8780) -> web.AppRunner:
+    """
+    Starts serving a FakeMoodle
+
+    Parameters:
+        fake_moodle (FakeMoodle): The fake Moodle to be served
+        host (str): The host name, which mustn't be an IP address or aiohttp won't keep the login cookie
+        port (int): The port
+
+    Returns:
+        web.AppRunner: The runner, which needs to be cleaned up once done
+    """
+    runner = web.AppRunner(fake_moodle.create_app(f'http://{host}:{port}'))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serves a fake Moodle')
+    parser.add_argument('--courses', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--port', type=int, default=8780)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(start(FakeMoodle(args.courses, latency=args.latency), port=args.port))
+    print(f'Serving a fake Moodle on http://localhost:{args.port}/my/ (login {USERNAME}/{PASSWORD})')
+    loop.run_forever()
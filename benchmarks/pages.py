@@ -0,0 +1,158 @@
+"""
+This file creates synthetic Moodle pages which resemble the pages of
+https://moodle.ksz.ch closely enough for MoodleParser to parse them
+"""
+
+NAVIGATION = ''.join(  # Moodle pages contain a lot of markup which isn't needed by MoodleParser
+    f'<li class="nav-item"><div class="d-flex"><span class="icon fa fa-fw fa-folder"></span>'
+    f'<span class="media-body text-truncate" title="Navigation {i}">Navigation {i}</span></div></li>'
+    for i in range(40)
+)
+
+
+def page(body, navbar='') -> str:
+    """
+    Wraps the body in the layout shared by all Moodle pages
+
+    Parameters:
+        body (str): The html of the main region
+        navbar (str): The html of the navigation bar at the top
+
+    Returns:
+        str: The html of the whole page
+    """
+    return ('<!DOCTYPE html><html dir="ltr" lang="en"><head><title>Moodle</title>'
+            '<script>var M = {}; M.cfg = {"wwwroot": "https://moodle.ksz.ch"};</script></head>'
+            f'<body id="page-course-view"><nav class="list-group"><ul>{NAVIGATION}</ul></nav>'
+            f'<div id="page-wrapper">{navbar}<div id="page"><div role="main">{body}</div></div></div></body></html>')
+
+
+def home_page(base_url, courses) -> str:
+    """
+    Creates the home page which lists all courses
+
+    Parameters:
+        base_url (str): The url of the Moodle server
+        courses (int): The amount of courses
+
+    Returns:
+        str: The html of the page
+    """
+    return page(''.join(
+        f'<a class="list-group-item" href="{base_url}/course/view.php?id={course}">'
+        f'<div class="media"><span class="media-left"><i class="icon fa fa-graduation-cap"></i></span>'
+        f'<span class="media-body">Course {course}</span></div></a>'
+        for course in range(courses)
+    ))
+
+
+def course_page(base_url, course, sections, items) -> str:
+    """
+    Creates a course page with sections containing files, folders, assignments and urls
+
+    Parameters:
+        base_url (str): The url of the Moodle server
+        course (int): The id of the course
+        sections (int): The amount of sections
+        items (int): The amount of items of every kind in every section
+
+    Returns:
+        str: The html of the page
+    """
+    def activity(kind, item_id, name):
+        return (f'<li class="activity {kind} modtype_{kind}" id="module-{item_id}"><div><div class="mod-indent-outer">'
+                f'<div class="activityinstance"><a class="aalink" onclick="" href="{base_url}/mod/{kind}/view.php?id={item_id}">'
+                f'<img src="{base_url}/theme/image.php/boost/{kind}/icon" class="iconlarge activityicon" alt="">'
+                f'<span class="instancename">{name}<span class="accesshide "> {kind}</span></span></a></div>'
+                f'<div class="contentafterlink"><span class="dimmed_text">Uploaded 12/03/21, 10:24</span></div></div></div></li>')
+
+    body = ['<ul class="topics">']
+    for section in range(sections):
+        body.append(f'<li id="section-{section}" class="section main clearfix" role="region">'
+                    f'<div class="content"><h3 class="sectionname"><span>'
+                    f'<a href="{base_url}/course/view.php?id={course}&amp;section={section}">Topic {section}</a></span></h3>'
+                    f'<div class="summary"><div class="no-overflow"><p>Summary of topic {section}</p></div></div>'
+                    f'<ul class="section img-text">')
+        for item in range(items):
+            item_id = f'{course}{section:03}{item:03}'
+            body.append(activity('resource', f'1{item_id}', f'File {section}.{item}'))
+            body.append(activity('folder', f'2{item_id}', f'Folder {section}.{item}'))
+            body.append(activity('assign', f'3{item_id}', f'Assignment {section}.{item}'))
+            body.append(activity('url', f'4{item_id}', f'Link {section}.{item}'))
+        body.append('</ul></div></li>')
+    body.append('</ul>')
+    return page(''.join(body))
+
+
+def folder_page(base_url, folder, files) -> str:
+    """
+    Creates a folder page
+
+    Parameters:
+        base_url (str): The url of the Moodle server
+        folder (str): The id of the folder
+        files (int): The amount of files in the folder
+
+    Returns:
+        str: The html of the page
+    """
+    return page('<div class="foldertree"><ul>' + ''.join(
+        f'<li><span class="fp-filename-icon"><a href="{base_url}/pluginfile.php/{folder}/mod_folder/content/0/file{file}.pdf?forcedownload=1">'
+        f'<span class="fp-icon"><img src="{base_url}/theme/image.php/boost/core/f/pdf-24" alt=""></span>'
+        f'<span class="fp-filename">file{file}.pdf</span></a></span></li>'
+        for file in range(files)
+    ) + '</ul></div>')
+
+
+def assignment_page(status='No attempt') -> str:
+    """
+    Creates an assignment page
+
+    Parameters:
+        status (str): The submission status
+
+    Returns:
+        str: The html of the page
+    """
+    return page('<div class="submissionstatustable"><table class="generaltable"><tbody>'
+                f'<tr><th class="cell c0">Submission status</th><td class="submissionstatus cell c1">{status}</td></tr>'
+                '<tr><th class="cell c0">Grading status</th><td class="cell c1">Not graded</td></tr>'
+                '<tr><th class="cell c0">Due date</th><td class="cell c1">Friday, 16 April 2021, 11:55 PM</td></tr>'
+                '</tbody></table></div>')
+
+
+def submission_page(base_url, item_id, max_files=20) -> str:
+    """
+    Creates the page to edit the submission of an assignment
+
+    Parameters:
+        base_url (str): The url of the fake Moodle
+        item_id (int): The id of the draft area the files are uploaded to
+        max_files (int): The amount of files which can be submitted
+
+    Returns:
+        str: The html of the page
+    """
+    navbar = ('<nav class="navbar"><ul class="nav navbar-nav usernav"><li><div class="popover-region" data-userid="42"></div></li>'
+              '<li><div class="usermenu"><a id="action-menu-toggle-1"><span class="userbutton">'
+              '<span class="usertext mr-1">Student</span></span></a></div></li></ul></nav>')
+    filepicker = (f'{base_url}/repository/draftfiles_manager.php?env=filemanager&action=browse&itemid={item_id}'
+                  f'&ctx_id=7&sesskey=sesskey&maxbytes=0&maxfiles={max_files}')
+    return page('<form action="view.php" method="post"><fieldset id="id_files_filemanager_fieldset">'
+                f'<div class="filemanager" id="filemanager-{item_id}"></div>'
+                f'<noscript><div><object type="text/html" data="{filepicker.replace("&", "&amp;")}"></object></div></noscript>'
+                f'<input type="hidden" name="files_filemanager" id="id_files_filemanager" value="{item_id}"></fieldset></form>',
+                navbar=navbar)
+
+
+def url_page(redirect_url) -> str:
+    """
+    Creates the page of a Moodle url
+
+    Parameters:
+        redirect_url (str): The url that is linked to
+
+    Returns:
+        str: The html of the page
+    """
+    return page(f'<div class="urlworkaround">Click <a onclick="this.target=\'_blank\'" href="{redirect_url}">{redirect_url}</a> link to open resource.</div>')
@@ -0,0 +1,182 @@
+"""
+Makes the modules of xMoodle importable from the tests and contains the
+local aiohttp servers the tests run against and the fixtures starting them
+"""
+
+import os
+import sys
+import socket
+import asyncio
+import inspect
+
+import pytest
+from aiohttp import web                 # reference: https://docs.aiohttp.org/en/stable/web_quickstart.html
+from aiohttp.test_utils import TestServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, f'{ROOT}/benchmarks']  # the fake Moodle of the benchmarks is used by the tests as well
+
+from fake_moodle import FakeMoodle, USERNAME, PASSWORD  # noqa: E402
+from Moodle import MoodleSession, MoodleConfig  # noqa: E402
+
+
+def run(coroutine):
+    """
+    Runs a coroutine on a new event loop, so the tests don't need a pytest plugin
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class FileServer:
+    """
+    Serves a single file with Range support and can be told to fail in the ways Moodle does
+    """
+    def __init__(self, body, etag='"v1"'):
+        """
+        The constructor for FileServer
+
+        Parameters:
+            body (bytes): The content of the file
+            etag (str): The ETag of the file, the If-Range header is compared to it
+        """
+        self.body = body
+        self.etag = etag
+        self.cut_at = None  # the bytes after which the next response is cut off
+        self.ignore_range = False  # if the Range header is ignored like some servers do
+        self.unsatisfiable = False  # if every Range is answered with 416
+        self.failures = []  # the status and Retry-After of the responses sent before the file
+        self.requests = []  # the headers of every request
+        self.server = None
+        self.url = None
+
+    async def handle(self, request) -> web.StreamResponse:
+        self.requests.append(request.headers.copy())
+        if self.failures:
+            status, retry_after = self.failures.pop(0)
+            return web.Response(status=status, headers={'Retry-After': retry_after} if retry_after is not None else {})
+
+        start = 0
+        range_header = request.headers.get('Range')
+        if range_header and not self.ignore_range and request.headers.get('If-Range', self.etag) == self.etag:
+            if self.unsatisfiable:
+                return web.Response(status=416)
+            start = int(range_header[len('bytes='):-1])
+
+        headers = {'ETag': self.etag, 'Content-Length': str(len(self.body) - start)}
+        if start:
+            headers['Content-Range'] = f'bytes {start}-{len(self.body) - 1}/{len(self.body)}'
+        response = web.StreamResponse(status=206 if start else 200, headers=headers)
+        await response.prepare(request)
+
+        if self.cut_at is not None:  # the connection is lost in the middle of the file
+            cut, self.cut_at = self.cut_at, None
+            await response.write(self.body[start:start + cut])
+            await asyncio.sleep(0.05)  # lets the client receive the bytes before the connection closes
+            request.transport.close()
+            return response
+
+        await response.write(self.body[start:])
+        await response.write_eof()
+        return response
+
+    async def start(self) -> str:
+        """
+        Returns:
+            str: The url of the file
+        """
+        app = web.Application()
+        app.router.add_get('/pluginfile.php/{context}/mod_resource/content/1/slides.pdf', self.handle)  # the same file in every course
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.url = str(self.server.make_url('/pluginfile.php/1/mod_resource/content/1/slides.pdf'))
+        return self.url
+
+    async def close(self) -> None:
+        await self.server.close()
+
+
+async def start_fake_moodle(fake_moodle):
+    """
+    Starts the fake Moodle of the benchmarks on a free port
+
+    Returns:
+        web.AppRunner: The runner, which needs to be cleaned up once done
+    """
+    from fake_moodle import start
+
+    with socket.socket() as free_socket:  # the fake Moodle has to know its url before it's started
+        free_socket.bind(('localhost', 0))
+        port = free_socket.getsockname()[1]
+    return await start(fake_moodle, port=port)
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'fake_moodle(**args): the arguments of the FakeMoodle the test runs against')
+    config.addinivalue_line('markers', 'file_server(body): the file the FileServer of the test serves')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    """
+    Runs async tests on the event loop their fixtures were started on, or on a new one
+    """
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    test = pyfuncitem.obj(**{name: pyfuncitem.funcargs[name] for name in inspect.signature(pyfuncitem.obj).parameters})
+    if 'loop' in pyfuncitem.funcargs:
+        pyfuncitem.funcargs['loop'].run_until_complete(test)
+    else:
+        run(test)
+    return True
+
+
+@pytest.fixture
+def loop():
+    """
+    The event loop the servers, the session and the test run on
+    """
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def fake_moodle(loop, request):
+    """
+    Serves the fake Moodle of the benchmarks with the arguments of the fake_moodle marker of the test
+    """
+    marker = request.node.get_closest_marker('fake_moodle')
+    fake_moodle = FakeMoodle(**(marker.kwargs if marker else {}))
+    runner = loop.run_until_complete(start_fake_moodle(fake_moodle))
+    yield fake_moodle
+    loop.run_until_complete(runner.cleanup())
+
+
+@pytest.fixture
+def moodle(loop, fake_moodle):
+    """
+    A session which is logged in to the fake Moodle
+    """
+    async def login() -> MoodleSession:
+        session = MoodleSession(f'{fake_moodle.base_url}/my/', f'{fake_moodle.base_url}/login/index.php', config=MoodleConfig())
+        await session.login({'username': USERNAME, 'password': PASSWORD})
+        return session
+
+    session = loop.run_until_complete(login())
+    yield session
+    loop.run_until_complete(session.close())
+
+
+@pytest.fixture
+def file_server(loop, request):
+    """
+    Serves the body of the file_server marker of the test with a FileServer
+    """
+    server = FileServer(request.node.get_closest_marker('file_server').args[0])
+    loop.run_until_complete(server.start())
+    yield server
+    loop.run_until_complete(server.close())
@@ -0,0 +1,50 @@
+"""
+Tests converting the Data Types to dicts and back
+"""
+
+import sys
+
+from MoodleDataTypes import MoodleCourse, MoodleSection, MoodleFolder, MoodleFile, MoodleAssignment, MoodleUrl
+
+
+def create_course() -> MoodleCourse:
+    file = MoodleFile('https://moodle.ksz.ch/mod/resource/view.php?id=1', 'Slides', 'Topic 1', size=1000, hash='ab')
+    folder = MoodleFolder('https://moodle.ksz.ch/mod/folder/view.php?id=2', 'Exercises', files=[file], loaded=True)
+    section = MoodleSection('https://moodle.ksz.ch/course/view.php?id=3#section-1', 'Topic 1', [folder],
+                            [file, MoodleUrl('https://moodle.ksz.ch/mod/url/view.php?id=4', 'Link', 'Topic 1')],
+                            [MoodleAssignment('https://moodle.ksz.ch/mod/assign/view.php?id=5', 'Essay', True)], fingerprint='cd')
+    return MoodleCourse('https://moodle.ksz.ch/course/view.php?id=3', 'Physics', [section], checked=True)
+
+
+def test_round_trip():
+    course = create_course()
+    course_dict = course.to_dict()
+    assert course_dict['type'] == 'MoodleCourse'
+    assert course_dict['sections'][0]['folders'][0]['files'][0] == {
+        'url': 'https://moodle.ksz.ch/mod/resource/view.php?id=1', 'name': 'Slides', 'path': 'Topic 1', 'download_path': None,
+        'size': 1000, 'hash': 'ab', 'etag': None, 'last_modified': None, 'type': 'MoodleFile'}
+
+    loaded = MoodleCourse.from_dict(course_dict)
+    assert loaded.to_dict() == course_dict
+    assert isinstance(loaded.sections[0].files[1], MoodleUrl)
+    assert loaded.sections[0].assignments[0].status is True
+
+
+def test_missing_and_unknown_keys():
+    course = MoodleCourse.from_dict({'url': 'https://moodle.ksz.ch/course/view.php?id=3', 'name': 'Physics', 'id': 3})
+    assert course.sections == [] and course.checked is None and not hasattr(course, 'id')
+
+
+def test_deep_tree():
+    folder = root = MoodleFolder('https://moodle.ksz.ch/mod/folder/view.php?id=0', 'Folder')
+    for depth in range(sys.getrecursionlimit() * 2):  # deeper than recursion could go
+        child = MoodleFolder(f'https://moodle.ksz.ch/mod/folder/view.php?id={depth}', 'Folder')
+        folder.folders.append(child)
+        folder = child
+
+    folder = MoodleFolder.from_dict(root.to_dict())
+    depth = 0
+    while folder.folders:  # compared level by level, as comparing the dicts would hit the recursion limit itself
+        folder = folder.folders[0]
+        depth += 1
+    assert depth == sys.getrecursionlimit() * 2
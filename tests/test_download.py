@@ -0,0 +1,170 @@
+"""
+Tests resuming interrupted downloads with Range requests against a local server
+"""
+
+import os
+import hashlib
+
+import pytest
+from aiohttp import ClientPayloadError
+
+from Moodle import MoodleSession, MoodleConfig
+from MoodleDataTypes import MoodleFile
+from MoodleStorage import DownloadJournal, SyncIndex, BlobStore
+
+BODY = os.urandom(1024 * 1024)
+CUT = 300 * 1024
+
+pytestmark = pytest.mark.file_server(BODY)
+
+
+async def download(url, tmp_path, retries=0) -> MoodleFile:
+    """
+    Downloads the file once with a new session, like a new run of the app
+    """
+    config = MoodleConfig(retries=retries, backoff=0, adaptive=False)
+    journal = DownloadJournal(f'{tmp_path}/data/journal.json')
+    async with MoodleSession(f'{url}/my/', f'{url}/login/index.php', config=config, journal=journal) as moodle:
+        file = MoodleFile(url, 'Slides', 'Topic 1')
+        await moodle.download_file(file, f'{tmp_path}/files')
+    return file
+
+
+async def interrupted(server, tmp_path) -> int:
+    """
+    Cuts the connection after CUT bytes, so the download stops with a partial file
+
+    Returns:
+        int: The size of the partial file
+    """
+    server.cut_at = CUT
+    with pytest.raises(ClientPayloadError):
+        await download(server.url, tmp_path)
+    entry = DownloadJournal(f'{tmp_path}/data/journal.json').get(server.url)
+    assert entry is not None
+    size = os.path.getsize(entry['part'])
+    assert 0 < size <= CUT
+    return size
+
+
+def check(file, tmp_path) -> None:
+    assert file.download_path == f'{tmp_path}/files/Topic 1/slides.pdf'
+    with open(file.download_path, 'rb') as downloaded:
+        assert downloaded.read() == BODY
+    assert file.hash == hashlib.sha256(BODY).hexdigest()
+    assert file.size == len(BODY)
+    assert not os.path.exists(f'{file.download_path}.part')
+    assert DownloadJournal(f'{tmp_path}/data/journal.json').entries == {}
+
+
+async def test_download(file_server, tmp_path):
+    check(await download(file_server.url, tmp_path), tmp_path)
+    assert 'Range' not in file_server.requests[0]
+
+
+async def test_resume(file_server, tmp_path):
+    received = await interrupted(file_server, tmp_path)
+
+    check(await download(file_server.url, tmp_path), tmp_path)
+    assert file_server.requests[1]['Range'] == f'bytes={received}-'
+    assert file_server.requests[1]['If-Range'] == file_server.etag
+
+
+async def test_retry_resumes(file_server, tmp_path):
+    file_server.cut_at = CUT
+    check(await download(file_server.url, tmp_path, retries=1), tmp_path)  # the retry continues where the connection was cut
+    assert 'Range' in file_server.requests[1]
+
+
+async def test_unsatisfiable_range(file_server, tmp_path):
+    await interrupted(file_server, tmp_path)
+    file_server.unsatisfiable = True
+
+    check(await download(file_server.url, tmp_path), tmp_path)
+    assert 'Range' in file_server.requests[1]
+    assert 'Range' not in file_server.requests[2]  # the partial file was discarded and the file requested again
+
+
+async def test_ignored_range(file_server, tmp_path):
+    await interrupted(file_server, tmp_path)
+    file_server.ignore_range = True
+
+    check(await download(file_server.url, tmp_path), tmp_path)  # the whole file was sent, so it's written from the start
+    assert len(file_server.requests) == 2
+
+
+async def test_changed_file(file_server, tmp_path):
+    await interrupted(file_server, tmp_path)
+    file_server.etag = '"v2"'  # If-Range doesn't match anymore, so the server sends the whole new file
+
+    file = await download(file_server.url, tmp_path)
+    check(file, tmp_path)
+    assert file.etag == '"v2"'
+
+
+async def test_same_file(file_server, tmp_path):
+    index = SyncIndex(f'{tmp_path}/data/index.sqlite')
+    blobs = BlobStore(f'{tmp_path}/files/.xmoodle/blobs')
+    config = MoodleConfig(retries=0, adaptive=False)
+    try:
+        async with MoodleSession(file_server.url, f'{file_server.url}/login/index.php', config=config, index=index, blobs=blobs) as moodle:
+            first = MoodleFile(file_server.url, 'Slides', 'Course 1')
+            await moodle.download_file(first, f'{tmp_path}/files')
+            index.add(first)
+
+            second = MoodleFile(file_server.url.replace('/pluginfile.php/1/', '/pluginfile.php/2/'), 'Slides', 'Course 2')
+            await moodle.download_file(second, f'{tmp_path}/files')  # the same file linked in another course
+    finally:
+        index.close()
+
+    assert len(file_server.requests) == 2  # the body of the second response is dropped after its headers
+    assert second.hash == first.hash and second.download_path == f'{tmp_path}/files/Course 2/slides.pdf'
+    assert os.stat(first.download_path).st_ino == os.stat(second.download_path).st_ino == os.stat(blobs.path(first.hash)).st_ino
+    assert not os.path.exists(f'{second.download_path}.part')
+
+    os.remove(first.download_path)
+    assert blobs.prune() == 0  # still linked to the second course
+    os.remove(second.download_path)
+    assert blobs.prune() == 1
+    assert first.hash not in blobs and not os.path.exists(f'{blobs.path(first.hash)}.stat')
+
+
+async def test_completed_before_index(file_server, tmp_path):
+    """
+    A sync stopped after the file was downloaded, but before it was added to the index
+    """
+    index = SyncIndex(f'{tmp_path}/data/index.sqlite')
+    config = MoodleConfig(retries=0, adaptive=False)
+
+    async def download_again() -> MoodleFile:  # with a new session, like the next sync
+        async with MoodleSession(file_server.url, f'{file_server.url}/login/index.php', config=config, index=index) as moodle:
+            file = MoodleFile(file_server.url, 'Slides', 'Topic 1')
+            await moodle.download_file(file, f'{tmp_path}/files')
+            return file
+
+    try:
+        first = await download_again()
+        inode = os.stat(first.download_path).st_ino
+
+        again = await download_again()
+        assert again.download_path == first.download_path  # not slides (2).pdf
+        assert again.hash == hashlib.sha256(BODY).hexdigest() and again.size == len(BODY)
+        assert os.stat(again.download_path).st_ino == inode  # the file left behind is kept
+
+        with open(first.download_path, 'wb') as other_file:  # another file of the same name
+            other_file.write(b'other')
+        assert (await download_again()).download_path == f'{tmp_path}/files/Topic 1/slides (2).pdf'
+    finally:
+        index.close()
+
+
+def test_journal(tmp_path):
+    journal = DownloadJournal(f'{tmp_path}/journal.json')
+    journal.start('https://moodle.ksz.ch/file', f'{tmp_path}/file.part', '"v1"', None)
+    assert journal.get('https://moodle.ksz.ch/file') is None  # there is no partial file
+
+    open(f'{tmp_path}/file.part', 'wb').close()
+    assert DownloadJournal(f'{tmp_path}/journal.json').get('https://moodle.ksz.ch/file')['etag'] == '"v1"'
+
+    journal.finish('https://moodle.ksz.ch/file')
+    assert DownloadJournal(f'{tmp_path}/journal.json').entries == {}
@@ -0,0 +1,72 @@
+"""
+Tests loading the content of a course on demand from the fake Moodle of the benchmarks
+"""
+
+import asyncio
+
+import pytest
+
+from MoodleDataTypes import MoodleCourse, MoodleFolder
+
+pytestmark = pytest.mark.fake_moodle(courses=1, sections=2, folder_files=3)
+
+
+@pytest.fixture
+def course(fake_moodle, moodle):
+    fake_moodle.paths.clear()  # only counts the requests of the test, not the ones of the login
+    return MoodleCourse(f'{fake_moodle.base_url}/course/view.php?id=0', 'Course 0')
+
+
+def names(section) -> list:
+    return [file.name for file in section.files]
+
+
+async def test_sections(fake_moodle, moodle, course):
+    sections, again = await asyncio.gather(moodle.get_sections(course), moodle.get_sections(course))
+    assert sections is again and len(sections) == 2
+    assert sum(fake_moodle.paths.values()) == 1  # only the course page, once
+    assert not sections[0].folders[0].loaded and not sections[0].assignments[0].loaded
+
+
+async def test_folder(fake_moodle, moodle, course):
+    section = (await moodle.get_sections(course))[0]
+    folder = section.folders[0]
+    before = names(section)
+
+    files, again = await asyncio.gather(moodle.get_folder_files(section, folder), moodle.get_folder_files(section, folder))
+    assert files is again and len(files) == 3
+    assert fake_moodle.paths['/mod/folder/view.php'] == 1
+    assert len(names(section)) == len(before) + 3
+    assert section.layout is None  # all folders of the section are loaded, so it's arranged for good
+
+
+async def test_prefetch(fake_moodle, moodle, course):
+    await moodle.get_sections(course)
+    await moodle.load_assignment(course.sections[0].assignments[0])
+    await moodle.prefetch(course)
+    assert fake_moodle.paths['/mod/folder/view.php'] == 2
+    assert fake_moodle.paths['/mod/assign/view.php'] == 2  # the loaded assignment wasn't fetched again
+    assert all(folder.loaded for section in course.sections for folder in section.folders)
+
+
+async def test_same_course_twice(fake_moodle, moodle, course):
+    other = MoodleCourse(course.url, course.name)
+    await moodle.get_sections(course)
+    await moodle.get_sections(other)  # loaded on the same session, with its own sections
+
+    await moodle.prefetch(other)
+    assert isinstance(course.sections[0].layout[1], MoodleFolder)
+    assert course.sections[0].layout[1] is not other.sections[0].folders[0]
+    assert len(names(course.sections[0])) == 2  # the folders of the other course aren't put into this one
+    assert len(names(other.sections[0])) == 5
+
+
+async def test_snapshot_after_load(fake_moodle, moodle, course):
+    moodle.config.section_max_age = 60 * 60
+    snapshot = MoodleCourse(course.url, course.name)
+    await moodle.get_course_content(snapshot)
+
+    await moodle.get_sections(course)
+    await moodle.get_course_content(course, snapshot=snapshot)  # the snapshot is used although the course is loaded already
+    assert fake_moodle.paths['/mod/assign/view.php'] == 2  # only by the snapshot
+    assert course.sections[0].assignments[0].loaded
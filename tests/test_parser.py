@@ -0,0 +1,112 @@
+"""
+Tests parsing the pages of the fake Moodle of the benchmarks and turning
+names found on Moodle into local paths
+"""
+
+import pytest
+from bs4 import BeautifulSoup as BS
+
+import pages
+from conftest import run
+from fake_moodle import USERNAME, PASSWORD
+from Moodle import MoodleSession, MoodleConfig, MoodleParser
+
+BASE_URL = 'https://moodle.ksz.ch'
+PAGES = {  # a page of every kind with the parser of its kind
+    'courses': (pages.home_page(BASE_URL, 3), MoodleParser.parse_courses),
+    'course': (pages.course_page(BASE_URL, 1, sections=2, items=2), MoodleParser.parse_course_page),
+    'folder': (pages.folder_page(BASE_URL, 2, files=3), MoodleParser.parse_folder_page),
+    'assignment': (pages.assignment_page('Submitted for grading'), MoodleParser.parse_assignment_page),
+    'url': (pages.url_page('https://example.com/slides'), MoodleParser.parse_url_page),
+}
+
+
+@pytest.fixture(params=['html.parser', 'lxml'])
+def backend(request, monkeypatch) -> str:
+    if request.param == 'lxml':
+        pytest.importorskip('lxml')
+    monkeypatch.setattr(MoodleParser, 'backend', request.param)
+    return request.param
+
+
+def test_parse_pages(backend):
+    assert PAGES['courses'][1](PAGES['courses'][0]) == [(f'{BASE_URL}/course/view.php?id={course}', f'Course {course}') for course in range(3)]
+
+    items = PAGES['course'][1](PAGES['course'][0])
+    assert [item for item in items if item[0] == 'section'] == [
+        ('section', f'{BASE_URL}/course/view.php?id=1&section=0', 'Topic 0'),
+        ('section', f'{BASE_URL}/course/view.php?id=1&section=1', 'Topic 1'),
+    ]
+    assert items[1:5] == [
+        ('resource', f'{BASE_URL}/mod/resource/view.php?id=11000000', 'File 0.0'),
+        ('folder', f'{BASE_URL}/mod/folder/view.php?id=21000000', 'Folder 0.0'),
+        ('assign', f'{BASE_URL}/mod/assign/view.php?id=31000000', 'Assignment 0.0'),
+        ('url', f'{BASE_URL}/mod/url/view.php?id=41000000', 'Link 0.0'),
+    ]
+    assert len(items) == 2 + 2 * 2 * 4
+
+    assert PAGES['folder'][1](PAGES['folder'][0]) == [(f'{BASE_URL}/pluginfile.php/2/mod_folder/content/0/file{file}.pdf', f'file{file}.pdf') for file in range(3)]
+    assert PAGES['assignment'][1](PAGES['assignment'][0]) == 'Submitted for grading'
+    assert PAGES['url'][1](PAGES['url'][0]) == 'https://example.com/slides'
+
+
+@pytest.mark.parametrize('kind', PAGES)
+def test_strainers(backend, kind, monkeypatch):
+    """
+    Only building the elements the parsers look at finds the same as building the whole page
+    """
+    html, parser = PAGES[kind]
+    strained = parser(html)
+    monkeypatch.setattr(MoodleParser, 'soup', staticmethod(lambda html, parse_only=None: BS(html, MoodleParser.backend)))
+    assert strained == parser(html)
+
+
+@pytest.mark.fake_moodle(courses=2, folder_files=3)
+@pytest.mark.parametrize('parse_mode', [None, 'thread', 'process'])
+async def test_parse_mode(fake_moodle, loop, parse_mode):
+    """
+    The pages parsed by workers are fetched, cached and turned into courses like the ones parsed on the event loop
+    """
+    async with MoodleSession(f'{fake_moodle.base_url}/my/', f'{fake_moodle.base_url}/login/index.php',
+                             config=MoodleConfig(parse_mode=parse_mode, parse_workers=2)) as moodle:
+        await moodle.login({'username': USERNAME, 'password': PASSWORD})
+        courses = await moodle.get_courses()
+        assert [course.name for course in courses] == ['Course 0', 'Course 1']
+
+        await moodle.get_course_content(courses[1])
+        files = sorted(file.name for section in courses[1].sections for file in section.files)
+        assert len(files) == fake_moodle.files_per_course
+        assert {'file0.pdf', 'file1.pdf', 'file2.pdf'} <= set(files)
+        assert [assignment.status for section in courses[1].sections for assignment in section.assignments] == [False]  # No attempt
+
+
+def test_parse_windows():
+    assert MoodleParser.parse_windows('Physik: Kapitel 1/2') == 'Physik; Kapitel 1,2'
+    assert MoodleParser.parse_windows('What? <Why> "now" *') == "What. Why 'now'"
+    assert MoodleParser.parse_windows('Tab\there\n') == 'Tabhere'
+    assert MoodleParser.parse_windows('Notes...  ') == 'Notes'
+    assert MoodleParser.parse_windows('???') == '_'
+
+
+def test_parse_windows_reserved_names():
+    assert MoodleParser.parse_windows('CON') == 'CON_'
+    assert MoodleParser.parse_windows('nul.txt') == 'nul_.txt'
+    assert MoodleParser.parse_windows('Com1.tar.gz') == 'Com1_.tar.gz'
+    assert MoodleParser.parse_windows('Console.txt') == 'Console.txt'
+
+
+def test_parse_windows_long_names():
+    name = MoodleParser.parse_windows('a' * 300 + '.pdf')
+    assert len(name) == MoodleParser.MAX_NAME_LENGTH and name.endswith('.pdf')
+    assert len(MoodleParser.parse_windows('a' * 300)) == MoodleParser.MAX_NAME_LENGTH
+
+
+def test_claim_path():
+    async def main():
+        async with MoodleSession('https://moodle.ksz.ch/my/', 'https://moodle.ksz.ch/login/index.php') as moodle:
+            assert moodle.claim_path('files/Topic 1/Slides.pdf', 'url 1') == 'files/Topic 1/Slides.pdf'
+            assert moodle.claim_path('files/Topic 1/Slides.pdf', 'url 1') == 'files/Topic 1/Slides.pdf'  # the same file again
+            assert moodle.claim_path('files/Topic 1/Slides.pdf', 'url 2') == 'files/Topic 1/Slides (2).pdf'
+            assert moodle.claim_path('files/Topic 1/slides.PDF', 'url 3') == 'files/Topic 1/slides (3).PDF'  # the same file on Windows and macOS
+            assert moodle.claim_path('files/Topic 2/Slides.pdf', 'url 4') == 'files/Topic 2/Slides.pdf'
+    run(main())
@@ -0,0 +1,70 @@
+"""
+Tests collecting the progress of the downloads into events
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import MoodleProgress
+from MoodleProgress import ProgressTracker
+
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    """
+    The time the tracker reads, which only changes when a test sets clock[0]
+    """
+    clock = [0.0]
+    monkeypatch.setattr(MoodleProgress, 'time', SimpleNamespace(monotonic=lambda: clock[0]))
+    return clock
+
+
+def tracker(events, files_total) -> ProgressTracker:
+    progress = ProgressTracker(interval=0.25)
+    progress.add_listener(events.append)
+    progress.reset(files_total)
+    return progress
+
+
+def test_batching(clock):
+    events = []
+    progress = tracker(events, 3)
+    for file in range(3):
+        progress.start_file(f'https://moodle.ksz.ch/{file}', f'File {file}', 1000)
+    for chunk in range(10):
+        progress.advance(f'https://moodle.ksz.ch/{chunk % 2}', 100)
+    assert events == []  # the chunks are only counted until the interval passed
+
+    clock[0] = 0.5
+    progress.advance('https://moodle.ksz.ch/2', 100)
+    assert len(events) == 1
+    assert sorted(file.name for file in events[0].files) == ['File 0', 'File 1', 'File 2']  # every file that changed, once
+    assert events[0].bytes_received == 1100 and events[0].bytes_total == 3000
+    assert events[0].rate == 1100 / 0.5
+    assert events[0].eta == pytest.approx(1900 / events[0].rate)
+
+
+def test_rate_limit(clock):
+    events = []
+    progress = tracker(events, 2)
+    progress.start_file('https://moodle.ksz.ch/0', 'File 0', 10000)
+    for step in range(1, 41):
+        clock[0] = step * 0.05  # a chunk every 50 ms for two seconds
+        progress.advance('https://moodle.ksz.ch/0', 100)
+    assert len(events) == 8  # at most one event every 250 ms
+    assert all(event.files for event in events)
+
+
+def test_final_event(clock):
+    events = []
+    progress = tracker(events, 2)
+    progress.start_file('https://moodle.ksz.ch/0', 'File 0', 1000)
+    progress.advance('https://moodle.ksz.ch/0', 1000)
+    progress.finish_file('https://moodle.ksz.ch/0')
+    progress.finish_file('https://moodle.ksz.ch/1', failed=True)  # before the interval passed, but it's the last file
+
+    assert len(events) == 1
+    event = events[-1]
+    assert (event.files_done, event.files_failed, event.files_total, event.eta) == (1, 1, 2, 0.0)
+    assert str(event).startswith('1/2 Files, 1 failed, ')
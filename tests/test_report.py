@@ -0,0 +1,75 @@
+"""
+Tests summarising the requests of a sync into a report
+"""
+
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from MoodleDataTypes import MoodleFile
+from MoodleReport import RequestTiming, create_report, write_report
+from MoodleStorage import load_json
+
+
+def timing(url, ttfb, transfer=0.0, parse=0.0, size=0) -> RequestTiming:
+    request = RequestTiming(url, 'GET', 0.0)
+    request.status = 200
+    request.ttfb = ttfb
+    request.end = ttfb + transfer
+    request.parse = parse
+    request.bytes = size
+    return request
+
+
+def downloaded(url, path, size) -> MoodleFile:
+    file = MoodleFile(url, os.path.basename(path))
+    file.path = path
+    file.size = size
+    return file
+
+
+def test_timing():
+    request = timing('https://moodle.ksz.ch/course/view.php?id=1', 0.2, transfer=0.3, parse=0.1)
+    assert request.transfer == 0.3
+    assert round(request.total, 6) == 0.6
+    assert RequestTiming('https://moodle.ksz.ch/', 'GET', 0.0).total == 0.0  # a request which never got an answer
+
+
+def test_create_report():
+    timings = [timing(f'https://moodle.ksz.ch/pluginfile.php/{file}/slides.pdf', 0.1 * file, transfer=0.1, size=1000) for file in range(5)]
+    timings.append(timing('https://moodle.ksz.ch/course/view.php?id=1', 0.05, parse=0.5))
+    moodle = SimpleNamespace(timer=SimpleNamespace(timings=timings), cache=SimpleNamespace(hits=3, misses=1), limiter=None)
+    files = [downloaded(f'https://moodle.ksz.ch/pluginfile.php/{file}/slides.pdf', f'Course {file % 2}/{file}.pdf', 1000) for file in range(4)]
+    failed = [MoodleFile('https://moodle.ksz.ch/pluginfile.php/4/slides.pdf', '4.pdf')]
+
+    report = create_report(moodle, files, failed, datetime(2021, 3, 12, 10, 24), 2.5, slowest=3)
+    assert report['requests'] == 6 and report['bytes'] == 5000
+    assert report['downloaded'] == 4 and report['failed'] == ['https://moodle.ksz.ch/pluginfile.php/4/slides.pdf']
+    assert [request['url'] for request in report['slowest']] == [  # the parse time counts as well
+        'https://moodle.ksz.ch/course/view.php?id=1',
+        'https://moodle.ksz.ch/pluginfile.php/4/slides.pdf',
+        'https://moodle.ksz.ch/pluginfile.php/3/slides.pdf',
+    ]
+    assert report['courses'] == {
+        'Course 0': {'files': 2, 'bytes': 2000, 'seconds': 0.4, 'throughput': 5000},  # files 0 and 2
+        'Course 1': {'files': 2, 'bytes': 2000, 'seconds': 0.6, 'throughput': 3333},  # files 1 and 3
+    }
+    assert report['cache'] == {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+    assert 'concurrency' not in report
+
+
+def test_create_report_without_requests():
+    moodle = SimpleNamespace(timer=None, cache=SimpleNamespace(hits=0, misses=0), limiter=None)
+    report = create_report(moodle, [], [], datetime(2021, 3, 12, 10, 24), 0.1)
+    assert report['requests'] == 0 and report['slowest'] == [] and report['courses'] == {}
+    assert report['cache']['hit_rate'] is None
+
+
+def test_write_report(tmp_path):
+    directory = str(tmp_path)
+    started = datetime(2021, 3, 12, 10, 24)
+    paths = [write_report({'started': (started + timedelta(microseconds=sync)).isoformat()}, directory, keep=3) for sync in range(5)]
+    assert len(set(paths)) == 5  # syncs within the same second get their own report
+
+    assert sorted(os.listdir(directory)) == sorted(os.path.basename(path) for path in paths[-3:])  # the oldest reports are removed
+    assert load_json(paths[-1]) == {'started': (started + timedelta(microseconds=4)).isoformat()}
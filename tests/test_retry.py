@@ -0,0 +1,164 @@
+"""
+Tests retrying requests which failed because Moodle was busy against a local server
+"""
+
+import os
+import time
+import asyncio
+from argparse import Namespace
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from aiohttp import web
+
+import xmoodle
+from conftest import run, start_fake_moodle
+from fake_moodle import FakeMoodle, USERNAME, PASSWORD
+from Moodle import MoodleSession, MoodleConfig, TemporaryServerError
+from MoodleDataTypes import MoodleFile
+from MoodleStorage import dump_json
+
+BODY = os.urandom(64 * 1024)
+
+pytestmark = pytest.mark.file_server(BODY)
+
+
+class Response:
+    """
+    Has the attributes of a ClientResponse check_status looks at
+    """
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def moodle(loop, file_server):
+    """
+    A session sending its requests to the FileServer, which retries quickly
+    """
+    async def create() -> MoodleSession:
+        return MoodleSession(file_server.url, f'{file_server.url}/login/index.php',
+                             config=MoodleConfig(retries=3, backoff=0.01, adaptive=False))
+
+    session = loop.run_until_complete(create())
+    yield session
+    loop.run_until_complete(session.close())
+
+
+def test_check_status():
+    MoodleSession.check_status(Response(200))
+    MoodleSession.check_status(Response(404))  # isn't temporary, raise_for_status handles it
+
+    with pytest.raises(TemporaryServerError) as error:
+        MoodleSession.check_status(Response(503, {'Retry-After': '120'}))
+    assert error.value.status == 503 and error.value.retry_after == 120
+
+    with pytest.raises(TemporaryServerError) as error:
+        MoodleSession.check_status(Response(500, {'Retry-After': '120'}))  # Retry-After only counts for 429 and 503
+    assert error.value.retry_after is None
+
+
+def test_check_status_date():
+    date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    with pytest.raises(TemporaryServerError) as error:
+        MoodleSession.check_status(Response(429, {'Retry-After': date}))
+    assert 55 < error.value.retry_after <= 60
+
+    with pytest.raises(TemporaryServerError) as error:
+        MoodleSession.check_status(Response(429, {'Retry-After': 'soon'}))
+    assert error.value.retry_after is None
+
+
+async def test_retry_download(moodle, file_server, tmp_path):
+    file_server.failures = [(502, None), (504, None)]
+    file = MoodleFile(file_server.url, 'Slides', 'Topic 1')
+    await moodle.download_file(file, str(tmp_path))
+    with open(file.download_path, 'rb') as downloaded:
+        assert downloaded.read() == BODY
+    assert len(file_server.requests) == 3
+
+
+async def test_retry_after(moodle, file_server, tmp_path):
+    file_server.failures = [(503, '0.3')]
+    start = time.monotonic()
+    await moodle.download_file(MoodleFile(file_server.url, 'Slides', 'Topic 1'), str(tmp_path))
+    assert time.monotonic() - start >= 0.3  # waited as long as the server asked, not just the backoff
+    assert len(file_server.requests) == 2
+
+
+async def test_retry_page(moodle, file_server):
+    file_server.failures = [(429, '0'), (500, None)]
+    assert await moodle.is_logged_in()
+    assert len(file_server.requests) == 3
+
+
+async def test_retries_exhausted(moodle, file_server, tmp_path):
+    file_server.failures = [(503, '0')] * 3
+    moodle.config.retries = 2
+    with pytest.raises(TemporaryServerError) as error:
+        await moodle.download_file(MoodleFile(file_server.url, 'Slides', 'Topic 1'), str(tmp_path))
+    assert error.value.status == 503
+    assert len(file_server.requests) == 3
+    assert not os.path.exists(f'{tmp_path}/Topic 1')  # the error page wasn't saved as the file
+
+
+def daemon_config(base_url, tmp_path) -> dict:
+    """
+    Creates the config of a daemon syncing the first course of the fake Moodle
+    """
+    dump_json([{'url': f'{base_url}/course/view.php?id=0', 'name': 'Course 0', 'checked': True}], f'{tmp_path}/courses.json')
+    return {'default_path': f'{tmp_path}/files', 'retries': 1, 'backoff': 0.01,
+            'urls': {'home': f'{base_url}/my/', 'login': f'{base_url}/login/index.php'},
+            'logindata': {'username': USERNAME, 'password': PASSWORD}}
+
+
+async def daemon(config, tmp_path) -> None:
+    """
+    Runs a daemon syncing every 0.05 seconds for a second, which has to keep running
+    """
+    args = Namespace(daemon=True, interval=0.05, data=str(tmp_path), progress=False)
+    with pytest.raises(asyncio.TimeoutError):  # still running after several syncs
+        await asyncio.wait_for(xmoodle.run_sync(args, config), 1)
+
+
+def test_daemon_survives_outage(tmp_path, capsys):
+    """
+    A daemon keeps running if Moodle is still down after all retries
+    """
+    async def unavailable(request):
+        raise web.HTTPServiceUnavailable(headers={'Retry-After': '0'})
+
+    fake_moodle = FakeMoodle(courses=1)
+    fake_moodle.course = unavailable  # replaced before the app is created, which binds the handlers
+
+    async def main():
+        runner = await start_fake_moodle(fake_moodle)
+        try:
+            await daemon(daemon_config(fake_moodle.base_url, tmp_path), tmp_path)
+        finally:
+            await runner.cleanup()
+
+    run(main())
+    assert capsys.readouterr().err.count('Sync failed: TemporaryServerError') >= 2
+
+
+@pytest.mark.fake_moodle(courses=1)
+async def test_daemon_survives_errors(fake_moodle, tmp_path, capsys, monkeypatch):
+    """
+    A daemon keeps running if a sync fails unexpectedly and only checks the session after its first sync
+    """
+    home_requests = []
+
+    async def sync(moodle, config, index, state, data_path):
+        home_requests.append(fake_moodle.paths['/my/'])
+        if len(home_requests) == 1:
+            raise AttributeError("'NoneType' object has no attribute 'find_all'")  # like an unexpected page
+        return []
+    monkeypatch.setattr(xmoodle, 'sync', sync)
+
+    await daemon(daemon_config(fake_moodle.base_url, tmp_path), tmp_path)
+    assert len(home_requests) >= 3
+    assert home_requests[:2] == [1, 2]  # only the login requested the home page before the first sync
+    assert 'AttributeError' in capsys.readouterr().err
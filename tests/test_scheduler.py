@@ -0,0 +1,165 @@
+"""
+Tests limiting how many downloads and requests run at once
+"""
+
+import asyncio
+from collections import Counter
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from Moodle import MoodleSession, MoodleConfig
+from MoodleDataTypes import MoodleFile
+from MoodleScheduler import DownloadScheduler, AdaptiveLimiter
+
+
+class Downloader:
+    """
+    Has the download_file of a MoodleSession and records how many downloads of every host run at once
+    """
+    def __init__(self, fail=()):
+        self.fail = fail  # the names of the files whose download raises
+        self.running = Counter()
+        self.most_running = Counter()
+        self.started = []
+
+    async def download_file(self, file, base_path) -> str:
+        host = urlsplit(file.url).netloc
+        self.started.append(file.name)
+        self.running[host] += 1
+        self.most_running[host] = max(self.most_running[host], self.running[host])
+        await asyncio.sleep(0.01)
+        self.running[host] -= 1
+        if file.name in self.fail:
+            raise OSError(f'{file.name} failed')
+        return f'{base_path}/{file.name}'
+
+
+async def scheduled(scheduler) -> list:
+    return [result async for result in scheduler.run()]
+
+
+async def test_host_concurrency():
+    downloader = Downloader()
+    scheduler = DownloadScheduler(downloader, 'files', concurrency=8, host_concurrency=2)
+    for file in range(12):
+        scheduler.add(MoodleFile(f'https://host{file % 2}.ch/{file}', f'File {file}'))
+
+    assert len(await scheduled(scheduler)) == 12
+    assert downloader.most_running == {'host0.ch': 2, 'host1.ch': 2}
+    assert len(scheduler) == 0
+
+
+async def test_priority():
+    downloader = Downloader()
+    scheduler = DownloadScheduler(downloader, 'files', concurrency=1)
+    for name, priority in (('c', 2), ('a', 0), ('d', 2), ('b', 1)):
+        scheduler.add(MoodleFile(f'https://moodle.ksz.ch/{name}', name), priority)
+
+    results = await scheduled(scheduler)
+    assert downloader.started == ['a', 'b', 'c', 'd']  # files with the same priority keep their order
+    assert [file.name for file, _ in results] == ['a', 'b', 'c', 'd']
+
+
+async def test_failed_download():
+    downloader = Downloader(fail=('b',))
+    scheduler = DownloadScheduler(downloader, 'files', concurrency=2)
+    for name in 'abcd':
+        scheduler.add(MoodleFile(f'https://moodle.ksz.ch/{name}', name))
+
+    results = {file.name: result async for file, result in scheduler.run()}
+    assert isinstance(results.pop('b'), OSError)
+    assert results == {'a': 'files/a', 'c': 'files/c', 'd': 'files/d'}  # the other downloads went on
+
+
+def limiter(clock) -> AdaptiveLimiter:
+    """
+    Creates a limiter which reads the time from clock[0], so the tests don't have to wait
+    """
+    adaptive = AdaptiveLimiter(initial=4, maximum=32, slack=0)
+    adaptive.clock = lambda: clock[0]
+    return adaptive
+
+
+def observe(adaptive, clock, latency, requests) -> None:
+    for _ in range(requests):
+        clock[0] += 0.1
+        adaptive.observe(latency)
+
+
+def test_limiter_growth():
+    clock = [0.0]
+    adaptive = limiter(clock)
+    observe(adaptive, clock, 0.1, 50)
+    assert adaptive.base_latency == 0.1
+    assert 10 < adaptive.limit <= 32
+
+    observe(adaptive, clock, 0.1, 1000)
+    assert adaptive.limit == 32
+
+
+def test_limiter_backoff():
+    clock = [0.0]
+    adaptive = limiter(clock)
+    observe(adaptive, clock, 0.1, 50)
+    grown = adaptive.limit
+
+    observe(adaptive, clock, 1.0, 200)  # a sustained slowdown, within the window
+    assert adaptive.base_latency == 0.1  # the baseline doesn't creep up to the slow latency
+    assert adaptive.limit == 1
+
+    adaptive.limit = grown
+    adaptive.observe(error=True)
+    assert adaptive.limit == grown / 2
+    assert adaptive.stats()['errors'] == 1
+
+
+def test_limiter_recovery():
+    clock = [0.0]
+    adaptive = limiter(clock)
+    observe(adaptive, clock, 0.1, 50)
+    observe(adaptive, clock, 1.0, 100)
+    assert adaptive.limit == 1
+
+    observe(adaptive, clock, 0.1, 50)  # Moodle is fast again
+    assert adaptive.limit > 4
+
+    observe(adaptive, clock, 0.5, 700)  # the route changed for good, so the old minimum is forgotten
+    assert adaptive.base_latency == 0.5
+    assert adaptive.limit > 4
+
+
+async def test_limiter_slot(tmp_path):
+    """
+    A download only holds a slot of the limiter until its headers arrived
+    """
+    async def slow_file(request):
+        response = web.StreamResponse(headers={'Content-Length': str(10 * 1024)})
+        await response.prepare(request)
+        for _ in range(10):
+            await asyncio.sleep(0.05)
+            await response.write(b'x' * 1024)
+        return response
+
+    async def home(request):
+        return web.Response(text='home')
+
+    app = web.Application()
+    app.router.add_get('/pluginfile.php/1/slides.pdf', slow_file)
+    app.router.add_get('/my/', home)
+    server = TestServer(app)
+    await server.start_server()
+    url = str(server.make_url(''))
+    try:
+        config = MoodleConfig(adaptive_initial=1, adaptive_max=1)
+        async with MoodleSession(f'{url}/my/', f'{url}/login/index.php', config=config) as moodle:
+            download = asyncio.ensure_future(moodle.download_file(MoodleFile(f'{url}/pluginfile.php/1/slides.pdf', 'Slides'), str(tmp_path)))
+            await asyncio.sleep(0.1)  # the download is streaming its body now
+            assert await moodle.is_logged_in()
+            assert not download.done()  # the page didn't wait for the download
+
+            await download
+            assert moodle.limiter.base_latency < 0.2  # the time to the headers, not to the end of the body
+    finally:
+        await server.close()
@@ -0,0 +1,74 @@
+"""
+Tests diffing courses against their snapshot and moving the files moved on Moodle
+"""
+
+import os
+
+from MoodleDataTypes import MoodleCourse, MoodleSection, MoodleFolder, MoodleFile, MoodleAssignment
+from MoodleSnapshot import SnapshotStore, CourseDiff
+from MoodleStorage import SyncIndex, DownloadLog
+from MoodleSync import move_files
+
+URL = 'https://moodle.ksz.ch/mod/resource/view.php?id='
+
+
+def create_course(slides_section='Topic 1', slides_name='Slides', exercises=True) -> MoodleCourse:
+    sections = {name: MoodleSection(f'https://moodle.ksz.ch/course/view.php?id=1#{name}', name) for name in ('Topic 1', 'Topic 2')}
+    sections[slides_section].files.append(MoodleFile(f'{URL}1', slides_name, slides_section))
+    if exercises:
+        sections['Topic 1'].files.append(MoodleFile(f'{URL}2', 'Exercises', 'Topic 1'))
+    sections['Topic 2'].folders.append(MoodleFolder('https://moodle.ksz.ch/mod/folder/view.php?id=3', 'Solutions'))
+    sections['Topic 2'].assignments.append(MoodleAssignment('https://moodle.ksz.ch/mod/assign/view.php?id=4', 'Essay'))
+    return MoodleCourse('https://moodle.ksz.ch/course/view.php?id=1', 'Physics', list(sections.values()))
+
+
+def test_unchanged():
+    course_diff = CourseDiff(create_course(), create_course())
+    assert not course_diff
+    assert course_diff.to_dict() == {'added': [], 'removed': [], 'renamed': [], 'moved': []}
+
+
+def test_changes():
+    old = create_course()
+    new = create_course(slides_section='Topic 2', exercises=False)
+    new.sections[0].files.append(MoodleFile(f'{URL}5', 'Notes', 'Topic 1'))
+    new.sections[1].assignments[0].name = 'Final Essay'
+
+    course_diff = CourseDiff(old, new)
+    assert [item.url for item in course_diff.added] == [f'{URL}5']
+    assert [item.url for item in course_diff.removed] == [f'{URL}2']
+    assert [(old.name, new.name) for old, new in course_diff.renamed] == [('Essay', 'Final Essay')]
+    assert [(old.path, new.path) for old, new in course_diff.moved] == [('Topic 1', 'Topic 2')]
+    assert course_diff.summary() == 'Physics: 1 added, 1 removed, 1 renamed, 1 moved'
+
+
+def test_store(tmp_path):
+    snapshots = SnapshotStore(f'{tmp_path}/snapshots')
+    assert snapshots.load('https://moodle.ksz.ch/course/view.php?id=1') is None
+    snapshots.save(create_course())
+    assert snapshots.load('https://moodle.ksz.ch/course/view.php?id=1').to_dict() == create_course().to_dict()
+
+
+def test_move_files(tmp_path):
+    base_path = f'{tmp_path}/files'
+    index = SyncIndex(f'{tmp_path}/index.sqlite')
+    log = DownloadLog(f'{tmp_path}/history.jsonl')
+
+    old = create_course()
+    slides = MoodleFile(f'{URL}1', 'Slides', 'Physics/Topic 1', f'{base_path}/Physics/Topic 1/slides.pdf')
+    os.makedirs(os.path.dirname(slides.download_path))
+    open(slides.download_path, 'w').close()
+    index.add(slides)
+    log.append([slides])
+
+    moved = move_files(CourseDiff(old, create_course(slides_section='Topic 2', slides_name='Old Slides')), base_path, index, log)
+
+    assert moved == 1
+    assert os.path.exists(f'{base_path}/Physics/Topic 2/slides.pdf')
+    assert not os.path.exists(f'{base_path}/Physics/Topic 1')  # the folder left empty was removed
+    assert index.get(slides.url)['download_path'] == f'{base_path}/Physics/Topic 2/slides.pdf'
+    entries = log.tail(10)
+    assert len(entries) == 1  # the move record isn't shown as a download of its own
+    assert entries[0]['download_path'] == f'{base_path}/Physics/Topic 2/slides.pdf'
+    assert entries[0]['name'] == 'Slides'
+    index.close()
@@ -0,0 +1,312 @@
+"""
+Tests the classes persisting data in the data folder
+"""
+
+import os
+import hashlib
+
+import pytest
+from yarl import URL
+from aiohttp import CookieJar
+
+from fake_moodle import USERNAME, PASSWORD
+from Moodle import MoodleSession, MoodleConfig, MoodleParser, IncorrectLogindata
+from MoodleDataTypes import MoodleFile
+from MoodleReport import RequestTimer
+from MoodleStorage import HttpCache, SyncIndex, BlobStore, DownloadLog, CookieStore, dump_json, load_json
+
+LOGINDATA = {'username': USERNAME, 'password': PASSWORD}
+HOME_URL = URL('https://moodle.ksz.ch/my/')
+
+
+def test_cache_store(tmp_path):
+    cache = HttpCache(f'{tmp_path}/cache')
+    cache.store('https://moodle.ksz.ch/a', 'a' * 100, etag='"a"')
+    cache.store('https://moodle.ksz.ch/b', 'b' * 100, last_modified='Mon, 01 Mar 2021 08:00:00 GMT')
+    cache.store('https://moodle.ksz.ch/c', 'c' * 100)  # can't be requested conditionally
+    assert not os.path.exists(f'{tmp_path}/cache/index.json')  # the index is only written by save
+
+    cache.store_parsed('https://moodle.ksz.ch/a', 'parse_folder_page', [['url', 'name']])
+    assert cache.get('https://moodle.ksz.ch/a') == 'a' * 100
+    assert cache.get_parsed('https://moodle.ksz.ch/a', 'parse_folder_page') == [['url', 'name']]
+    assert cache.headers('https://moodle.ksz.ch/b') == {'If-Modified-Since': 'Mon, 01 Mar 2021 08:00:00 GMT'}
+    assert cache.get('https://moodle.ksz.ch/c') is None
+
+    cache.save()
+    reopened = HttpCache(f'{tmp_path}/cache')
+    assert reopened.index == load_json(f'{tmp_path}/cache/index.json')
+    assert reopened.size == cache.size == sum(entry['size'] for entry in cache.index.values())
+
+
+def test_cache_evict(tmp_path):
+    cache = HttpCache(f'{tmp_path}/cache', max_size=1000)
+    for page in range(10):
+        cache.store(f'https://moodle.ksz.ch/{page}', 'x' * 100, etag=f'"{page}"')
+    assert len(cache.index) == 10 and cache.size == 1000
+
+    cache.get('https://moodle.ksz.ch/0')  # the first page is used again, so the second is the least recently used
+    cache.store('https://moodle.ksz.ch/10', 'x' * 100, etag='"10"')
+    assert cache.size <= 900
+    assert 'https://moodle.ksz.ch/0' in cache.index
+    assert 'https://moodle.ksz.ch/1' not in cache.index
+    assert not os.path.exists(cache._path('https://moodle.ksz.ch/1', 'html'))
+
+    cache.store('https://moodle.ksz.ch/0', 'x' * 50, etag='"0b"')  # a changed page replaces its old size
+    assert cache.size == sum(entry['size'] for entry in cache.index.values())
+
+
+def test_cache_store_without_validators(tmp_path):
+    cache = HttpCache(f'{tmp_path}/cache')
+    cache.store('https://moodle.ksz.ch/a', 'a' * 100, etag='"a"')
+    cache.store_parsed('https://moodle.ksz.ch/a', 'parse_folder_page', [['url', 'name']])
+
+    cache.store('https://moodle.ksz.ch/a', 'new' * 100)  # the server stopped sending an ETag
+    assert cache.headers('https://moodle.ksz.ch/a') == {}  # so the old page isn't requested conditionally anymore
+    assert cache.get('https://moodle.ksz.ch/a') is None and cache.get_parsed('https://moodle.ksz.ch/a', 'parse_folder_page') is None
+    assert cache.size == 0 and os.listdir(f'{tmp_path}/cache') == []
+
+
+@pytest.mark.fake_moodle(courses=1)
+async def test_cache_not_modified(fake_moodle, tmp_path, monkeypatch):
+    url = f'{fake_moodle.base_url}/course/view.php?id=0'
+    timer = RequestTimer()
+    async with MoodleSession(f'{fake_moodle.base_url}/my/', f'{fake_moodle.base_url}/login/index.php',
+                             config=MoodleConfig(), cache=HttpCache(f'{tmp_path}/cache'), timer=timer) as moodle:
+        items = await moodle.fetch_page(url, MoodleParser.parse_course_page)
+
+        parsed = []
+        monkeypatch.setattr(MoodleSession, 'parse', lambda self, parser, html: parsed.append(parser))
+        assert await moodle.fetch_page(url, MoodleParser.parse_course_page) == [list(item) for item in items]
+        assert parsed == []  # the page wasn't parsed again
+        assert [timing.status for timing in timer.timings] == [200, 304]
+        assert timer.timings[1].bytes == 0  # nor transferred again
+        assert (moodle.cache.hits, moodle.cache.misses) == (1, 1)
+
+
+def test_index(tmp_path):
+    index = SyncIndex(f'{tmp_path}/index.sqlite')
+    file = MoodleFile('https://moodle.ksz.ch/1', 'Slides', 'Topic 1')
+    assert file.url not in index and index.get(file.url) is None
+
+    file.download_path, file.size, file.hash, file.etag = f'{tmp_path}/Topic 1/slides.pdf', 100, 'a' * 64, '"v1"'
+    index.add(file)
+    assert file.url in index
+    assert index.get(file.url)['download_path'] == f'{tmp_path}/Topic 1/slides.pdf'
+    assert index.find_blob('"v1"', 100) == 'a' * 64
+    assert index.find_blob('"v1"', 101) is None  # same ETag, but another file
+    assert index.find_blob(None, 100) is None
+
+    index.move(file.url, 'Topic 2', f'{tmp_path}/Topic 2/slides.pdf')
+    assert index.get(file.url)['path'] == 'Topic 2'
+    index.close()
+
+
+def test_index_legacy(tmp_path):
+    write(f'{tmp_path}/files/Topic 1/0.pdf', b'slides')
+    os.utime(f'{tmp_path}/files/Topic 1/0.pdf', (1614585600, 1614585600))
+    dump_json([{'url': f'https://moodle.ksz.ch/{file}', 'type': 'MoodleFile', 'name': f'File {file}',
+                'path': 'Topic 1', 'download_path': f'{tmp_path}/files/Topic 1/{file}.pdf'} for file in range(2)], f'{tmp_path}/files.json')
+
+    index = SyncIndex(f'{tmp_path}/index.sqlite', legacy_path=f'{tmp_path}/files.json')
+    assert 'https://moodle.ksz.ch/0' in index and 'https://moodle.ksz.ch/1' in index
+    assert index.get('https://moodle.ksz.ch/0')['downloaded_at'] == 1614585600  # the mtime of the file
+    assert index.get('https://moodle.ksz.ch/1')['downloaded_at'] is None  # the file doesn't exist anymore
+    assert index.connection.execute('PRAGMA user_version').fetchone()[0] == 1
+    index.connection.execute('DELETE FROM files')
+    index.connection.commit()
+    index.close()
+
+    index = SyncIndex(f'{tmp_path}/index.sqlite', legacy_path=f'{tmp_path}/files.json')
+    assert 'https://moodle.ksz.ch/0' not in index  # files.json is only migrated once
+    index.close()
+
+
+def write(path, content) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as new_file:
+        new_file.write(content)
+
+
+def test_blobs(tmp_path):
+    blobs = BlobStore(f'{tmp_path}/.xmoodle/blobs')
+    content = b'slides' * 1000
+    file_hash = hashlib.sha256(content).hexdigest()
+
+    write(f'{tmp_path}/Topic 1/slides.pdf', content)
+    blobs.add(f'{tmp_path}/Topic 1/slides.pdf', file_hash)
+    assert file_hash in blobs
+    assert os.path.samefile(blobs.path(file_hash), f'{tmp_path}/Topic 1/slides.pdf')  # stored without a second copy
+
+    write(f'{tmp_path}/Topic 2/slides.pdf', content)
+    blobs.add(f'{tmp_path}/Topic 2/slides.pdf', file_hash)
+    assert os.path.samefile(f'{tmp_path}/Topic 1/slides.pdf', f'{tmp_path}/Topic 2/slides.pdf')
+
+    assert blobs.link(file_hash, f'{tmp_path}/Topic 3/slides.pdf') is False  # the folder doesn't exist
+    os.makedirs(f'{tmp_path}/Topic 3')
+    assert blobs.link(file_hash, f'{tmp_path}/Topic 3/slides.pdf')
+    with open(f'{tmp_path}/Topic 3/slides.pdf', 'rb') as linked:
+        assert linked.read() == content
+
+
+def test_blobs_edited(tmp_path):
+    blobs = BlobStore(f'{tmp_path}/.xmoodle/blobs')
+    content = b'slides' * 1000
+    file_hash = hashlib.sha256(content).hexdigest()
+    write(f'{tmp_path}/Topic 1/slides.pdf', content)
+    blobs.add(f'{tmp_path}/Topic 1/slides.pdf', file_hash)
+
+    with open(f'{tmp_path}/Topic 1/slides.pdf', 'ab') as annotated:  # edited in place, which changes the stored file as well
+        annotated.write(b'notes')
+
+    os.makedirs(f'{tmp_path}/Topic 2')
+    assert not blobs.link(file_hash, f'{tmp_path}/Topic 2/slides.pdf')  # so it has to be downloaded again
+    assert file_hash not in blobs
+    assert not os.path.exists(f'{tmp_path}/Topic 2/slides.pdf')
+    with open(f'{tmp_path}/Topic 1/slides.pdf', 'rb') as annotated:
+        assert annotated.read() == content + b'notes'
+
+    write(f'{tmp_path}/Topic 2/slides.pdf', content)  # the new download is stored instead
+    blobs.add(f'{tmp_path}/Topic 2/slides.pdf', file_hash)
+    assert os.path.samefile(blobs.path(file_hash), f'{tmp_path}/Topic 2/slides.pdf')
+
+
+def test_blobs_without_links(tmp_path, monkeypatch):
+    def link(source, destination):
+        raise PermissionError(1, 'Operation not permitted')  # like on a FAT or exFAT drive
+    monkeypatch.setattr(os, 'link', link)
+
+    blobs = BlobStore(f'{tmp_path}/.xmoodle/blobs')
+    content = b'slides' * 1000
+    write(f'{tmp_path}/Topic 1/slides.pdf', content)
+    blobs.add(f'{tmp_path}/Topic 1/slides.pdf', hashlib.sha256(content).hexdigest())
+
+    with open(f'{tmp_path}/Topic 1/slides.pdf', 'rb') as downloaded:  # the file is left where it is
+        assert downloaded.read() == content
+    assert hashlib.sha256(content).hexdigest() not in blobs  # and isn't copied
+
+
+def test_log_tail(tmp_path):
+    log = DownloadLog(f'{tmp_path}/history.jsonl')
+    assert log.tail(10) == []
+    log.BLOCK_SIZE = 100  # so the lines are spread over many blocks
+    for batch in range(10):
+        log.append([MoodleFile(f'https://moodle.ksz.ch/{batch}/{file}', f'File {file}', 'Topic 1') for file in range(10)])
+
+    entries = log.tail(25)
+    assert [entry['url'] for entry in entries] == [f'https://moodle.ksz.ch/{9 - i // 10}/{9 - i % 10}' for i in range(25)]
+    assert len(log.tail(1000)) == 100
+
+
+def test_log_cut_off_line(tmp_path):
+    log = DownloadLog(f'{tmp_path}/history.jsonl')
+    log.append([MoodleFile('https://moodle.ksz.ch/1', 'First')])
+    with open(f'{tmp_path}/history.jsonl', 'ab') as log_file:  # a crash in the middle of an append
+        log_file.write(b'{"url": "https://moodle.ksz.ch/2", "na')
+    log.append([MoodleFile('https://moodle.ksz.ch/3', 'Third')])
+
+    assert [entry['url'] for entry in log.tail(10)] == ['https://moodle.ksz.ch/3', 'https://moodle.ksz.ch/1']
+
+
+def test_log_compact(tmp_path):
+    log = DownloadLog(f'{tmp_path}/history.jsonl', max_entries=5, compact_size=1)  # compacted after every append
+    for file in range(10):
+        log.append([MoodleFile(f'https://moodle.ksz.ch/{file % 7}', f'File {file}')])
+    assert [entry['name'] for entry in log.tail(10)] == ['File 9', 'File 8', 'File 7', 'File 6', 'File 5']
+
+
+def test_log_legacy(tmp_path):
+    dump_json([{'url': f'https://moodle.ksz.ch/{file}', 'type': 'MoodleFile', 'name': f'File {file}',
+                'path': 'Topic 1', 'download_path': f'files/Topic 1/{file}.pdf'} for file in range(3)], f'{tmp_path}/files.json')
+    log = DownloadLog(f'{tmp_path}/history.jsonl', legacy_path=f'{tmp_path}/files.json')
+    assert [entry['name'] for entry in log.tail(10)] == ['File 2', 'File 1', 'File 0']
+
+
+def test_blobs_fingerprint(tmp_path, monkeypatch):
+    import MoodleStorage
+
+    blobs = BlobStore(f'{tmp_path}/.xmoodle/blobs')
+    content = b'slides' * 1000
+    file_hash = hashlib.sha256(content).hexdigest()
+    write(f'{tmp_path}/Topic 1/slides.pdf', content)
+    blobs.add(f'{tmp_path}/Topic 1/slides.pdf', file_hash)
+
+    hashed = []
+    monkeypatch.setattr(MoodleStorage.hashlib, 'sha256', lambda: hashed.append(True) or hashlib.new('sha256'))
+    os.makedirs(f'{tmp_path}/Topic 2')
+    assert blobs.link(file_hash, f'{tmp_path}/Topic 2/slides.pdf')
+    assert hashed == []  # the stored file is unchanged, so it isn't read
+
+    os.utime(f'{tmp_path}/Topic 1/slides.pdf', ns=(0, 0))  # touched, but the content is the same
+    assert blobs.link(file_hash, f'{tmp_path}/Topic 2/slides.pdf')
+    assert blobs.link(file_hash, f'{tmp_path}/Topic 2/slides.pdf')
+    assert hashed == [True]  # hashed once, then the new fingerprint is stored
+
+
+@pytest.fixture
+def cookies(loop, tmp_path, monkeypatch):
+    """
+    A CookieStore containing the cookie of a session logged in with LOGINDATA
+    """
+    pytest.importorskip('cryptography')
+    monkeypatch.setattr(CookieStore, 'ITERATIONS', 1000)  # deriving the real key takes a while
+
+    async def save() -> None:  # a cookie jar belongs to a running event loop
+        cookie_jar = CookieJar()
+        cookie_jar.update_cookies({'MoodleSession': 'authenticated'}, HOME_URL)
+        CookieStore(f'{tmp_path}/session').save(cookie_jar, LOGINDATA)
+
+    loop.run_until_complete(save())
+    return CookieStore(f'{tmp_path}/session')
+
+
+async def test_cookies(cookies):
+    cookie_jar = CookieJar()
+    assert cookies.load(cookie_jar, dict(LOGINDATA), str(HOME_URL))
+    assert cookie_jar.filter_cookies(HOME_URL)['MoodleSession'].value == 'authenticated'
+
+
+async def test_cookies_other_logindata(cookies):
+    for logindata in ({**LOGINDATA, 'username': 'teacher'}, {**LOGINDATA, 'password': 'changed'}):
+        cookie_jar = CookieJar()
+        assert not cookies.load(cookie_jar, logindata, str(HOME_URL))
+        assert len(cookie_jar) == 0
+
+
+async def test_cookies_corrupt(cookies):
+    for content in (b'', b'short', os.urandom(200)):
+        with open(cookies.path, 'wb') as cookie_file:
+            cookie_file.write(content)
+        cookie_jar = CookieJar()
+        assert not cookies.load(cookie_jar, dict(LOGINDATA), str(HOME_URL))
+        assert len(cookie_jar) == 0
+
+
+@pytest.mark.fake_moodle(courses=1)
+async def test_cookies_failed_login(fake_moodle, cookies):
+    async with MoodleSession(f'{fake_moodle.base_url}/my/', f'{fake_moodle.base_url}/login/index.php',
+                             config=MoodleConfig(), cookies=cookies) as moodle:
+        await moodle.login(dict(LOGINDATA))
+        assert os.path.exists(cookies.path)
+
+        moodle.cookie_jar.clear()
+        with pytest.raises(IncorrectLogindata):
+            await moodle.login({**LOGINDATA, 'password': 'wrong'})
+    assert not os.path.exists(cookies.path)  # the cookies of the earlier login aren't kept
+
+
+@pytest.mark.fake_moodle(courses=1)
+async def test_cookies_skip_login(fake_moodle, cookies):
+    def session() -> MoodleSession:
+        return MoodleSession(f'{fake_moodle.base_url}/my/', f'{fake_moodle.base_url}/login/index.php',
+                             config=MoodleConfig(), cookies=cookies)
+
+    async with session() as moodle:
+        await moodle.login(dict(LOGINDATA))
+    # the cookies of the fixture don't belong to the fake Moodle, which redirects to the login page before the logindata is posted
+    assert fake_moodle.paths['/login/index.php'] == 3
+
+    fake_moodle.paths.clear()
+    async with session() as moodle:
+        await moodle.login(dict(LOGINDATA))
+        assert await moodle.is_logged_in()
+    assert fake_moodle.paths == {'/my/': 2}  # the stored cookies are still valid, so there is no login
@@ -0,0 +1,109 @@
+"""
+Tests syncing the courses of the fake Moodle of the benchmarks
+"""
+
+import os
+
+import pytest
+
+from bench_sync import create_data
+from MoodleDataTypes import MoodleAssignment
+from MoodleStorage import SyncIndex, load_json
+from MoodleSync import create_session, sync
+
+pytestmark = pytest.mark.fake_moodle(courses=1, folder_files=2, file_size=1024)
+
+
+@pytest.fixture
+def config(fake_moodle, tmp_path):
+    return create_data(str(tmp_path), fake_moodle.base_url, 1)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SyncIndex(f'{tmp_path}/index.sqlite')
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def moodle(loop, config, index, tmp_path):
+    """
+    A session created like the one of a sync, which is logged in to the fake Moodle
+    """
+    async def login():
+        session = create_session(config, index, data_path=str(tmp_path))
+        await session.login(dict(config['logindata']))
+        return session
+
+    session = loop.run_until_complete(login())
+    yield session
+    loop.run_until_complete(session.close())
+
+
+def synced(moodle, config, index, tmp_path):
+    return sync(moodle, config, index, state=lambda message: None, data_path=str(tmp_path))
+
+
+async def test_sync(fake_moodle, moodle, config, index, tmp_path):
+    assert len(await synced(moodle, config, index, tmp_path)) == fake_moodle.files_per_course
+
+    fake_moodle.paths.clear()
+    assert await synced(moodle, config, index, tmp_path) == []
+    # the course page and the folder are requested conditionally, the assignment of the unchanged section isn't requested
+    assert fake_moodle.paths == {'/course/view.php': 1, '/mod/folder/view.php': 1}
+
+
+async def test_new_files_in_folder(fake_moodle, moodle, config, index, tmp_path):
+    assert len(await synced(moodle, config, index, tmp_path)) == 4  # a file, a url and the two files of the folder
+
+    fake_moodle.folder_files = 5  # doesn't change the course page
+    new_files = await synced(moodle, config, index, tmp_path)
+    assert sorted(file.name for file in new_files) == ['file2.pdf', 'file3.pdf', 'file4.pdf']
+
+
+async def test_changed_section(fake_moodle, moodle, config, index, tmp_path):
+    await synced(moodle, config, index, tmp_path)
+    assert fake_moodle.paths['/mod/assign/view.php'] == 1
+
+    fake_moodle.items = 2  # adds an assignment to the section
+    await synced(moodle, config, index, tmp_path)
+    assert fake_moodle.paths['/mod/assign/view.php'] == 3  # the assignments of the changed section are fetched again
+
+
+async def test_section_max_age(fake_moodle, moodle, config, index, tmp_path):
+    moodle.config.section_max_age = 0  # the status of the assignments is fetched every time
+    await synced(moodle, config, index, tmp_path)
+    await synced(moodle, config, index, tmp_path)
+    assert fake_moodle.paths['/mod/assign/view.php'] == 2
+
+
+async def test_submitted(fake_moodle, moodle, config, index, tmp_path):
+    await synced(moodle, config, index, tmp_path)
+    with open(f'{tmp_path}/essay.pdf', 'wb') as essay:
+        essay.write(b'essay')
+    await moodle.upload_file(f'{tmp_path}/essay.pdf', MoodleAssignment(f'{fake_moodle.base_url}/mod/assign/view.php?id=30000000', 'Assignment 0.0'))
+
+    fake_moodle.paths.clear()
+    await synced(moodle, config, index, tmp_path)
+    assert fake_moodle.paths['/mod/assign/view.php'] == 1  # the status after the submission isn't taken from the snapshot
+
+
+async def test_report(fake_moodle, moodle, config, index, tmp_path):
+    await synced(moodle, config, index, tmp_path)
+    fake_moodle.paths.clear()
+    await synced(moodle, config, index, tmp_path)
+
+    reports = sorted(os.listdir(f'{tmp_path}/reports'))
+    assert len(reports) == 2  # the two syncs within a second don't overwrite each other's report
+    first, second = (load_json(f'{tmp_path}/reports/{name}') for name in reports)
+    assert first['downloaded'] == 4 and first['failed'] == []
+    assert first['requests'] == 7  # the redirect of the resource to its file is timed with the resource
+    assert first['courses']['Course 0']['files'] == 4
+    assert first['courses']['Course 0']['bytes'] == 3 * 1024  # the url has no size
+    assert first['cache'] == {'hits': 0, 'misses': 4, 'hit_rate': 0.0}
+
+    assert second['requests'] == sum(fake_moodle.paths.values()) == 2  # the timer only covers its own sync
+    assert {timing['status'] for timing in second['slowest']} == {304}
+    assert second['bytes'] == 0 and second['courses'] == {}
+    assert second['cache'] == {'hits': 2, 'misses': 0, 'hit_rate': 1.0}
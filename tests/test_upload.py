@@ -0,0 +1,62 @@
+"""
+Tests submitting files to an assignment of the fake Moodle of the benchmarks
+"""
+
+import os
+
+import pytest
+
+from pages import submission_page
+from Moodle import MoodleParser, UploadError
+from MoodleDataTypes import MoodleAssignment
+from MoodleProgress import ProgressTracker
+
+pytestmark = pytest.mark.fake_moodle(courses=1)
+
+
+@pytest.fixture
+def assignment(fake_moodle):
+    return MoodleAssignment(f'{fake_moodle.base_url}/mod/assign/view.php?id=0', 'Assignment 0')
+
+
+@pytest.fixture
+def file_paths(tmp_path) -> list:
+    paths = []
+    for name, size in (('essay.pdf', 300 * 1024), ('notes.txt', 1024)):
+        paths.append(f'{tmp_path}/{name}')
+        with open(paths[-1], 'wb') as upload_file:
+            upload_file.write(name.encode() * (size // len(name)))
+    return paths
+
+
+def test_parse_submission_page():
+    form = MoodleParser.parse_submission_page(submission_page('https://moodle.ksz.ch', 123, max_files=3))
+    assert form['item_id'] == form['files_filemanager'] == '123'
+    assert form['sesskey'] == 'sesskey' and form['ctx_id'] == '7'
+    assert form['max_files'] == 3 and form['max_bytes'] == 0
+    assert form['author'] == 'Student' and form['user_id'] == '42'
+
+
+async def test_upload_files(fake_moodle, moodle, assignment, file_paths):
+    progress = ProgressTracker(interval=0)
+    events = []
+    progress.add_listener(events.append)
+
+    titles = await moodle.upload_files(file_paths, assignment, progress=progress)
+    assert sorted(titles) == ['essay.pdf', 'notes.txt']
+    assert len(fake_moodle.drafts) == 1  # the form is fetched once
+    assert fake_moodle.paths['/repository/repository_ajax.php'] == 2
+    assert fake_moodle.submissions == [1]  # and saved once with the draft area both files were uploaded to
+    for file_path in file_paths:
+        with open(file_path, 'rb') as upload_file:
+            assert fake_moodle.drafts[1][os.path.basename(file_path)] == upload_file.read()
+
+    assert events[-1].files_done == events[-1].files_total == 2 and events[-1].files_failed == 0
+    assert events[-1].bytes_received == sum(os.path.getsize(file_path) for file_path in file_paths)
+
+
+async def test_upload_rejected(fake_moodle, moodle, assignment, file_paths):
+    fake_moodle.rejected.add('notes.txt')
+    with pytest.raises(UploadError):
+        await moodle.upload_files(file_paths, assignment, progress=ProgressTracker())
+    assert fake_moodle.submissions == []  # nothing is submitted if a file was refused
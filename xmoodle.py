@@ -0,0 +1,120 @@
+"""
+Command line entry point of xMoodle, used to sync without the app
+
+Usage:
+    python -m xmoodle sync [--daemon] [--interval SECONDS] [--data PATH] [--progress]
+"""
+
+import sys
+import asyncio
+import argparse                         # reference: https://docs.python.org/3/library/argparse.html
+import traceback
+from json import load
+
+from aiohttp.client_exceptions import ClientConnectionError
+
+from Moodle import IncorrectLogindata, TemporaryServerError, RETRY_ERRORS
+from MoodleStorage import SyncIndex
+from MoodleSync import DATA_PATH, create_session, sync
+
+DEFAULT_INTERVAL = 30 * 60  # seconds
+
+
+def log(message, file=sys.stdout) -> None:
+    """
+    Prints a message right away, so the log of a daemon is up to date
+    """
+    print(message, file=file, flush=True)
+
+
+async def run_sync(args, config) -> int:
+    """
+    Logs in once and syncs, repeatedly if running as a daemon
+
+    Parameters:
+        args (argparse.Namespace): The command line arguments
+        config (dict): The content of config.json
+
+    Returns:
+        int: The exit code
+    """
+    index = SyncIndex(f'{args.data}/index.sqlite', legacy_path=f'{args.data}/files.json')
+    moodle = create_session(config, index, data_path=args.data)
+    if args.progress:
+        moodle.progress.add_listener(lambda event: log(f'Downloading Files... ({event})'))
+
+    try:
+        log('Logging In...')
+        await moodle.login(dict(config['logindata']))
+
+        check_login = False  # the session was just logged in
+        while True:
+            try:
+                if check_login and not await moodle.is_logged_in():  # The session of a daemon can expire between runs
+                    log('Logging In...')
+                    await moodle.login(dict(config['logindata']))
+                downloaded_files = await sync(moodle, config, index, state=log, data_path=args.data)
+                log(f'{len(downloaded_files)} Files Downloaded')
+                if moodle.limiter:
+                    log(f'Concurrency: {moodle.limiter.stats()}')
+            except IncorrectLogindata:  # trying again won't help
+                raise
+            except Exception as e:  # a daemon tries again on the next run
+                if not args.daemon:
+                    raise
+                if isinstance(e, RETRY_ERRORS):  # failures which persisted through the retries of the session
+                    log(f'Sync failed: {e!r}', file=sys.stderr)
+                else:  # like an error page which couldn't be parsed or a locked index
+                    log(f'Sync failed: {traceback.format_exc()}', file=sys.stderr)
+
+            if not args.daemon:
+                return 0
+            await asyncio.sleep(args.interval)
+            check_login = True
+    except IncorrectLogindata:
+        print('Incorrect Logindata', file=sys.stderr)
+    except ClientConnectionError:
+        print('No Internet Connection', file=sys.stderr)
+    except asyncio.TimeoutError:
+        print('Bad Network Connection', file=sys.stderr)
+    except TemporaryServerError as e:
+        print(f'Moodle Is Unavailable ({e.status})', file=sys.stderr)
+    except Exception:
+        print(traceback.format_exc(), file=sys.stderr)
+    finally:
+        await moodle.close()
+        index.close()
+    return 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='xmoodle', description='Mirrors the files of your Moodle courses')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    sync_parser = commands.add_parser('sync', help='download all new files of the checked courses')
+    sync_parser.add_argument('--daemon', action='store_true', help='keep running and sync every interval')
+    sync_parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='seconds between syncs of the daemon')
+    sync_parser.add_argument('--data', default=DATA_PATH, help='the folder containing config.json and courses.json')
+    sync_parser.add_argument('--progress', action='store_true', help='show the progress of the downloads a few times per second')
+
+    args = parser.parse_args(argv)
+
+    with open(f'{args.data}/config.json', 'r') as config_file:
+        config = load(config_file)
+
+    if not config.get('logindata') or not config.get('default_path'):
+        print('Set the logindata and download path in the app first', file=sys.stderr)
+        return 1
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(run_sync(args, config))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        loop.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())